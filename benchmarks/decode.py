@@ -0,0 +1,69 @@
+"""
+Speed of creating entries from the server's data, through the generic
+LinkEntry.__init__ and through the generated decoders.
+
+    $ python benchmarks/decode.py
+"""
+
+import os
+import sys
+import time
+
+# Run from a checkout, without installing the package
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from pyoperalink import compact, datatypes
+from pyoperalink.decoders import get_decoders
+
+COUNT = 100000
+
+
+def make_data(count):
+    data = []
+    for i in xrange(count):
+        if i % 10 == 0:
+            data.append({"item_type": "bookmark_folder", "id": "F%d" % i,
+                         "properties": {"title": "Folder %d" % i}})
+        else:
+            data.append({"item_type": "bookmark", "id": "B%d" % i,
+                         "properties": {"title": "Bookmark %d" % i,
+                                        "uri": "http://example.com/%d" % i,
+                                        "created": "2010-01-02T03:04:05Z",
+                                        "visited": "2010-01-02T03:04:05Z"}})
+    return data
+
+
+def generic(registry, json_list):
+    return [registry[data["item_type"]]("conn", data["id"],
+                                        **data["properties"])
+            for data in json_list]
+
+
+def generated(registry, json_list):
+    decoders = get_decoders(registry)
+    return [decoders[data["item_type"]]("conn", data) for data in json_list]
+
+
+def measure(function, registry, json_list):
+    best = None
+    for i in range(3):
+        start = time.time()
+        function(registry, json_list)
+        elapsed = time.time() - start
+        best = min(best or elapsed, elapsed)
+    return best
+
+
+def main():
+    json_list = make_data(COUNT)
+    print "%d entries" % COUNT
+    for name, registry in [("regular", datatypes.registry),
+                           ("compact", compact.registry)]:
+        before = measure(generic, registry, json_list)
+        after = measure(generated, registry, json_list)
+        print "%-8s __init__ %6.3fs  decoders %6.3fs  %5.1fx" % (
+            name, before, after, before / after)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Per-entry memory footprint of the regular and the compact datatypes.
+
+    $ python benchmarks/memory.py
+
+Sizes are shallow: the instance, plus its __dict__ for the regular
+classes. Field values are shared between both variants and not counted.
+"""
+
+import os
+import sys
+
+# Run from a checkout, without installing the package
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from pyoperalink import compact, datatypes
+
+SAMPLES = [
+    ("bookmark", {"title": "Opera", "uri": "http://www.opera.com/",
+                  "created": "2010-01-02T03:04:05Z",
+                  "visited": "2010-01-02T03:04:05Z"}),
+    ("bookmark_folder", {"title": "Folder", "type": "normal"}),
+    ("note", {"content": "Some note", "created": "2010-01-02T03:04:05Z"}),
+    ("note_folder", {"title": "Folder"}),
+    ("speeddial", {"title": "Opera", "uri": "http://www.opera.com/"}),
+    ("search_engine", {"title": "Search", "uri": "http://search/?q=%s"}),
+    ("urlfilter", {"content": "http://ads.*", "type": "exclude"}),
+]
+
+
+def footprint(entry):
+    size = sys.getsizeof(entry)
+    if hasattr(entry, "__dict__"):
+        size += sys.getsizeof(entry.__dict__)
+    return size
+
+
+def main():
+    print "%-16s %10s %10s %8s" % ("item type", "regular", "compact",
+                                    "saving")
+    for item_type, properties in SAMPLES:
+        regular = footprint(datatypes.registry[item_type](
+                                    "conn", "1", **properties))
+        small = footprint(compact.registry[item_type](
+                                    "conn", "1", **properties))
+        print "%-16s %9dB %9dB %7d%%" % (item_type, regular, small,
+                                          100 - 100 * small / regular)
+
+
+if __name__ == "__main__":
+    main()
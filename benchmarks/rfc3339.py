@@ -0,0 +1,57 @@
+"""
+Speed of datetime_from_rfc3339 against datetime.strptime.
+
+    $ python benchmarks/rfc3339.py
+"""
+
+import datetime
+import os
+import sys
+import timeit
+
+# Run from a checkout, without installing the package
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from pyoperalink import datatypes
+
+NUMBER = 100000
+TIMESTAMPS = ["2010-%02d-%02dT%02d:%02d:%02dZ" % (month, day, hour, minute,
+                                                  second)
+              for month in range(1, 13) for day in range(1, 29)
+              for hour, minute, second in [(1, 2, 3), (23, 59, 58)]]
+
+
+def strptime(date_string):
+    return datetime.datetime.strptime(date_string,
+                                      datatypes.rfc3339_format)
+
+
+def uncached(date_string):
+    datatypes._rfc3339_cache.clear()
+    return datatypes.datetime_from_rfc3339(date_string)
+
+
+def run(function):
+    timestamps = TIMESTAMPS * (NUMBER // len(TIMESTAMPS) + 1)
+    timer = timeit.Timer(lambda: map(function, timestamps[:NUMBER]))
+    return min(timer.repeat(3, 1)) / NUMBER * 1e6
+
+
+def main():
+    for date_string in TIMESTAMPS:
+        assert datatypes.datetime_from_rfc3339(date_string) == \
+               strptime(date_string)
+
+    baseline = run(strptime)
+    print "%-30s %8.2f us" % ("datetime.strptime", baseline)
+    for name, function in [
+            ("datetime_from_rfc3339", uncached),
+            ("datetime_from_rfc3339, cached", datatypes.datetime_from_rfc3339),
+            ("with offset and fraction",
+             lambda s: uncached(s[:-1] + ".123+02:00"))]:
+        elapsed = run(function)
+        print "%-30s %8.2f us %6.1fx" % (name, elapsed, baseline / elapsed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Throughput and latency of common workloads, against the mock server.
+
+    $ python benchmarks/throughput.py [--items 2000] [--latency 0.01]
+
+Each scenario reports the operations per second, the requests sent and
+the percentiles of their latency, as seen by the client. Run it before
+and after a change to catch regressions:
+
+tree load - the whole bookmark tree, in one request
+walk - the whole tree, level by level with concurrent requests
+folder by folder - the whole tree, through the children of each folder
+inserts - bookmarks added one after another
+bulk inserts - bookmarks added through a bulk, spread over the folders
+moves - bookmarks moved to another folder, one after another
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# Run from a checkout, without installing the package
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from pyoperalink import datatypes
+from pyoperalink.client import LinkClient
+from pyoperalink.instrument import percentile
+from pyoperalink.mockserver import MockLinkServer
+from pyoperalink.transport import HTTPConnectionPool
+
+
+def count(items):
+    return sum(1 + (item.is_folder and count(item.children) or 0)
+               for item in items)
+
+
+def flatten(items):
+    found = []
+    for item in items:
+        if getattr(item, "type", None) == "trash":
+            continue
+        found.append(item)
+        if item.is_folder:
+            found.extend(flatten(item.children))
+    return found
+
+
+def folders(items):
+    return [item for item in flatten(items) if item.is_folder]
+
+
+def tree_load(client, options):
+    return count(client.get_bookmark_tree())
+
+
+def walk(client, options):
+    return sum(1 for item in client.walk_bookmarks(max_workers=8))
+
+
+def folder_by_folder(client, options):
+    return count(client.get_bookmarks())
+
+
+def inserts(client, options):
+    for i in xrange(options.writes):
+        client.add(datatypes.Bookmark(title=u"Insert %d" % i,
+                                      uri=u"http://example.com/i%d" % i))
+    return options.writes
+
+
+def bulk_inserts(client, options):
+    targets = folders(client.get_bookmark_tree()) or [None]
+    with client.bulk(max_workers=8) as bulk:
+        for i in xrange(options.writes):
+            bulk.add(datatypes.Bookmark(title=u"Bulk %d" % i,
+                                        uri=u"http://example.com/b%d" % i),
+                     targets[i % len(targets)])
+    return options.writes
+
+
+def moves(client, options):
+    items = flatten(client.get_bookmark_tree())
+    targets = [item for item in items if item.is_folder]
+    bookmarks = [item for item in items if not item.is_folder]
+    moved = 0
+    for i, bookmark in enumerate(bookmarks[:options.writes]):
+        client.move_into(bookmark, targets[i % len(targets)])
+        moved += 1
+    return moved
+
+
+SCENARIOS = [
+    ("tree load", tree_load),
+    ("walk", walk),
+    ("folder by folder", folder_by_folder),
+    ("inserts", inserts),
+    ("bulk inserts", bulk_inserts),
+    ("moves", moves),
+]
+
+
+def run(server, name, scenario, options):
+    user = name.replace(" ", "-")
+    auth = server.add_user(user)
+    server.populate(user, "bookmark", items=options.items,
+                    folder_size=options.folder_size)
+
+    # Each scenario gets its own connections, and only its own requests
+    # are measured
+    transport = HTTPConnectionPool(max_size=16)
+    client = LinkClient(auth, url_prefix=server.url_prefix,
+                        transport=transport)
+    latencies = []
+    client.add_hook("after_response", lambda event:
+                                        latencies.append(event.latency))
+
+    start = time.time()
+    operations = scenario(client, options)
+    elapsed = time.time() - start
+    transport.close()
+
+    latencies.sort()
+    print "%-18s %7d %8.3f %9.0f %8d %8.1f %8.1f %8.1f" % (
+            name, operations, elapsed, operations / elapsed, len(latencies),
+            percentile(latencies, 0.5) * 1000,
+            percentile(latencies, 0.9) * 1000,
+            percentile(latencies, 0.99) * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--items", type=int, default=2000,
+                        help="bookmarks in every user's tree")
+    parser.add_argument("--folder-size", type=int, default=20,
+                        help="items in every folder")
+    parser.add_argument("--writes", type=int, default=200,
+                        help="inserts and moves of the write scenarios")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="seconds added to every request by the server")
+    parser.add_argument("--jitter", type=float, default=0.0,
+                        help="random seconds added to the latency")
+    parser.add_argument("--no-verify", action="store_true",
+                        help="skip the OAuth signature checks of the server")
+    parser.add_argument("scenarios", nargs="*",
+                        help="scenarios to run, all by default")
+    options = parser.parse_args()
+
+    server = MockLinkServer(latency=options.latency, jitter=options.jitter,
+                            verify_signatures=not options.no_verify)
+    with server:
+        print "%d items, %d per folder, %.0fms latency" % (
+                options.items, options.folder_size, options.latency * 1000)
+        print "%-18s %7s %8s %9s %8s %8s %8s %8s" % (
+                "scenario", "ops", "seconds", "ops/s", "requests",
+                "p50 ms", "p90 ms", "p99 ms")
+        for name, scenario in SCENARIOS:
+            if options.scenarios and name.replace(" ", "-") \
+                    not in options.scenarios:
+                continue
+            run(server, name, scenario, options)
+
+
+if __name__ == "__main__":
+    main()
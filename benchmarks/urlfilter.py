@@ -0,0 +1,121 @@
+"""
+Speed of matching URLs with urlfilter.UrlFilterMatcher against testing
+the compiled patterns of the filters one by one.
+
+    $ python benchmarks/urlfilter.py [filters] [urls]
+"""
+
+import os
+import random
+import re
+import sys
+import time
+
+# Run from a checkout, without installing the package
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from pyoperalink import datatypes
+from pyoperalink.urlfilter import UrlFilterMatcher, compile_pattern
+
+FILTERS = 2000
+URLS = 100000
+
+
+def make_filters(count):
+    """
+    Returns exclude filters of the common shapes, and an include filter
+    letting everything through
+    """
+    filters = [datatypes.UrlFilter(content=u"*", type=u"include")]
+    for i in xrange(count):
+        shape = i % 5
+        if shape == 0:
+            pattern = u"http://ads%d.example.com/*" % i
+        elif shape == 1:
+            pattern = u"*://*.tracker%d.net/*" % i
+        elif shape == 2:
+            pattern = u"http://cdn.example.org/banners/%d/*.gif" % i
+        elif shape == 3:
+            pattern = u"*/pixel%d?*" % i
+        else:
+            pattern = u"http://www.example.com/page%d.html" % i
+        filters.append(datatypes.UrlFilter(content=pattern, type=u"exclude"))
+    return filters
+
+
+def make_urls(count, filters):
+    random.seed(0)
+    urls = []
+    for i in xrange(count):
+        n = random.randrange(len(filters) * 2)
+        shape = random.randrange(6)
+        if shape == 0:
+            url = "http://ads%d.example.com/img/%d.png" % (n, i)
+        elif shape == 1:
+            url = "https://static.tracker%d.net/t.js?id=%d" % (n, i)
+        elif shape == 2:
+            url = "http://cdn.example.org/banners/%d/top.gif" % n
+        elif shape == 3:
+            url = "http://news.example.net/pixel%d?u=%d" % (n, i)
+        elif shape == 4:
+            url = "http://www.example.com/page%d.html" % n
+        else:
+            url = "http://www.example.com/articles/%d/comments#%d" % (n, i)
+        urls.append(url)
+    return urls
+
+
+class NaiveMatcher(object):
+    """
+    Tests the patterns of the exclude filters one by one
+    """
+
+    def __init__(self, filters):
+        self.patterns = [re.compile(compile_pattern(f.content.lower()) + r"\Z",
+                                    re.DOTALL).match
+                         for f in filters if f.type == "exclude"]
+
+    def is_blocked(self, url):
+        url = url.strip().lower()
+        for match in self.patterns:
+            if match(url) is not None:
+                return True
+        return False
+
+
+def measure(function, urls):
+    best = None
+    for i in range(3):
+        start = time.time()
+        results = map(function, urls)
+        elapsed = time.time() - start
+        best = min(best or elapsed, elapsed)
+    return best, results
+
+
+def main():
+    count = len(sys.argv) > 1 and int(sys.argv[1]) or FILTERS
+    url_count = len(sys.argv) > 2 and int(sys.argv[2]) or URLS
+    filters = make_filters(count)
+    urls = make_urls(url_count, filters)
+
+    start = time.time()
+    matcher = UrlFilterMatcher(filters)
+    print "%d filters compiled in %.3fs" % (count, time.time() - start)
+
+    naive_urls = urls[:max(url_count // 100, 100)]
+    naive_time, expected = measure(NaiveMatcher(filters).is_blocked,
+                                   naive_urls)
+    assert map(matcher.is_blocked, naive_urls) == expected
+    naive_rate = len(naive_urls) / naive_time
+    print "%-20s %12.0f URLs/s" % ("naive loop", naive_rate)
+
+    elapsed, results = measure(matcher.is_blocked, urls)
+    rate = len(urls) / elapsed
+    print "%-20s %12.0f URLs/s %8.1fx (%d%% blocked)" % (
+                "UrlFilterMatcher", rate, rate / naive_rate,
+                100 * sum(results) / len(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Non-blocking Opera Link API client.
+
+Every call is run on a pool of worker threads and returns a
+pool.Future immediately, so the calling thread (e.g. an event loop)
+never waits for the network. OAuth signing happens locally, in the
+worker, as for the blocking client.
+
+    >>> client = AsyncLinkClient(auth)
+    >>> future = client.get_bookmarks()
+    >>> future.add_done_callback(lambda f: show(f.result()))
+
+Done callbacks run on the worker thread which finished the call, not on
+the event loop's thread. Use threadsafe_callback to hand them over to
+the loop:
+
+    >>> future.add_done_callback(
+    ...     threadsafe_callback(show_result, loop.call_soon_threadsafe))
+
+By default all the clients share the worker threads of shared_pool, so
+serving many users does not take more threads.
+
+Entries returned by the futures are bound to the blocking LinkClient
+in client.client; their update(), move() etc. methods block.
+"""
+
+from __future__ import absolute_import
+
+from pyoperalink.client import DatatypeMaster, LinkClient, OPERA_LINK_URL
+from pyoperalink.pool import ThreadPool
+
+
+# Pool shared by all clients which are not given one. Workers are only
+# started once calls are submitted
+shared_pool = ThreadPool(32)
+
+
+def threadsafe_callback(callback, call_soon_threadsafe):
+    """
+    Returns a done callback for a Future which calls callback(future)
+    through call_soon_threadsafe, e.g. the loop.call_soon_threadsafe of
+    an asyncio/trollius loop or tornado's IOLoop.add_callback, so that
+    it runs on the event loop's thread instead of a worker thread.
+    """
+    def done_callback(future):
+        call_soon_threadsafe(callback, future)
+    return done_callback
+
+
+class AsyncDatatypeMaster(DatatypeMaster):
+    """
+    Metaclass which defines the behaviour of AsyncLinkClient.
+
+    Generates the same API calls as DatatypeMaster does for LinkClient,
+    but every call is deferred to the client's thread pool.
+    """
+
+    deferred_docstring = """
+    The call runs in the background, a Future of its result is returned.
+    """
+
+    @classmethod
+    def add_method(cls, attrs, name, method, docstring):
+        # Walking a tree or iterating over a folder yields entries as
+        # they arrive, which a single Future cannot express: consuming
+        # the iterator would send its requests from the caller's thread
+        if name.startswith(("walk_", "iter_")):
+            return
+
+        def deferred_method(instance, *args, **kwargs):
+            return instance._submit(getattr(instance.client, name),
+                                    *args, **kwargs)
+        deferred_method.__name__ = name
+        super(AsyncDatatypeMaster, cls).add_method(attrs, name,
+                deferred_method, docstring + cls.deferred_docstring)
+
+
+class AsyncLinkClient(object):
+    """
+    Opera Link API client returning Futures instead of blocking.
+    """
+
+    __metaclass__ = AsyncDatatypeMaster
+
+    def __init__(self, auth_handler=None, url_prefix=OPERA_LINK_URL,
+            max_workers=None, pool=None, client=None):
+        """
+        auth_handler and url_prefix are used as for LinkClient; an
+        existing LinkClient can be passed as client instead.
+
+        Calls run on pool, a pool.ThreadPool that may be shared by the
+        clients of many users. If it is None, shared_pool is used, unless
+        max_workers is given: a pool of max_workers threads is then
+        created for this client.
+        """
+        if client is None:
+            client = LinkClient(auth_handler, url_prefix)
+        self.client = client
+        self._owns_pool = pool is None and max_workers is not None
+        if self._owns_pool:
+            pool = ThreadPool(max_workers)
+        elif pool is None:
+            pool = shared_pool
+        self.pool = pool
+
+    def _submit(self, function, *args, **kwargs):
+        return self.pool.submit(function, *args, **kwargs)
+
+    def close(self):
+        """
+        Waits for the pending calls and stops the worker threads of the
+        pool created for this client. Shared pools are left running.
+        """
+        if self._owns_pool:
+            self.pool.shutdown()
+
+    def add_hook(self, event, hook):
+        """
+        Registers hook on the underlying client, see LinkClient.add_hook.
+        Hooks are called from the pool's threads.
+        """
+        self.client.add_hook(event, hook)
+
+    def remove_hook(self, event, hook):
+        self.client.remove_hook(event, hook)
+
+    """ High level API methods """
+
+    def add(self, element):
+        """
+        Adds newly created elements to Opera Link. For tree-structured datatypes,
+        the item will be appended at the end of the root folder.
+        """
+        return self._submit(self.client.add, element)
+
+    def add_to_folder(self, element, destination):
+        """
+        Adds newly created elements to Opera Link, appended at the end
+        of to the spedified destination folder.
+        """
+        return self._submit(self.client.add_to_folder, element, destination)
+
+    def move_into(self, element, destination=None):
+        """
+        Relocates the item in the tree, appendig it at the end of destination.
+        destination must be a folder item. If None, it imples the root folder.
+        """
+        return self._submit(self.client.move_into, element, destination)
+
+    def move_before(self, element, reference_item):
+        """
+        Relocates the item in the tree, placing it before reference_item.
+        """
+        return self._submit(self.client.move_before, element, reference_item)
+
+    def move_after(self, element, reference_item):
+        """
+        Relocates the item in the tree, placing it after reference_item.
+        """
+        return self._submit(self.client.move_after, element, reference_item)
@@ -5,12 +5,14 @@ Oauth handling code
 import oauth2 as oauth
 
 from urllib import urlencode
+from urlparse import parse_qs
 
 
 class OAuth(object):
     Client = oauth.Client
     Request = oauth.Request
     Token = oauth.Token
+    signature_method = oauth.SignatureMethod_HMAC_SHA1()
 
     oauth_url = "https://auth.opera.com/service/oauth/"
 
@@ -64,6 +66,34 @@ class OAuth(object):
         self.access_token = self.Token.from_string(content)
         return self.access_token
 
+    def sign_request(self, url, method="GET", body="", headers=None):
+        """
+        Signs a request to the Opera Link API with the access token,
+        the same way oauth2.Client does.
+        Returns the signed (url, body, headers)
+        """
+        headers = dict(headers or {})
+        is_form_encoded = method == "POST"
+        parameters = None
+        if is_form_encoded and body:
+            parameters = parse_qs(body, keep_blank_values=True)
+
+        request = self.Request.from_consumer_and_token(self._consumer,
+                                token=self.access_token,
+                                http_method=method,
+                                http_url=url,
+                                parameters=parameters,
+                                body=body,
+                                is_form_encoded=is_form_encoded)
+        request.sign_request(self.signature_method, self._consumer,
+                             self.access_token)
+
+        if is_form_encoded:
+            body = request.to_postdata()
+        else:
+            url = request.to_url()
+        return url, body, headers
+
     @property
     def request_token_url(self):
         return self.oauth_url + "request_token"
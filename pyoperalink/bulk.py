@@ -0,0 +1,225 @@
+"""
+Bulk mutations of Opera Link items.
+
+    >>> with client.bulk(max_workers=8) as bulk:
+    ...     for bookmark in bookmarks:
+    ...         bulk.add(bookmark, folder)
+    >>> failed = [result for result in bulk.results if not result.ok]
+
+Operations are dispatched concurrently when the bulk is run (on leaving
+the with block, or by calling run()). Operations that depend on each
+other run one after another, in the order they were added:
+
+- all operations on the same entry,
+- operations which change the order of items in the same folder
+  (adding items to it, moving items into it),
+- moves before or after an item and operations on that item,
+- adding items to a folder and operations on that folder.
+
+Moves before or after an item change the order of the item's folder. It
+is known when the item was added or moved into a folder by the bulk, or
+when given as the folder argument of move(); otherwise such moves run
+one after another with every operation changing the order of a folder
+of the same datatype.
+
+A failing operation does not stop the others; the exception it raised
+is kept in its result.
+"""
+
+from __future__ import absolute_import
+
+from pyoperalink.client import LinkError
+from pyoperalink.datatypes import TreeEntry
+from pyoperalink.pool import ThreadPool
+
+
+class BulkResult(object):
+    """
+    Outcome of a single bulk operation.
+
+    result holds the return value of the operation and error the exception
+    it raised, usually a LinkError, if any.
+    """
+
+    def __init__(self, action, entry):
+        self.action = action
+        self.entry = entry
+        self.result = None
+        self.error = None
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        return "<%s: %s %s %s>" % (self.__class__.__name__, self.action,
+                                   self.entry.item_type,
+                                   self.ok and "ok" or repr(self.error))
+
+
+class Bulk(object):
+    """
+    Collects mutations of Opera Link items to dispatch them concurrently.
+    """
+
+    def __init__(self, client, max_workers=4):
+        self.client = client
+        self.max_workers = max_workers
+        self.results = []
+        self._operations = []
+        self._parents = {}
+        # id() of entries: folder key of the folder they were put in
+        self._folders = {}
+        # Datatypes with moves next to items in unknown folders
+        self._unknown_folders = set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.run()
+
+    def add(self, entry, folder=None):
+        """
+        Adds a newly created entry, at the end of folder if given, or of
+        the root folder otherwise.
+        """
+        keys = [self._entry_key(entry)]
+        if isinstance(entry, TreeEntry):
+            keys.append(self._folder_key(entry.datatype, folder))
+            self._folders[id(entry)] = keys[-1]
+        if folder is None:
+            return self._queue("add", entry, keys, self.client.add, entry)
+        keys.append(self._entry_key(folder))
+        return self._queue("add", entry, keys,
+                           self.client.add_to_folder, entry, folder)
+
+    def update(self, entry):
+        """
+        Saves the local changes of entry to the server
+        """
+        return self._queue("update", entry, [self._entry_key(entry)],
+                           entry.update)
+
+    def delete(self, entry):
+        """
+        Deletes entry from the server
+        """
+        return self._queue("delete", entry, [self._entry_key(entry)],
+                           entry.delete)
+
+    def trash(self, entry):
+        """
+        Moves entry to the trash folder
+        """
+        return self._queue("trash", entry, [self._entry_key(entry)],
+                           entry.trash)
+
+    def move(self, entry, reference_item, relative_position, folder=None):
+        """
+        Moves entry before, after or into reference_item, as TreeEntry.move.
+        folder is the folder holding reference_item when moving before or
+        after it, None for the root folder or if it is unknown.
+        """
+        keys = [self._entry_key(entry)]
+        if reference_item is not None:
+            keys.append(self._entry_key(reference_item))
+        if relative_position == "into":
+            keys.append(self._folder_key(entry.datatype, reference_item))
+        elif folder is not None:
+            keys.append(self._folder_key(entry.datatype, folder))
+        elif id(reference_item) in self._folders:
+            keys.append(self._folders[id(reference_item)])
+        else:
+            keys.append(("folders", entry.datatype))
+            self._unknown_folders.add(entry.datatype)
+        self._folders[id(entry)] = keys[-1]
+        return self._queue("move", entry, keys,
+                           entry.move, reference_item, relative_position)
+
+    def run(self):
+        """
+        Dispatches the collected operations and returns the list of their
+        results, in the order the operations were added.
+        """
+        operations, self._operations = self._operations, []
+        lanes = self._split_lanes(operations)
+
+        pool = ThreadPool(self.max_workers)
+        try:
+            futures = [pool.submit(self._run_lane, lane) for lane in lanes]
+            for future in futures:
+                future.result()
+        finally:
+            pool.shutdown()
+        self._parents = {}
+        self._folders = {}
+        self._unknown_folders = set()
+        return self.results
+
+    def _queue(self, action, entry, keys, function, *args):
+        result = BulkResult(action, entry)
+        self._operations.append((result, keys, function, args))
+        self.results.append(result)
+        return result
+
+    def _entry_key(self, entry):
+        return ("entry", id(entry))
+
+    def _folder_key(self, datatype, folder):
+        if folder is None:
+            return ("folder", datatype, None)
+        return ("folder", datatype, folder.id or id(folder))
+
+    def _find(self, key):
+        parents = self._parents
+        root = key
+        while parents.get(root, root) != root:
+            root = parents[root]
+        while key != root:
+            parents[key], key = root, parents[key]
+        return root
+
+    def _split_lanes(self, operations):
+        """
+        Groups the operations sharing a key into lanes, keeping their order
+        """
+        for result, keys, function, args in operations:
+            keys = list(keys)
+            for key in keys[1:]:
+                if key[0] == "folder" and key[1] in self._unknown_folders:
+                    # Any folder may be the one of the moves next to items
+                    # in unknown folders
+                    keys.append(("folders", key[1]))
+                    break
+            root = self._find(keys[0])
+            for key in keys[1:]:
+                other = self._find(key)
+                if other != root:
+                    self._parents[other] = root
+
+        lanes = {}
+        order = []
+        for operation in operations:
+            root = self._find(operation[1][0])
+            if root not in lanes:
+                lanes[root] = []
+                order.append(root)
+            lanes[root].append(operation)
+        return [lanes[root] for root in order]
+
+    def _run_lane(self, lane):
+        # Operations involving an entry which could not be added would
+        # act on the wrong item, or on none at all
+        failed = set()
+        for result, keys, function, args in lane:
+            if failed.intersection(keys):
+                result.error = LinkError(reason="Depends on a failed add")
+                continue
+            try:
+                result.result = function(*args)
+            except Exception, ex:
+                result.error = ex
+                if result.action == "add":
+                    failed.add(keys[0])
@@ -0,0 +1,118 @@
+"""
+Cache for data fetched from the Opera Link server.
+
+    >>> from pyoperalink.cache import LRUCache
+    >>> client = LinkClient(auth, cache=LRUCache(max_size=10000, ttl=30))
+
+The client caches the decoded JSON of single items, keyed by (user,
+datatype, item_id), and of folder listings, keyed by (user, datatype,
+resource, folder_id). Every cache hit creates new entry objects, so
+callers never share them.
+
+Changes made through the client (create, update, delete, trash, move)
+drop the changed item and all the cached listings of its datatype for
+that user. Deleting, trashing or moving an item, which may be a folder,
+also drops the cached items of its descendants: all the single items of
+the datatype for that user. A cache can be shared by the clients of many
+users.
+"""
+
+import threading
+import time
+
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    """
+    Thread-safe cache keeping at most max_size values, for at most ttl
+    seconds each. When full, the least recently used value is evicted.
+
+    Values can be tagged when stored, to drop all the values with a given
+    tag at once.
+    """
+
+    def __init__(self, max_size=1000, ttl=60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._tags = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses,
+                "size": len(self._entries)}
+
+    def get(self, key, default=None):
+        self._lock.acquire()
+        try:
+            entry = self._entries.pop(key, None)
+            if entry is None or entry[1] < time.time():
+                if entry is not None:
+                    self._untag(key, entry[2])
+                self.misses += 1
+                return default
+            # Re-inserted at the end, as the most recently used
+            self._entries[key] = entry
+            self.hits += 1
+            return entry[0]
+        finally:
+            self._lock.release()
+
+    def set(self, key, value, tags=()):
+        self._lock.acquire()
+        try:
+            self._remove(key)
+            self._entries[key] = (value, time.time() + self.ttl, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_size:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+        finally:
+            self._lock.release()
+
+    def discard(self, key):
+        self._lock.acquire()
+        try:
+            self._remove(key)
+        finally:
+            self._lock.release()
+
+    def discard_tag(self, tag):
+        """
+        Drops all the values stored with tag
+        """
+        self._lock.acquire()
+        try:
+            for key in list(self._tags.get(tag, ())):
+                self._remove(key)
+        finally:
+            self._lock.release()
+
+    def clear(self):
+        self._lock.acquire()
+        try:
+            self._entries.clear()
+            self._tags.clear()
+        finally:
+            self._lock.release()
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._untag(key, entry[2])
+
+    def _untag(self, key, tags):
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
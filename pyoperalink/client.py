@@ -1,10 +1,21 @@
 from __future__ import absolute_import
 
-from urllib import urlencode
+import sys
+import time
 
-import oauth2 as oauth
+from StringIO import StringIO
+from urllib import urlencode
+from urlparse import urlsplit
 
+from pyoperalink.compression import (ACCEPT_ENCODING, MIN_COMPRESSED_SIZE,
+                                     CompressionStats, DecompressingReader,
+                                     compress, decompress, is_supported)
 from pyoperalink.datatypes import registry
+from pyoperalink.decoders import get_decoders
+from pyoperalink.instrument import HOOK_EVENTS, ChangeEvent, RequestEvent
+from pyoperalink.pool import SingleFlight, ThreadPool
+from pyoperalink.streaming import iter_json_array
+from pyoperalink.transport import shared_pool
 
 try:
     import json as simplejson
@@ -28,6 +39,8 @@ class LinkError(Exception):
     """
     status_code = None
     reason = None
+    # Retry-After header of the response, if any
+    retry_after = None
 
     def __init__(self, status_code=None, reason=None, content=None):
         self.status_code = status_code or self.status_code
@@ -84,6 +97,32 @@ class DatatypeMaster(type):
     If item_id=None then all root-level items will be fetched.
     """
 
+    iter_children_docstring = """
+    Iterates over the items of datatype %s in a folder, like get_%ss, but
+    decodes the server's response while it is being received. The items are
+    created one at a time, so huge folders can be processed in constant
+    memory.
+    """
+
+    get_tree_docstring = """
+    Gets the whole tree of items of datatype %s from the server in a single
+    request, provided a folder ID. If item_id=None then the tree is fetched
+    starting at the root level.
+
+    Returns the list of top-level items. The children of every folder are
+    already populated, so walking the tree makes no further requests.
+    """
+
+    walk_docstring = """
+    Iterates breadth-first over the tree of items of datatype %s, starting
+    at the folder with the given ID, or at the root level if item_id=None.
+
+    The children of all folders on the same level are fetched concurrently,
+    using at most max_workers requests at a time. Entries are yielded level
+    by level, as soon as the whole level has been fetched. The children of
+    every visited folder are populated on the way.
+    """
+
     update_docstring = """
     Saves local changes to the %s item"s fields to the server.
     Returns a dict with all the item"s fields and values, as saved on
@@ -128,12 +167,20 @@ class DatatypeMaster(type):
         for datatype, element_class in TREE_STRUCTURED_DATATYPES:
 
             trash_method = cls.gen_delete_datatype(datatype, "trash")
-            trash_method.__doc__ = cls.trash_docstring % datatype
-            attrs["%s_%s" % ("trash", datatype)] = trash_method
+            cls.add_method(attrs, "%s_%s" % ("trash", datatype), trash_method,
+                           cls.trash_docstring % datatype)
 
             move_method = cls.gen_move_datatype(datatype)
-            move_method.__doc__ = cls.move_docstring % datatype
-            attrs["%s_%s" % ("move", datatype)] = move_method
+            cls.add_method(attrs, "%s_%s" % ("move", datatype), move_method,
+                           cls.move_docstring % datatype)
+
+            tree_method = cls.gen_tree_getter(datatype)
+            cls.add_method(attrs, "get_%s_tree" % datatype, tree_method,
+                           cls.get_tree_docstring % datatype)
+
+            walk_method = cls.gen_tree_walker(datatype)
+            cls.add_method(attrs, "walk_%ss" % datatype, walk_method,
+                           cls.walk_docstring % datatype)
 
         # Add methods common for all datatype elements
         for datatype, element_class in (TREE_STRUCTURED_DATATYPES + 
@@ -141,33 +188,47 @@ class DatatypeMaster(type):
             # method to get list of items
             method = cls.gen_elements_getter(datatype,
                     ((datatype, element_class) in TREE_STRUCTURED_DATATYPES))
-            method.__doc__ = cls.get_children_docstring % datatype
-            attrs["get_%ss" % datatype] = method
+            cls.add_method(attrs, "get_%ss" % datatype, method,
+                           cls.get_children_docstring % datatype)
+
+            # method to iterate over items, decoding them as they arrive
+            method = cls.gen_elements_iterator(datatype,
+                    ((datatype, element_class) in TREE_STRUCTURED_DATATYPES))
+            cls.add_method(attrs, "iter_%ss" % datatype, method,
+                           cls.iter_children_docstring % (datatype, datatype))
 
             # method to get details of the item
             method = cls.gen_get_datatype(datatype)
-            method.__doc__ = cls.get_docstring % datatype
-            attrs["get_%s" % datatype] = method
+            cls.add_method(attrs, "get_%s" % datatype, method,
+                           cls.get_docstring % datatype)
 
             # method to delete an item
             method = cls.gen_delete_datatype(datatype, "delete")
-            method.__doc__ = cls.delete_docstring % datatype
-            attrs["delete_%s" % datatype] = method
+            cls.add_method(attrs, "delete_%s" % datatype, method,
+                           cls.delete_docstring % datatype)
 
             # method to create an item
             method = cls.gen_change_datatype(datatype, "create")
-            method.__doc__ = cls.create_docstring % {
+            cls.add_method(attrs, "create_%s" % datatype, method,
+                           cls.create_docstring % {
                                         "datatype": datatype,
-                                        "class": element_class}
-            attrs["create_%s" % datatype] = method
+                                        "class": element_class})
 
             # method to update an item
             method = cls.gen_change_datatype(datatype, "update")
-            method.__doc__ = cls.update_docstring % datatype
-            attrs["update_%s" % datatype] = method
+            cls.add_method(attrs, "update_%s" % datatype, method,
+                           cls.update_docstring % datatype)
 
         return super_new(cls, name, bases, attrs)
 
+    @classmethod
+    def add_method(cls, attrs, name, method, docstring):
+        """
+        Adds a generated method to the class attributes
+        """
+        method.__doc__ = docstring
+        attrs[name] = method
+
     @classmethod
     def gen_elements_getter(cls, datatype, tree_structure):
         """
@@ -184,6 +245,40 @@ class DatatypeMaster(type):
             return datatype_tree_getter
         return datatype_list_getter
 
+    @classmethod
+    def gen_elements_iterator(cls, datatype, tree_structure):
+        """
+        Closure generating general method to iterate
+        over elements streamed from server
+        """
+        def datatype_tree_iterator(instance, item_id=None):
+            return instance._iter_resource_children(datatype, item_id)
+        def datatype_list_iterator(instance):
+            return instance._iter_resource_children(datatype, None)
+        if tree_structure:
+            return datatype_tree_iterator
+        return datatype_list_iterator
+
+    @classmethod
+    def gen_tree_getter(cls, datatype):
+        """
+        Closure generating method to get a whole tree
+        of elements from server in one request
+        """
+        def datatype_tree_getter(instance, item_id=None):
+            return instance._get_resource_descendants(datatype, item_id)
+        return datatype_tree_getter
+
+    @classmethod
+    def gen_tree_walker(cls, datatype):
+        """
+        Closure generating method to walk a tree
+        of elements, fetching folders concurrently
+        """
+        def datatype_tree_walker(instance, item_id=None, max_workers=4):
+            return instance._walk_resource(datatype, item_id, max_workers)
+        return datatype_tree_walker
+
     @classmethod
     def gen_get_datatype(cls, datatype):
         """
@@ -241,17 +336,82 @@ class LinkClient(object):
 
     __metaclass__ = DatatypeMaster
 
-    def __init__(self, auth_handler=None, url_prefix=OPERA_LINK_URL):
+    def __init__(self, auth_handler=None, url_prefix=OPERA_LINK_URL,
+            transport=None, registry=registry, cache=None,
+            retry_policy=None, circuit_breaker=None, accept_compression=True,
+            compress_requests=False, light=False, journal=None):
         """
         auth_handler must be an auth.OAuth object, with a set access token.
 
         url_prefix defaults to the Opera Link API server address.
         It can be changed for testing purposes.
+
+        transport sends the signed requests to the server. It defaults to
+        transport.shared_pool, a pool of keep-alive connections shared by
+        all clients.
+
+        registry maps item types to the classes of the entries created from
+        the server's data. compact.registry can be passed to keep large
+        trees in less memory. It is read once, when the client is created.
+
+        cache, e.g. a cache.LRUCache, keeps fetched items and folder
+        listings, see cache.py. The streaming iterators bypass it.
+
+        Hooks observing the requests can be registered with add_hook(),
+        see instrument.py.
+
+        retry_policy, a retry.RetryPolicy, sends failed requests again.
+        circuit_breaker, a retry.CircuitBreaker, fails requests at once
+        while the server is down. See retry.py.
+
+        If accept_compression is True, the server may send compressed
+        responses. compress_requests makes large request bodies sent
+        compressed. See compression.py.
+
+        If light is True, the entries of folder listings and trees are
+        created without their heavy fields, like icons, thumbnails and
+        the content of notes. Each entry fetches them from the server
+        when one of them is first read.
+
+        journal, a journal.Journal, keeps the changes made while the
+        server is unreachable, to be replayed later. See journal.py.
         """
-        if auth_handler is not None:
-            self.conn = oauth.Client(auth_handler._consumer,
-                                     auth_handler.access_token)
+        self.auth_handler = auth_handler
+        self.registry = registry
+        self.light = light
+        self.journal = journal
+        self._decoders = get_decoders(registry)
+        self._light_decoders = get_decoders(registry, light=True)
         self.url_prefix = url_prefix
+        if transport is None:
+            transport = shared_pool
+        self.transport = transport
+        self.cache = cache
+        self.retry_policy = retry_policy
+        self.circuit_breaker = circuit_breaker
+        self.hooks = dict((event, []) for event in HOOK_EVENTS)
+        # Concurrent GETs of the same resource share one request
+        self.single_flight = SingleFlight()
+        self.accept_compression = accept_compression
+        self.compress_requests = compress_requests
+        self.compression_stats = CompressionStats()
+
+    def add_hook(self, event, hook):
+        """
+        Registers hook to be called with an instrument.RequestEvent on
+        event: "before_request", "after_response" or "on_error", or with
+        an instrument.ChangeEvent on "after_change".
+        """
+        if event not in self.hooks:
+            raise ValueError("Unknown hook event: %s" % event)
+        self.hooks[event].append(hook)
+
+    def remove_hook(self, event, hook):
+        self.hooks[event].remove(hook)
+
+    def _fire(self, event, request_event):
+        for hook in self.hooks[event]:
+            hook(request_event)
 
     def _build_query(self, api_method=None, **kwargs):
         query = dict(kwargs, api_output="json")
@@ -271,99 +431,355 @@ class LinkClient(object):
             url += "%s/" % str(item_id)
         return url
 
+    def _listing_decoders(self, full=False):
+        """
+        Returns the decoders for the entries of listings, light ones in
+        light mode unless full is True
+        """
+        if self.light and not full:
+            return self._light_decoders
+        return self._decoders
+
     def _get_resource_children(self, datatype, item_id,
-            create_tree_structure):
+            create_tree_structure, full=False):
         url_suffix = self._get_url_suffix(datatype, item_id)
         resource_location = "%s%s?%s" % (url_suffix, "children",
                                          urlencode(self._build_query()))
-        json_list = self._get_request(resource_location)
+        json_list = self._get_cached_request(resource_location, datatype,
+                                             item_id, "children")
         if not json_list:
             return []
 
-        if create_tree_structure:
-            children = []
-            for data in json_list:
-                item_type = data.pop("item_type")
-                item_id = data.pop("id")
-                new_item = registry[item_type](self, item_id,
-                                               **data["properties"])
-                children.append(new_item)
-            return children
-        else:
-            l = []
-            for data in json_list:
-                item_type = data.pop("item_type")
-                item_id = data.pop("id")
-                new_child = registry[item_type](self,item_id,
-                                                **data["properties"])
-                l.append(new_child)
-            return l
+        decoders = self._listing_decoders(full)
+        return [decoders[data["item_type"]](self, data) for data in json_list]
+
+    def _iter_resource_children(self, datatype, item_id):
+        url_suffix = self._get_url_suffix(datatype, item_id)
+        resource_location = "%s%s?%s" % (url_suffix, "children",
+                                         urlencode(self._build_query()))
+        body = self._get_stream(resource_location, datatype, "children")
+        try:
+            decoders = self._listing_decoders()
+            for data in iter_json_array(body):
+                yield decoders[data["item_type"]](self, data)
+        finally:
+            body.close()
+
+    def _get_resource_descendants(self, datatype, item_id, full=False):
+        url_suffix = self._get_url_suffix(datatype, item_id)
+        resource_location = "%s%s?%s" % (url_suffix, "descendants",
+                                         urlencode(self._build_query()))
+        json_list = self._get_cached_request(resource_location, datatype,
+                                             item_id, "descendants")
+        if not json_list:
+            return []
+        return self._build_tree(json_list, self._listing_decoders(full))
+
+    def _build_tree(self, json_list, decoders):
+        """
+        Decodes a nested list of items, as returned by the descendants
+        resource, populating the children of every folder on the way.
+        """
+        items = []
+        for data in json_list:
+            new_item = decoders[data["item_type"]](self, data)
+            if new_item.is_folder:
+                new_item._children = self._build_tree(
+                                    data.get("children") or [], decoders)
+            items.append(new_item)
+        return items
+
+    def _walk_resource(self, datatype, item_id, max_workers):
+        level = self._get_resource_children(datatype, item_id, True)
+        pool = ThreadPool(max_workers)
+        try:
+            while level:
+                for item in level:
+                    yield item
+
+                folders = [item for item in level if item.is_folder]
+                children = pool.map(
+                    lambda folder: self._get_resource_children(
+                                        datatype, folder.id, True),
+                    folders)
+
+                level = []
+                for folder, folder_children in zip(folders, children):
+                    folder._children = folder_children
+                    level.extend(folder_children)
+        finally:
+            pool.shutdown()
 
     def _get_resource(self, datatype, recursive, item_id):
+        data = self._get_resource_data(datatype, item_id)
+        return self._decoders[data["item_type"]](self, data)
+
+    def _get_resource_data(self, datatype, item_id):
+        """
+        Returns the JSON data of a single item
+        """
         resource_location = self._get_url_suffix(datatype, item_id)
         resource_location += "?" + urlencode(self._build_query())
-        data = self._get_request(resource_location)[0]
-        item_type = data.pop("item_type")
-        item_id = data.pop("id")
-        new_item = registry[item_type](self, item_id, **data["properties"])
-        return new_item
+        json_list = self._get_cached_request(resource_location, datatype,
+                                             item_id)
+        if not json_list:
+            raise NotFoundError()
+        return json_list[0]
+
+    def _change_resource(self, datatype, api_method, params, item_id=None,
+                         use_journal=True):
+        journal = use_journal and self.journal
+        if journal and journal.is_offline(self.auth_handler.access_token.key):
+            return journal.record(self.auth_handler.access_token.key,
+                                  datatype, api_method, params, item_id)
 
-    def _change_resource(self, datatype, api_method, params, item_id=None):
         resource_location = self._get_url_suffix(datatype, item_id)
         data = self._build_query(api_method)
         data.update(params)
-        return self._post_request(resource_location, data)
+        try:
+            try:
+                json_data = self._post_request(resource_location, data,
+                                               datatype)
+            except LinkError, ex:
+                from pyoperalink.journal import is_offline_error
+                if not journal or not is_offline_error(ex):
+                    raise
+                # Not sent, or the response was lost: the change is kept
+                # for later, and so are the next ones
+                return journal.record(self.auth_handler.access_token.key,
+                                      datatype, api_method, params, item_id)
+        finally:
+            # Even failed changes may have been applied
+            if self.cache is not None:
+                self._invalidate_cache(datatype, api_method, item_id)
+        self._fire("after_change", ChangeEvent(datatype, api_method, item_id,
+                                               params, json_data))
+        return json_data
+
+    def _get_cached_request(self, url, datatype, item_id, resource=None):
+        """
+        Sends data access requests to the server, unless the response is
+        in the cache. resource is the folder listing requested, if any.
+        """
+        api_method = resource or "get"
+        if self.cache is None:
+            return self._get_request(url, datatype, api_method)
+
+        user = self.auth_handler.access_token.key
+        if resource is None:
+            key = (user, datatype, item_id)
+            tags = ((user, datatype, "items"),)
+        else:
+            key = (user, datatype, resource, item_id)
+            tags = ((user, datatype),)
+
+        json_data = self.cache.get(key)
+        if json_data is None:
+            json_data = self._get_request(url, datatype, api_method) or []
+            # An empty folder is worth caching, an item missing isn't
+            if json_data or resource is not None:
+                self.cache.set(key, json_data, tags)
+        return json_data
+
+    def _invalidate_cache(self, datatype, api_method, item_id):
+        user = self.auth_handler.access_token.key
+        if api_method in ("delete", "trash", "move"):
+            # The item may be a folder, whose descendants are deleted,
+            # trashed or moved with it: all the items are dropped
+            self.cache.discard_tag((user, datatype, "items"))
+        else:
+            self.cache.discard((user, datatype, item_id))
+        self.cache.discard_tag((user, datatype))
 
     @property
     def _http_headers(self):
-        return {
+        headers = {
             "Content-type": "application/x-www-form-urlencoded",
         }
+        if self.accept_compression:
+            headers["Accept-Encoding"] = ACCEPT_ENCODING
+        return headers
 
     def _urlencode(self, data):
         return urlencode(dict((key, value.encode("utf-8"))
                             for key, value in data.iteritems()
                                 if isinstance(value, basestring)))
 
-    def _post_request(self, url, data):
+    def _request(self, url, method, body="", stream=False, event=None):
+        """
+        Signs the request with the user's access token and sends it
+        through the transport.
+
+        If stream is True, the content is returned as a file-like object.
+        The time spent signing and sending the request is recorded in
+        event, if given.
+        """
+        start = time.time()
+        url, body, headers = self.auth_handler.sign_request(url, method,
+                                                body, self._http_headers)
+        sent = time.time()
+        if event is not None:
+            event.signing_time = sent - start
+        try:
+            wire_body = body
+            if self.compress_requests and body and \
+                    len(body) >= MIN_COMPRESSED_SIZE:
+                # Compressed after signing, the signature is checked
+                # against the decoded body
+                wire_body = compress(body)
+                headers = dict(headers, **{"Content-Encoding": "gzip"})
+            resp, content = self._transport_request(url, method, wire_body,
+                                                    headers, stream)
+            if wire_body is not body and resp.status == 415:
+                # The server doesn't accept compressed bodies
+                self.compress_requests = False
+                del headers["Content-Encoding"]
+                wire_body = body
+                resp, content = self._transport_request(url, method, body,
+                                                        headers, stream)
+            self.compression_stats.record_request(len(wire_body or ""),
+                                                  len(body or ""))
+            if event is not None:
+                event.request_bytes = len(wire_body or "")
+            content = self._decode_content(resp, content, stream, event)
+        finally:
+            if event is not None:
+                event.network_time = time.time() - sent
+        return resp, content
+
+    def _transport_request(self, url, method, body, headers, stream):
+        if not stream:
+            return self.transport.request(url, method, body, headers)
+        if hasattr(self.transport, "stream"):
+            return self.transport.stream(url, method, body, headers)
+        resp, content = self.transport.request(url, method, body, headers)
+        return resp, StringIO(content)
+
+    def _decode_content(self, resp, content, stream, event):
+        """
+        Decodes content according to the Content-Encoding of resp
+        """
+        encoding = (_getheader(resp, "Content-Encoding") or "").lower()
+        stats = self.compression_stats
+        if event is not None and not stream:
+            event.response_bytes = len(content)
+        if not is_supported(encoding):
+            if not stream:
+                stats.record_response(len(content), len(content))
+            return content
+        if stream:
+            return DecompressingReader(content, encoding, stats)
+        decoded = decompress(content, encoding)
+        stats.record_response(len(content), len(decoded))
+        return decoded
+
+    def _post_request(self, url, data, datatype=None):
         """
         Sends data manipulation requests to the server
         """
         # Encode all fields that have a value and send them to the server
-        try:
-            resp, content = self.conn.request(url, method="POST",
-                                              body=self._urlencode(data),
-                                              headers=self._http_headers)
-        except Exception, ex:
-            raise LinkError(503, "SERVICE UNAVAILABLE", ex)
+        return self._send_request(url, "POST", self._urlencode(data),
+                                  datatype, data.get("api_method"), (200, 204))
 
-        if resp.status not in [200, 204]:
-            self._raise_link_exception(resp.status, resp.reason, content)
+    def _get_request(self, url, datatype=None, api_method="get"):
+        """
+        Sends data access requests to the server.
 
-        # Link API requests return lists of items,
-        # with the exception of the delete method.
-        if not content:
-            return
+        Threads requesting the same URL at the same time share a single
+        request: they all get its decoded JSON, which must not be
+        modified, and decode their own entries from it.
+        """
+        return self.single_flight.call(url, self._send_request, url, "GET",
+                                       "", datatype, api_method, (200,))
 
-        return simplejson.loads(content)
+    def _send_request(self, url, method, body, datatype, api_method,
+                      statuses, stream=False):
+        """
+        Sends the request and returns the decoded JSON content, or the
+        content as a file-like object if stream is True. statuses are the
+        successful statuses.
 
-    def _get_request(self, url):
+        Failed requests are sent again as the retry policy allows.
+        """
+        attempt = 0
+        while True:
+            try:
+                return self._send_attempt(url, method, body, datatype,
+                                          api_method, statuses, stream,
+                                          attempt)
+            except LinkError, ex:
+                delay = None
+                if self.retry_policy is not None:
+                    delay = self.retry_policy.delay(method, attempt, ex)
+                if delay is None:
+                    raise
+            time.sleep(delay)
+            attempt += 1
+
+    def _send_attempt(self, url, method, body, datatype, api_method,
+                      statuses, stream, attempt):
         """
-        Sends data access requests to the server
+        Sends the request once, calling the hooks on the way
         """
+        event = RequestEvent(datatype, api_method, method, url, attempt)
+        host = urlsplit(url)[1]
+        self._fire("before_request", event)
         try:
-            resp, content = self.conn.request(url, method="GET",
-                                              headers=self._http_headers)
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.before_request(host)
+            try:
+                resp, content = self._request(url, method, body, stream,
+                                              event)
+            except Exception, ex:
+                raise LinkError(503, "SERVICE UNAVAILABLE", ex)
+
+            event.status = resp.status
+            if resp.status not in statuses:
+                if stream:
+                    body = content
+                    content = body.read()
+                    body.close()
+                    event.response_bytes = len(content)
+                try:
+                    self._raise_link_exception(resp.status, resp.reason,
+                                               content)
+                except LinkError, ex:
+                    ex.retry_after = _getheader(resp, "Retry-After")
+                    raise
+
+            if stream:
+                # Neither the size nor the decoding of streamed content
+                # are known yet
+                json_data = content
+            else:
+                # Link API requests return lists of items,
+                # with the exception of the delete method.
+                json_data = None
+                if content:
+                    start = time.time()
+                    json_data = simplejson.loads(content)
+                    event.decode_time = time.time() - start
         except Exception, ex:
-            raise LinkError(503, "SERVICE UNAVAILABLE", ex)
-
-        api_status = resp.status
-        if api_status != 200:
-            self._raise_link_exception(resp.status, resp.reason, content)
-
-        if not content:
-            return
-        return simplejson.loads(content)
+            # Any failure, e.g. a body which isn't JSON: the outcome must
+            # still be recorded, or a probe of the breaker would never end
+            exc_info = sys.exc_info()
+            event.error = ex
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.record(host, ex)
+            self._fire("on_error", event)
+            raise exc_info[0], exc_info[1], exc_info[2]
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.record(host)
+        self._fire("after_response", event)
+        return json_data
+
+    def _get_stream(self, url, datatype=None, api_method="get"):
+        """
+        Sends data access requests to the server, returning the
+        content as a file-like object
+        """
+        return self._send_request(url, "GET", "", datatype, api_method,
+                                  (200,), stream=True)
 
     def _raise_link_exception(self, status, reason, content):
         if status == 400:
@@ -377,6 +793,48 @@ class LinkClient(object):
 
     """ High level API methods """
 
+    def save_snapshot(self, store, datatype, items=None):
+        """
+        Saves the user's items of datatype to store, a
+        snapshot.SnapshotStore. If items is None, all of them are fetched
+        first, with all their fields even in light mode; the tree of
+        tree-structured datatypes in a single request. Heavy fields not
+        loaded in the given items are not saved.
+        """
+        tree_structure = datatype in dict(TREE_STRUCTURED_DATATYPES)
+        if items is None:
+            if tree_structure:
+                items = self._get_resource_descendants(datatype, None,
+                                                       full=True)
+            else:
+                items = self._get_resource_children(datatype, None, False,
+                                                    full=True)
+        store.save(self.auth_handler.access_token.key, datatype, items)
+
+    def load_snapshot(self, store, datatype):
+        """
+        Returns the user's items of datatype saved in store, without any
+        request to the server, or None if there is no snapshot. For
+        tree-structured datatypes, the children of every folder are
+        populated.
+        """
+        json_list = store.load(self.auth_handler.access_token.key, datatype)
+        if json_list is None:
+            return None
+        decoders = self._decoders
+        if datatype in dict(TREE_STRUCTURED_DATATYPES):
+            return self._build_tree(json_list, decoders)
+        return [decoders[data["item_type"]](self, data) for data in json_list]
+
+    def bulk(self, max_workers=4):
+        """
+        Returns a bulk.Bulk collecting many mutations, to be dispatched
+        concurrently with at most max_workers requests at a time.
+        Use it as a context manager to run the operations on exit.
+        """
+        from pyoperalink.bulk import Bulk
+        return Bulk(self, max_workers)
+
     def add(self, element):
         """
         Adds newly created elements to Opera Link. For tree-structured datatypes,
@@ -413,3 +871,13 @@ class LinkClient(object):
         Relocates the item in the tree, placing it after reference_item.
         """
         element.move(reference_item, "after")
+
+
+def _getheader(response, name):
+    """
+    Returns a header of response, from transport.Response as well as
+    from httplib2's responses
+    """
+    if hasattr(response, "getheader"):
+        return response.getheader(name)
+    return response.get(name.lower())
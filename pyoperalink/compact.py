@@ -0,0 +1,74 @@
+"""
+Compact variants of the Opera Link datatypes.
+
+The classes here behave like the ones in datatypes.py, but store their
+fields in __slots__ instead of a per-instance __dict__, which makes them
+several times smaller. Use them when holding large trees in memory:
+
+    >>> from pyoperalink import compact
+    >>> client = LinkClient(auth, registry=compact.registry)
+
+Unlike the regular classes, compact entries don't accept attributes
+other than their fields, and are not instances of their counterparts in
+datatypes.py (they are instances of the same abstract classes, e.g.
+datatypes.BookmarkEntry).
+"""
+
+from __future__ import absolute_import
+
+from pyoperalink import datatypes
+from pyoperalink.decoders import get_decoders
+
+
+def compact(cls, *attributes):
+    """
+    Builds a __slots__-based copy of the datatype class cls, with slots
+    for its fields and the other instance attributes it uses.
+    """
+    # Date and heavy fields are descriptors storing their value in
+    # another attribute
+    slots = tuple(cls._storage(field) for field in cls.fields) + attributes
+    namespace = dict((name, value) for name, value in vars(cls).iteritems()
+                        if name not in ("__dict__", "__weakref__"))
+
+    # Class attributes can't share a name with a slot, they become
+    # defaults set on every new instance instead
+    defaults = [(name, namespace.pop(name)) for name in slots
+                    if name in namespace]
+    namespace["__slots__"] = slots
+    namespace["__module__"] = __name__
+    namespace["_defaults"] = tuple(defaults)
+    if defaults:
+        init = cls.__init__.im_func
+
+        def __init__(self, *args, **kwargs):
+            for name, value in defaults:
+                setattr(self, name, value)
+            init(self, *args, **kwargs)
+        namespace["__init__"] = __init__
+    return type(cls.__name__, cls.__bases__, namespace)
+
+
+Bookmark = compact(datatypes.Bookmark)
+BookmarkFolder = compact(datatypes.BookmarkFolder, "_children")
+BookmarkSeparator = compact(datatypes.BookmarkSeparator)
+Note = compact(datatypes.Note)
+NoteFolder = compact(datatypes.NoteFolder, "_children")
+NoteSeparator = compact(datatypes.NoteSeparator)
+SpeedDial = compact(datatypes.SpeedDial, "position")
+SearchEngine = compact(datatypes.SearchEngine)
+UrlFilter = compact(datatypes.UrlFilter)
+
+registry = {
+    "bookmark": Bookmark,
+    "bookmark_folder": BookmarkFolder,
+    "bookmark_separator": BookmarkSeparator,
+    "note": Note,
+    "note_folder": NoteFolder,
+    "note_separator": NoteSeparator,
+    "speeddial": SpeedDial,
+    "search_engine": SearchEngine,
+    "urlfilter": UrlFilter,
+}
+
+get_decoders(registry)
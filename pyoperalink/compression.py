@@ -0,0 +1,151 @@
+"""
+Compression of the data exchanged with the Opera Link server.
+
+The client asks for gzip or deflate compressed responses, and decodes
+them according to their Content-Encoding. Large request bodies can be
+gzip compressed too, with LinkClient(compress_requests=True); if the
+server refuses them (415 Unsupported Media Type), the client sends the
+request again uncompressed and stops compressing.
+
+The bytes sent and received, before and after compression, are counted
+in the client's compression_stats.
+"""
+
+import threading
+import zlib
+
+from StringIO import StringIO
+
+ACCEPT_ENCODING = "gzip, deflate"
+
+# Bodies smaller than this aren't worth compressing
+MIN_COMPRESSED_SIZE = 1024
+
+
+class CompressionStats(object):
+    """
+    Thread-safe counters of the bytes exchanged with the server.
+
+    response_bytes and request_bytes are the bytes as they were sent on
+    the wire; the decoded_ and uncompressed_ counters are the bytes before
+    compression.
+    """
+
+    def __init__(self):
+        self.response_bytes = 0
+        self.decoded_response_bytes = 0
+        self.request_bytes = 0
+        self.uncompressed_request_bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def saved_bytes(self):
+        return (self.decoded_response_bytes - self.response_bytes +
+                self.uncompressed_request_bytes - self.request_bytes)
+
+    @property
+    def stats(self):
+        return {
+            "response_bytes": self.response_bytes,
+            "decoded_response_bytes": self.decoded_response_bytes,
+            "request_bytes": self.request_bytes,
+            "uncompressed_request_bytes": self.uncompressed_request_bytes,
+            "saved_bytes": self.saved_bytes,
+        }
+
+    def record_response(self, wire_size, decoded_size):
+        self._lock.acquire()
+        try:
+            self.response_bytes += wire_size
+            self.decoded_response_bytes += decoded_size
+        finally:
+            self._lock.release()
+
+    def record_request(self, wire_size, uncompressed_size):
+        self._lock.acquire()
+        try:
+            self.request_bytes += wire_size
+            self.uncompressed_request_bytes += uncompressed_size
+        finally:
+            self._lock.release()
+
+
+def is_supported(encoding):
+    return encoding in ("gzip", "x-gzip", "deflate")
+
+
+def compress(data):
+    """
+    Returns data compressed in the gzip format
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+def decompress(data, encoding):
+    """
+    Returns data decoded from the gzip or deflate Content-Encoding
+    """
+    decompressor = _decompressor(encoding, data)
+    return decompressor.decompress(data) + decompressor.flush()
+
+
+class DecompressingReader(object):
+    """
+    File-like object decoding a compressed response body as it is read
+    """
+
+    def __init__(self, body, encoding, stats=None, chunk_size=65536):
+        self._body = body
+        self._encoding = encoding
+        self._stats = stats
+        self._chunk_size = chunk_size
+        self._decompressor = None
+        self._buffer = StringIO()
+        self._eof = False
+
+    def read(self, size=-1):
+        while not self._eof and (size < 0 or self._buffered() < size):
+            self._fill()
+        data = self._buffer.getvalue()
+        if size >= 0:
+            data, rest = data[:size], data[size:]
+        else:
+            rest = ""
+        self._buffer = StringIO()
+        self._buffer.write(rest)
+        return data
+
+    def close(self):
+        self._body.close()
+
+    def _buffered(self):
+        return self._buffer.tell()
+
+    def _fill(self):
+        chunk = self._body.read(self._chunk_size)
+        if self._decompressor is None:
+            self._decompressor = _decompressor(self._encoding, chunk)
+        if chunk:
+            data = self._decompressor.decompress(chunk)
+        else:
+            data = self._decompressor.flush()
+            self._eof = True
+        self._buffer.write(data)
+        if self._stats is not None:
+            self._stats.record_response(len(chunk), len(data))
+
+
+def _decompressor(encoding, data):
+    if encoding == "deflate" and not _is_zlib_stream(data):
+        # Some servers send raw deflate data, without the zlib header
+        return zlib.decompressobj(-zlib.MAX_WBITS)
+    # gzip or zlib headers are detected automatically
+    return zlib.decompressobj(32 + zlib.MAX_WBITS)
+
+
+def _is_zlib_stream(data):
+    if len(data) < 2:
+        return True
+    return ord(data[0]) & 0x0F == 8 and \
+           (ord(data[0]) << 8 | ord(data[1])) % 31 == 0
@@ -1,14 +1,68 @@
 import datetime
+import re
 
 rfc3339_format = "%Y-%m-%dT%H:%M:%SZ"
 
+# Any RFC 3339 timestamp, with optional fractional seconds and offset
+rfc3339_re = re.compile(r"^(\d{4})-(\d{2})-(\d{2})[Tt ](\d{2}):(\d{2}):(\d{2})"
+                        r"(?:\.(\d+))?(?:[Zz]|([+-])(\d{2}):(\d{2}))$")
+
+# Parsed timestamps, datetimes are immutable so they can be shared
+_rfc3339_cache = {}
+_rfc3339_cache_size = 4096
+
 
 def datetime_from_rfc3339(date_string):
-    if isinstance(date_string, basestring):
-        try:
-            return datetime.datetime.strptime(date_string, rfc3339_format)
-        except ValueError:
-            pass
+    """
+    Parses an RFC 3339 timestamp into a naive datetime in UTC.
+    Returns None if date_string is not a valid timestamp.
+    """
+    if not isinstance(date_string, basestring):
+        return
+    date = _rfc3339_cache.get(date_string)
+    if date is not None:
+        return date
+
+    # strptime is slow, parse the format used by the server by hand,
+    # e.g. 2010-01-02T03:04:05Z
+    s = date_string
+    try:
+        if len(s) == 20 and s[4] == "-" and s[7] == "-" and s[10] == "T" \
+                and s[13] == ":" and s[16] == ":" and s[19] == "Z":
+            date = datetime.datetime(int(s[:4]), int(s[5:7]), int(s[8:10]),
+                                     int(s[11:13]), int(s[14:16]),
+                                     int(s[17:19]))
+        else:
+            date = _parse_rfc3339(s)
+    except ValueError:
+        return
+
+    if date is not None:
+        if len(_rfc3339_cache) >= _rfc3339_cache_size:
+            _rfc3339_cache.clear()
+        _rfc3339_cache[date_string] = date
+    return date
+
+
+def _parse_rfc3339(date_string):
+    match = rfc3339_re.match(date_string)
+    if match is None:
+        return
+    (year, month, day, hour, minute, second,
+     fraction, sign, offset_hours, offset_minutes) = match.groups()
+    microsecond = 0
+    if fraction:
+        microsecond = int(fraction[:6].ljust(6, "0"))
+    date = datetime.datetime(int(year), int(month), int(day), int(hour),
+                             int(minute), int(second), microsecond)
+    if sign:
+        offset = datetime.timedelta(hours=int(offset_hours),
+                                    minutes=int(offset_minutes))
+        if sign == "+":
+            date -= offset
+        else:
+            date += offset
+    return date
 
 
 def datetime_to_rfc3339(date):
@@ -16,11 +70,111 @@ def datetime_to_rfc3339(date):
         return date.strftime(rfc3339_format)
 
 
+def _as_rfc3339(value):
+    if isinstance(value, basestring):
+        return value
+    return datetime_to_rfc3339(value)
+
+
+def _as_datetime(value):
+    """
+    Returns the datetime of value, an RFC 3339 string or a datetime, so
+    that values compare the same whether they were parsed or not.
+    Strings which aren't valid timestamps are returned as they are.
+    """
+    if isinstance(value, basestring):
+        return datetime_from_rfc3339(value) or value
+    return value
+
+
+class DateField(object):
+    """
+    Descriptor for the date_fields of Link datatypes.
+
+    RFC 3339 strings received from the server are stored as they are, in
+    the attribute named after the field with a leading underscore, and
+    only parsed into a datetime when the field is first read.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.storage = "_" + name
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        value = getattr(instance, self.storage)
+        if isinstance(value, basestring):
+            value = datetime_from_rfc3339(value)
+            # Strings which aren't valid timestamps are kept, as received
+            if value is not None:
+                setattr(instance, self.storage, value)
+        return value
+
+    def __set__(self, instance, value):
+        setattr(instance, self.storage, value)
+
+
+class _NotLoaded(object):
+    """
+    Value of the heavy fields of entries fetched in light mode, until
+    they are loaded
+    """
+
+    def __repr__(self):
+        return "NOT_LOADED"
+
+    def __nonzero__(self):
+        return False
+
+NOT_LOADED = _NotLoaded()
+
+
+class HeavyField(object):
+    """
+    Descriptor for the heavy_fields of Link datatypes.
+
+    Like DateField, it stores the value in the attribute named after the
+    field with a leading underscore. Entries fetched in light mode are
+    created without the values of their heavy fields, which are fetched
+    from the server when one of them is first read.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.storage = "_" + name
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        value = getattr(instance, self.storage)
+        if value is NOT_LOADED:
+            instance._load_heavy_fields()
+            value = getattr(instance, self.storage)
+        return value
+
+    def __set__(self, instance, value):
+        setattr(instance, self.storage, value)
+
+
 class LinkEntry(object):
     """
     Abstract, base class for objects of all datatypes stored at server
     """
 
+    # The abstract classes only declare __slots__ so that compact,
+    # __dict__-less variants of the datatypes can be built on them,
+    # see compact.py
+    __slots__ = ("_conn", "id", "_snapshot")
+
+    # Fields holding datetimes, sent to and received from the server
+    # as RFC 3339 strings. Each needs a DateField on the class.
+    date_fields = ()
+
+    # Fields holding large data, left out of listings fetched in light
+    # mode. Each needs a HeavyField on the class.
+    heavy_fields = ()
+
     def __init__(self, conn=None, id=None, **kwargs):
         """
         Initializes Link datatype instances,
@@ -39,14 +193,25 @@ class LinkEntry(object):
         self.id = id
         self._set_fields(kwargs)
 
-    def _to_python(self):
+        # Items fetched from the server start out unchanged
+        self._snapshot = None
+        if conn is not None:
+            self._mark_clean()
+
+    def _to_python(self, fields=None):
         """
-        Returns dict representing object fields
+        Returns dict representing object fields, or only
+        the passed fields if any
         """
-        return dict((key, val)
-                        for key, val in vars(self).iteritems()
-                            if key in self.fields and val is not None)
-
+        d = {}
+        for key in fields or self.fields:
+            val = self._raw_value(key)
+            if val is None or val is NOT_LOADED:
+                continue
+            if key in self.date_fields:
+                val = _as_rfc3339(val)
+            d[key] = val
+        return d
 
     def _set_fields(self, params):
         """
@@ -56,6 +221,72 @@ class LinkEntry(object):
             if key in self.fields:
                 setattr(self, key, params[key])
 
+    def _raw_value(self, field):
+        """
+        Returns the stored value of field, without parsing date strings
+        or loading heavy fields
+        """
+        return getattr(self, self._storage(field))
+
+    @classmethod
+    def _storage(cls, field):
+        """
+        Returns the attribute storing the value of field
+        """
+        if field in cls.date_fields or field in cls.heavy_fields:
+            return "_" + field
+        return field
+
+    def _load_heavy_fields(self):
+        """
+        Fetches the heavy fields left out when the entry was fetched in
+        light mode
+        """
+        if self._conn is None or self.id is None:
+            raise ValueError("Cannot load fields of locally created items")
+        properties = self._conn._get_resource_data(self.datatype,
+                                                   self.id)["properties"]
+        snapshot = self._snapshot and list(self._snapshot)
+        for index, field in enumerate(self.fields):
+            storage = "_" + field
+            if field not in self.heavy_fields or \
+                    getattr(self, storage) is not NOT_LOADED:
+                continue
+            value = properties.get(field)
+            setattr(self, storage, value)
+            # Loaded values are the ones saved on the server
+            if snapshot and snapshot[index] is NOT_LOADED:
+                snapshot[index] = value
+        if snapshot:
+            self._snapshot = tuple(snapshot)
+
+    def _mark_clean(self):
+        """
+        Remembers the current field values as the ones saved on the server
+        """
+        self._snapshot = tuple(self._raw_value(field)
+                               for field in self.fields)
+
+    def _changed_fields(self):
+        """
+        Returns the fields changed since the item was last loaded from
+        or saved to the server. All fields count as changed for new items.
+        """
+        if self._snapshot is None:
+            return list(self.fields)
+        changed = []
+        for field, saved in zip(self.fields, self._snapshot):
+            val = self._raw_value(field)
+            if val is saved or val == saved:
+                continue
+            # Date strings are replaced by datetimes when they are read;
+            # formatting them again would lose fractions and offsets
+            if field in self.date_fields and \
+                    _as_datetime(val) == _as_datetime(saved):
+                continue
+            changed.append(field)
+        return changed
+
     def delete(self):
         """
         Invoke method for element deletion from the server
@@ -67,11 +298,18 @@ class LinkEntry(object):
         """
         Sends the item to the Opera Link server.
         If there are any concurrent changes on the server, it"ll update too
+
+        Only the fields changed since the item was fetched or last saved are
+        sent. If nothing has changed, no request is made.
         """
+        changed = self._changed_fields()
+        if not changed:
+            return
         method = getattr(self._conn, "update_%s" % self.datatype)
-        resp = method(self.id, self._to_python())
+        resp = method(self.id, self._to_python(changed))
 
         self._set_fields(resp[0]["properties"])
+        self._mark_clean()
 
     def _add(self, parent_id=None):
         """
@@ -86,6 +324,7 @@ class LinkEntry(object):
 
         self.id = resp[0]["id"]
         self._set_fields(resp[0]["properties"])
+        self._mark_clean()
 
     def __str__(self):
         fields = "\n".join("%s:%s" % (field, value.encode("utf-8"))
@@ -99,6 +338,8 @@ class TreeEntry(LinkEntry):
     Abstract class for all elements that are folder content
     """
 
+    __slots__ = ()
+
     @property
     def is_folder(self):
         return False
@@ -117,39 +358,58 @@ class TreeEntry(LinkEntry):
         if reference_item:
             resp = method(self.id, relative_position, reference_item.id)
         else:
-            resp = method(self.id, {"reference_item": ""})
+            resp = method(self.id, relative_position)
 
         self._set_fields(resp[0]["properties"])
+        self._mark_clean()
 
     def get_trash_folder(self):
-        root = self.get_root_folder()
-        if root:
-            return root.trash_folder
+        """
+        Fetches the root-level items of the item's tree and returns its
+        trash folder, or None. index.ItemIndex finds it without a request.
+        """
+        if not self._conn:
+            raise ValueError("Cannot fetch the trash folder for locally "
+                             "created items")
+        for item in self._conn._get_resource_children(self.datatype, None,
+                                                      True):
+            if item.is_folder and item.type == "trash":
+                return item
 
 
 class BookmarkEntry(TreeEntry):
     """ Common class for elements that can be inside Opera bookmarks """
+    __slots__ = ()
     datatype = "bookmark"
 
-    def __init__(self, *args, **kwargs):
-        super(BookmarkEntry, self).__init__(*args, **kwargs)
-
 
 class BookmarkFolder(BookmarkEntry):
     fields = ("title", "nickname", "description",
               "type", "target")
     item_type = "bookmark_folder"
 
+    # Populated when the folder was fetched as part of a whole tree
+    _children = None
+
     @property
     def is_folder(self):
         return True
 
     @property
     def children(self):
+        if self._children is not None:
+            return self._children
         if not self._conn:
             raise ValueError("Cannot fetch children for locally created items")
         return self._conn._get_resource_children(self.datatype, self.id, False)
 
+    @children.setter
+    def children(self, children):
+        """
+        Sets the children of the folder, e.g. to build a tree locally
+        """
+        self._children = children
+
 
 class BookmarkSeparator(BookmarkEntry):
     fields = ()
@@ -159,31 +419,17 @@ class BookmarkSeparator(BookmarkEntry):
 class Bookmark(BookmarkEntry):
     fields = ("title", "nickname", "description", "uri",
               "icon", "created", "visited");
+    date_fields = ("created", "visited")
+    heavy_fields = ("icon",)
     item_type = "bookmark"
 
-    def __init__(self, *args, **kwargs):
-        super(Bookmark, self).__init__(*args, **kwargs)
-        self.created = datetime_from_rfc3339(self.created)
-        self.visited = datetime_from_rfc3339(self.visited)
-
-    def update(self):
-        super(Bookmark, self).update()
-        self.created = datetime_from_rfc3339(self.created)
-        self.visited = datetime_from_rfc3339(self.visited)
-
-    def _add(self, item_id=None):
-        super(Bookmark, self)._add(item_id)
-        self.created = datetime_from_rfc3339(self.created)
-        self.visited = datetime_from_rfc3339(self.visited)
-
-    def _to_python(self):
-        d = super(Bookmark, self)._to_python()
-        d["created"] = datetime_to_rfc3339(self.created)
-        d["visited"] = datetime_to_rfc3339(self.visited)
-        return d
+    created = DateField("created")
+    visited = DateField("visited")
+    icon = HeavyField("icon")
 
 
 class NoteEntry(TreeEntry):
+    __slots__ = ()
     datatype = "note"
 
 
@@ -191,16 +437,28 @@ class NoteFolder(NoteEntry):
     fields = ("title", "type", "target")
     item_type = "note_folder"
 
+    # Populated when the folder was fetched as part of a whole tree
+    _children = None
+
     @property
     def is_folder(self):
         return True
 
     @property
     def children(self):
+        if self._children is not None:
+            return self._children
         if not self._conn:
             raise ValueError("Cannot fetch children for locally created items")
         return self._conn._get_resource_children(self.datatype, self.id, False)
 
+    @children.setter
+    def children(self, children):
+        """
+        Sets the children of the folder, e.g. to build a tree locally
+        """
+        self._children = children
+
 
 class NoteSeparator(NoteEntry):
     fields = ()
@@ -210,45 +468,48 @@ class NoteSeparator(NoteEntry):
 class Note(NoteEntry):
     item_type = "note"
     fields = ("content", "created", "uri");
+    date_fields = ("created",)
+    heavy_fields = ("content",)
 
-    def __init__(self, *args, **kwargs):
-        super(Note, self).__init__(*args, **kwargs)
-        self.created = datetime_from_rfc3339(self.created)
-
-    def _to_python(self):
-        d = super(Note, self)._to_python()
-        d["created"] = datetime_to_rfc3339(self.created)
-        return d
-
-    def _add(self, item_id=None):
-        super(Note, self)._add(item_id)
-        self.created = datetime_from_rfc3339(self.created)
-
-    def update(self):
-        super(Note, self).update()
-        self.created = datetime_from_rfc3339(self.created)
+    created = DateField("created")
+    content = HeavyField("content")
 
 
 class SpeedDial(LinkEntry):
     fields = ("title", "uri", "icon", "thumbnail")
+    heavy_fields = ("icon", "thumbnail")
     datatype = "speeddial"
     item_type = "speeddial"
 
+    icon = HeavyField("icon")
+    thumbnail = HeavyField("thumbnail")
+
+    # The base class is called directly, rather than through super(),
+    # so that the methods can be shared with compact.SpeedDial
     def __init__(self, *args, **kwargs):
-        super(SpeedDial, self).__init__(*args, **kwargs)
+        LinkEntry.__init__(self, *args, **kwargs)
         self.position = None
         if self.id is not None:
             self.position = int(self.id)
 
     def _add(self):
-        super(SpeedDial,self)._add(self.position)
+        LinkEntry._add(self, self.position)
+
+    def _after_decode(self):
+        """
+        Completes instances created by the decoders, which skip __init__
+        """
+        self.position = int(self.id)
 
 class SearchEngine(LinkEntry):
     fields = ("title", "uri", "encoding", "is_post",
               "key", "post_query", "icon")
+    heavy_fields = ("icon",)
     datatype = "search_engine"
     item_type = "search_engine"
 
+    icon = HeavyField("icon")
+
 class UrlFilter(LinkEntry):
     fields = ("content", "type")
     datatype = "urlfilter"
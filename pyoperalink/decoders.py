@@ -0,0 +1,97 @@
+"""
+Decoders creating datatype instances from the server's data.
+
+Every item received from the server would otherwise go through the
+generic LinkEntry.__init__, which loops over the fields of the class
+twice. Instead, a function specialised for each datatype class is
+generated once, assigning every field directly:
+
+    >>> decoders = get_decoders(datatypes.registry)
+    >>> bookmark = decoders["bookmark"](client, data)
+
+The server's data is left unchanged. Light decoders leave the heavy
+fields of the entries NOT_LOADED, to be fetched when first read.
+"""
+
+from __future__ import absolute_import
+
+from pyoperalink import datatypes
+
+DECODER_TEMPLATE = """
+def decode(conn, data):
+    get = data["properties"].get
+    item = new(cls)
+    item._conn = conn
+    item.id = data["id"]
+%(assignments)s
+    item._snapshot = (%(snapshot)s)
+%(finish)s
+    return item
+"""
+
+_decoders = {}
+
+
+def build_decoder(cls, light=False):
+    """
+    Returns a function creating an instance of cls, as received from the
+    server, out of the item's data. If light is True, heavy fields are
+    not decoded.
+    """
+    assignments = []
+    snapshot = []
+    for field in cls.fields:
+        # Date strings go to the DateField's storage, to be parsed lazily,
+        # and heavy fields to the HeavyField's
+        attribute = cls._storage(field)
+        if light and field in cls.heavy_fields:
+            value = "NOT_LOADED"
+        else:
+            value = "get(%r)" % field
+        assignments.append("    item.%s = %s = %s" % (attribute, attribute,
+                                                      value))
+        snapshot.append(attribute + ",")
+
+    # Defaults which compact classes set in __init__
+    defaults = getattr(cls, "_defaults", ())
+    for name, value in defaults:
+        assignments.append("    item.%s = defaults[%r]" % (name, name))
+
+    finish = ""
+    if hasattr(cls, "_after_decode"):
+        finish = "    item._after_decode()"
+
+    source = DECODER_TEMPLATE % {
+        "assignments": "\n".join(assignments),
+        "snapshot": " ".join(snapshot),
+        "finish": finish,
+    }
+    namespace = {
+        "new": object.__new__,
+        "cls": cls,
+        "defaults": dict(defaults),
+        "NOT_LOADED": datatypes.NOT_LOADED,
+    }
+    exec source in namespace
+    decode = namespace["decode"]
+    decode.__name__ = "decode_%s" % cls.item_type
+    return decode
+
+
+def get_decoders(registry, light=False):
+    """
+    Returns a dict mapping the item types of registry to decoders for
+    their classes. The decoders are built once per registry.
+    """
+    key = (id(registry), light)
+    try:
+        return _decoders[key][1]
+    except KeyError:
+        decoders = dict((item_type, build_decoder(cls, light))
+                        for item_type, cls in registry.iteritems())
+        # The registry is kept alive so that its id can't be reused
+        _decoders[key] = (registry, decoders)
+        return decoders
+
+
+get_decoders(datatypes.registry)
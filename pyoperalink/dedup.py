@@ -0,0 +1,149 @@
+"""
+Detection of duplicate bookmarks.
+
+    >>> groups = find_duplicates(client.get_bookmark_tree())
+    >>> sum(len(group.duplicates) for group in groups)
+    1024
+    >>> results = trash_duplicates(client, groups)
+
+Bookmarks are duplicates when their URIs are the same once normalised by
+dedup_key: beyond index.normalize_uri (case of the scheme and host,
+default ports, fragments), trailing slashes and tracking parameters,
+like utm_source, are left out.
+
+The tree is walked once, grouping the bookmarks by key in a dict, so
+the time grows linearly with the number of bookmarks, without comparing
+them pairwise. Bookmarks in the trash folder are skipped.
+
+In each group, the keeper is the most recently visited bookmark, or the
+oldest one with keep="created"; ties go to the first one in the tree.
+The others can be moved to the trash with a bulk, see bulk.py.
+"""
+
+from __future__ import absolute_import
+
+from pyoperalink.index import normalize_uri
+
+# Query parameters added by trackers, which don't change the page
+TRACKING_PARAMS = frozenset(["fbclid", "gclid", "dclid", "msclkid", "yclid",
+                             "mc_cid", "mc_eid", "_ga", "_hsenc", "_hsmi"])
+TRACKING_PREFIXES = ("utm_",)
+
+KEEP_ORDERS = ("visited", "created")
+
+
+def dedup_key(uri):
+    """
+    Returns the key of uri shared by the URIs of duplicate bookmarks
+    """
+    uri = normalize_uri(uri)
+    if not uri:
+        return uri
+    base, question, query = uri.partition("?")
+    if query:
+        params = [param for param in query.split("&")
+                  if param and not _is_tracking(param.partition("=")[0])]
+        query = "&".join(params)
+    if base.endswith("/") and base.count("/") > 3:
+        base = base.rstrip("/")
+    if query:
+        return base + "?" + query
+    return base
+
+
+def _is_tracking(name):
+    name = name.lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PREFIXES)
+
+
+class DuplicateGroup(object):
+    """
+    Bookmarks sharing a dedup_key: the one kept, and its duplicates
+    """
+
+    def __init__(self, key, keeper, duplicates):
+        self.key = key
+        self.keeper = keeper
+        self.duplicates = duplicates
+
+    def __repr__(self):
+        return "<%s: %s, %d duplicates>" % (self.__class__.__name__,
+                                            self.key, len(self.duplicates))
+
+
+def find_duplicates(items, keep="visited"):
+    """
+    Returns the DuplicateGroups of the bookmarks in items, a list of
+    entries with the children of folders populated, e.g. as returned by
+    get_bookmark_tree(). keep is "visited" or "created".
+    """
+    if keep not in KEEP_ORDERS:
+        raise ValueError("keep must be one of %s" % ", ".join(KEEP_ORDERS))
+
+    # URI: key, as the same URIs are often found many times
+    keys = {}
+    # key: first bookmark with the key, and key: all of them if several
+    first = {}
+    groups = {}
+    order = []
+    stack = [iter(items)]
+    while stack:
+        for entry in stack[-1]:
+            if entry.is_folder:
+                if getattr(entry, "type", None) != "trash":
+                    stack.append(iter(entry._children or ()))
+                    break
+                continue
+            if entry.item_type != "bookmark":
+                continue
+            uri = entry.uri
+            key = keys.get(uri)
+            if key is None:
+                key = keys[uri] = dedup_key(uri)
+            if not key:
+                continue
+            existing = first.setdefault(key, entry)
+            if existing is not entry:
+                group = groups.get(key)
+                if group is None:
+                    group = groups[key] = [existing]
+                    order.append(key)
+                group.append(entry)
+        else:
+            stack.pop()
+
+    result = []
+    for key in order:
+        bookmarks = groups[key]
+        if keep == "visited":
+            keeper = max(bookmarks, key=_last_visit)
+        else:
+            keeper = min(bookmarks, key=_creation)
+        result.append(DuplicateGroup(key, keeper,
+                                     [bookmark for bookmark in bookmarks
+                                      if bookmark is not keeper]))
+    return result
+
+
+def _last_visit(bookmark):
+    # Bookmarks never visited come last
+    visited = bookmark.visited
+    return visited is not None, visited
+
+
+def _creation(bookmark):
+    # Bookmarks without a creation date come last
+    created = bookmark.created
+    return created is None, created
+
+
+def trash_duplicates(client, groups, max_workers=4):
+    """
+    Moves the duplicates of groups to the trash folder, with a bulk of
+    client, and returns the bulk.BulkResults
+    """
+    with client.bulk(max_workers) as bulk:
+        for group in groups:
+            for bookmark in group.duplicates:
+                bulk.trash(bookmark)
+    return bulk.results
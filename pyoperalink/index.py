@@ -0,0 +1,509 @@
+"""
+In-memory indexes over a loaded tree or list of items.
+
+    >>> index = ItemIndex(client.get_bookmark_tree())
+    >>> index.install(client)
+    >>> index.get("4E1601F6F30511DB9CA51FD19A7AAECA")
+    >>> index.find_uri("HTTP://www.opera.com:80/#top")
+    [<pyoperalink.datatypes.Bookmark object at 0x...>]
+    >>> index.parent(bookmark)
+    >>> index.prefix("uri", "https://link.opera.com/")
+    >>> index.range("created", datetime(2010, 1, 1), datetime(2011, 1, 1))
+
+Entries are indexed by id, by normalised URI (see normalize_uri) and by
+nickname, regardless of case, and the parent folder of every entry is
+kept. The URIs, titles and creation dates are also kept sorted, for
+prefix and range lookups with bisect. Lookups don't make any request.
+
+Once installed on a client, the index follows the changes made through
+it, e.g. by datatype methods, bulks or sync.apply_operations: created
+entries are added, updated ones reindexed, and moved, trashed or deleted
+ones relocated or removed, in the children of the folders of the tree as
+well. Created entries are decoded from the server's response, so they
+are not the objects passed to client.add(). Entries changed locally,
+without the client, must be reindexed with reindex().
+"""
+
+from __future__ import absolute_import
+
+import re
+import threading
+
+from bisect import bisect_left, insort
+
+from pyoperalink.client import TREE_STRUCTURED_DATATYPES
+from pyoperalink.datatypes import datetime_from_rfc3339
+
+# Ports left out of normalised URIs
+DEFAULT_PORTS = {"http": "80", "https": "443", "ftp": "21"}
+
+# Splits URIs into scheme, host (with user and port), path and query,
+# see RFC 3986, appendix B
+uri_re = re.compile(r"([^:/?#]+):(?://([^/?#]*))?([^?#]*)(?:\?([^#]*))?",
+                    re.DOTALL)
+
+
+def normalize_uri(uri):
+    """
+    Returns uri in a form shared by the URIs of the same page: without
+    surrounding spaces and fragment, with the scheme and host in lower
+    case, without the scheme's default port, and with a path.
+    """
+    if not uri:
+        return uri
+    uri = uri.strip()
+    match = uri_re.match(uri)
+    if match is None:
+        return uri
+    scheme, netloc, path, query = match.groups()
+    scheme = scheme.lower()
+    query = query and "?" + query or ""
+    if netloc is None:
+        # opera:, javascript: and other URIs without a host
+        return scheme + ":" + path + query
+
+    userinfo, at, host = netloc.rpartition("@")
+    host = host.lower()
+    port = DEFAULT_PORTS.get(scheme)
+    if port and host.endswith(":" + port):
+        host = host[:-len(port) - 1]
+    return "%s://%s%s%s%s%s" % (scheme, userinfo, at, host, path or "/",
+                                query)
+
+
+def _lower(value):
+    if value:
+        return value.lower()
+
+
+def _as_datetime(value):
+    if isinstance(value, basestring):
+        return datetime_from_rfc3339(value)
+    return value
+
+
+# Fields with a hash index, and the keys they are indexed by
+HASHED_FIELDS = {
+    "uri": normalize_uri,
+    "nickname": _lower,
+}
+
+def _uri_prefix(prefix):
+    """
+    Returns the start of normalised URIs matching the start of a URI
+    """
+    prefix = prefix.lstrip()
+    scheme, separator, rest = prefix.partition("://")
+    if not separator:
+        return prefix.lower()
+    host, slash, path = rest.partition("/")
+    return scheme.lower() + separator + host.lower() + slash + path
+
+
+# Fields kept sorted, and the keys they are sorted by
+SORTED_FIELDS = {
+    "uri": normalize_uri,
+    "title": _lower,
+    "created": _as_datetime,
+}
+
+# Sorted fields with prefix lookups, and the keys of the prefixes
+PREFIX_FIELDS = {
+    "uri": _uri_prefix,
+    "title": _lower,
+}
+
+INDEXED_FIELDS = frozenset(HASHED_FIELDS) | frozenset(SORTED_FIELDS)
+
+
+class SortedKeys(object):
+    """
+    Sorted list of (key, item ID) pairs
+    """
+
+    def __init__(self):
+        self._pairs = []
+
+    def add(self, key, item_id):
+        insort(self._pairs, (key, item_id))
+
+    def extend(self, pairs):
+        """
+        Adds many pairs at once, sorting them once instead of inserting
+        each in turn
+        """
+        self._pairs.extend(pairs)
+        self._pairs.sort()
+
+    def remove(self, key, item_id):
+        index = bisect_left(self._pairs, (key, item_id))
+        if index < len(self._pairs) and self._pairs[index] == (key, item_id):
+            del self._pairs[index]
+
+    def range(self, low=None, high=None):
+        """
+        Returns the IDs of the items with low <= key < high, in order
+        """
+        start, end = 0, len(self._pairs)
+        if low is not None:
+            start = bisect_left(self._pairs, (low,))
+        if high is not None:
+            end = bisect_left(self._pairs, (high,))
+        return [item_id for key, item_id in self._pairs[start:end]]
+
+    def prefix(self, prefix):
+        """
+        Returns the IDs of the items whose key starts with prefix, in order
+        """
+        pairs = self._pairs
+        ids = []
+        for index in xrange(bisect_left(pairs, (prefix,)), len(pairs)):
+            key, item_id = pairs[index]
+            if not key.startswith(prefix):
+                break
+            ids.append(item_id)
+        return ids
+
+
+class ItemIndex(object):
+    """
+    Thread-safe indexes over the entries of one datatype.
+
+    items is the list of top-level entries, with the children of folders
+    populated as far as they are to be indexed, e.g. as returned by
+    get_bookmark_tree() or load_snapshot(). It is kept in roots, and
+    updated along with the children of the folders.
+    """
+
+    def __init__(self, items=(), datatype=None):
+        if not isinstance(items, list):
+            items = list(items)
+        if datatype is None and items:
+            datatype = items[0].datatype
+        self.datatype = datatype
+        self.roots = items
+        self._entries = {}
+        # item ID: parent folder ID, None at the root level
+        self._parents = {}
+        # item ID: {field: key}, as indexed
+        self._keys = {}
+        self._hashes = dict((field, {}) for field in HASHED_FIELDS)
+        self._sorted = dict((field, SortedKeys()) for field in SORTED_FIELDS)
+        self._hooks = {}
+        self._lock = threading.RLock()
+        # field: (key, item ID) pairs of the sorted fields, sorted once
+        pairs = dict((field, []) for field in SORTED_FIELDS)
+        for entry in items:
+            self._index_tree(entry, None, pairs)
+        for field, field_pairs in pairs.iteritems():
+            self._sorted[field].extend(field_pairs)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, item_id):
+        return _id(item_id) in self._entries
+
+    def __iter__(self):
+        return iter(self._entries.values())
+
+    def get(self, item_id, default=None):
+        return self._entries.get(item_id, default)
+
+    def parent(self, entry):
+        """
+        Returns the folder holding entry, given as an entry or an ID, or
+        None at the root level
+        """
+        return self._entries.get(self._parents.get(_id(entry)))
+
+    def ancestors(self, entry):
+        """
+        Returns the folders holding entry, from its parent up to the root
+        level
+        """
+        self._lock.acquire()
+        try:
+            folders = []
+            folder = self.parent(entry)
+            while folder is not None:
+                folders.append(folder)
+                folder = self.parent(folder)
+            return folders
+        finally:
+            self._lock.release()
+
+    @property
+    def trash_folder(self):
+        """
+        The root-level trash folder, or None
+        """
+        for entry in self.roots:
+            if entry.is_folder and getattr(entry, "type", None) == "trash":
+                return entry
+
+    def find_uri(self, uri):
+        """
+        Returns the entries whose URI is uri, once normalised
+        """
+        return self._find("uri", uri)
+
+    def find_nickname(self, nickname):
+        """
+        Returns the entries with nickname, regardless of case
+        """
+        return self._find("nickname", nickname)
+
+    def prefix(self, field, prefix):
+        """
+        Returns the entries whose field starts with prefix, sorted by
+        field. field is one of PREFIX_FIELDS; URIs are compared normalised
+        and titles regardless of case.
+        """
+        if field not in PREFIX_FIELDS:
+            raise ValueError("No prefix lookups on %s" % field)
+        self._lock.acquire()
+        try:
+            key = PREFIX_FIELDS[field](prefix)
+            if not key:
+                return []
+            return self._lookup(self._sorted[field].prefix(key))
+        finally:
+            self._lock.release()
+
+    def range(self, field, low=None, high=None):
+        """
+        Returns the entries whose field is at least low and below high,
+        sorted by field. Either bound can be None. field is one of
+        SORTED_FIELDS; creation dates are given as datetimes.
+        """
+        self._lock.acquire()
+        try:
+            ids = self._sorted[field].range(self._key(field, low),
+                                            self._key(field, high))
+            return self._lookup(ids)
+        finally:
+            self._lock.release()
+
+    def add(self, entry, parent=None):
+        """
+        Indexes entry and its populated descendants, at the end of parent
+        (an entry or an ID) if given, of the root level otherwise. An
+        indexed entry with the same ID is replaced, where it is.
+        """
+        self._lock.acquire()
+        try:
+            old = self._entries.get(entry.id)
+            if old is None:
+                parent_id = _id(parent)
+                siblings = self._siblings(parent_id)
+                if siblings is not None:
+                    siblings.append(entry)
+            else:
+                parent_id = self._parents[entry.id]
+                self._unindex_tree(old)
+                siblings = self._siblings(parent_id)
+                index = siblings and _index(siblings, old)
+                if index is not None:
+                    siblings[index] = entry
+            self._index_tree(entry, parent_id)
+        finally:
+            self._lock.release()
+
+    def remove(self, entry):
+        """
+        Removes entry, given as an entry or an ID, and its descendants
+        """
+        self._lock.acquire()
+        try:
+            entry = self._entries.get(_id(entry))
+            if entry is not None:
+                self._detach(entry)
+                self._unindex_tree(entry)
+        finally:
+            self._lock.release()
+
+    def reindex(self, entry):
+        """
+        Updates the indexes with the current fields of entry
+        """
+        self._lock.acquire()
+        try:
+            if entry.id in self._entries:
+                self._unindex_fields(entry.id)
+                self._index_fields(entry)
+        finally:
+            self._lock.release()
+
+    def install(self, client):
+        """
+        Makes the index follow the changes made through client
+        """
+        hook = lambda event: self._after_change(client, event)
+        self._hooks[client] = hook
+        client.add_hook("after_change", hook)
+
+    def uninstall(self, client):
+        client.remove_hook("after_change", self._hooks.pop(client))
+
+    def _after_change(self, client, event):
+        if event.datatype != self.datatype:
+            return
+        data = event.data and event.data[0]
+        self._lock.acquire()
+        try:
+            if event.api_method == "create":
+                parent_id = None
+                if self.datatype in dict(TREE_STRUCTURED_DATATYPES):
+                    parent_id = event.item_id or None
+                if parent_id is None or parent_id in self._entries:
+                    entry = client._decoders[data["item_type"]](client, data)
+                    self.add(entry, parent_id)
+            elif event.api_method == "delete":
+                self.remove(event.item_id)
+            else:
+                entry = self._entries.get(event.item_id)
+                if entry is None:
+                    return
+                if event.api_method == "move":
+                    self._move(entry, event.params["relative_position"],
+                               event.params["reference_item"])
+                elif event.api_method == "trash":
+                    trash = self.trash_folder
+                    if trash is None:
+                        self.remove(entry)
+                    else:
+                        self._move(entry, "into", trash)
+                if data and entry.id in self._entries:
+                    entry._set_fields(data["properties"])
+                    entry._mark_clean()
+                    self.reindex(entry)
+        finally:
+            self._lock.release()
+
+    def _move(self, entry, relative_position, reference):
+        """
+        Moves entry as the server does; it is removed if its new place
+        is outside of the index
+        """
+        if reference:
+            reference = self._entries.get(_id(reference))
+            if reference is None:
+                self.remove(entry)
+                return
+        else:
+            reference = None
+        if reference is entry:
+            return
+        self._detach(entry)
+        if relative_position == "into":
+            parent_id = _id(reference)
+            siblings = self._siblings(parent_id)
+            if siblings is not None:
+                siblings.append(entry)
+        else:
+            parent_id = self._parents[reference.id]
+            siblings = self._siblings(parent_id)
+            if siblings is not None:
+                index = _index(siblings, reference)
+                if relative_position == "after":
+                    index += 1
+                siblings.insert(index, entry)
+        self._parents[entry.id] = parent_id
+
+    def _find(self, field, value):
+        self._lock.acquire()
+        try:
+            ids = self._hashes[field].get(self._key(field, value), ())
+            return self._lookup(ids)
+        finally:
+            self._lock.release()
+
+    def _lookup(self, ids):
+        return [self._entries[item_id] for item_id in ids]
+
+    def _key(self, field, value):
+        if value is None:
+            return None
+        if field in HASHED_FIELDS:
+            return HASHED_FIELDS[field](value)
+        return SORTED_FIELDS[field](value)
+
+    def _siblings(self, parent_id):
+        """
+        Returns the list holding the children of parent_id, or None if
+        they aren't populated
+        """
+        if parent_id is None:
+            return self.roots
+        return getattr(self._entries.get(parent_id), "_children", None)
+
+    def _detach(self, entry):
+        siblings = self._siblings(self._parents[entry.id])
+        if siblings is not None:
+            index = _index(siblings, entry)
+            if index is not None:
+                del siblings[index]
+
+    def _index_tree(self, entry, parent_id, pairs=None):
+        self._entries[entry.id] = entry
+        self._parents[entry.id] = parent_id
+        self._index_fields(entry, pairs)
+        for child in getattr(entry, "_children", None) or ():
+            self._index_tree(child, entry.id, pairs)
+
+    def _unindex_tree(self, entry):
+        for child in getattr(entry, "_children", None) or ():
+            self._unindex_tree(child)
+        self._unindex_fields(entry.id)
+        del self._entries[entry.id]
+        del self._parents[entry.id]
+
+    def _index_fields(self, entry, pairs=None):
+        """
+        Indexes the fields of entry. The keys of the sorted fields are
+        appended to pairs if given, to be sorted later.
+        """
+        keys = {}
+        for field in INDEXED_FIELDS:
+            if field not in entry.fields:
+                continue
+            key = self._key(field, entry._raw_value(field))
+            if key is None:
+                continue
+            keys[field] = key
+            if field in HASHED_FIELDS:
+                self._hashes[field].setdefault(key, []).append(entry.id)
+            if field not in SORTED_FIELDS:
+                continue
+            if pairs is not None:
+                pairs[field].append((key, entry.id))
+            else:
+                self._sorted[field].add(key, entry.id)
+        self._keys[entry.id] = keys
+
+    def _unindex_fields(self, item_id):
+        for field, key in self._keys.pop(item_id).iteritems():
+            if field in HASHED_FIELDS:
+                ids = self._hashes[field][key]
+                ids.remove(item_id)
+                if not ids:
+                    del self._hashes[field][key]
+            if field in SORTED_FIELDS:
+                self._sorted[field].remove(key, item_id)
+
+
+def _id(entry):
+    """
+    Returns the ID of entry, given as an entry or an ID
+    """
+    return getattr(entry, "id", entry)
+
+
+def _index(siblings, entry):
+    """
+    Returns the position of entry in siblings, compared by identity
+    """
+    for index, sibling in enumerate(siblings):
+        if sibling is entry:
+            return index
@@ -0,0 +1,250 @@
+"""
+Instrumentation of the requests sent by LinkClient.
+
+Hooks are called with a RequestEvent for every request:
+
+    >>> def log_slow(event):
+    ...     if event.latency > 1:
+    ...         print event
+    >>> client.add_hook("after_response", log_slow)
+
+before_request - before the request is signed and sent
+after_response - once a successful response has been received and decoded
+on_error - when the request fails, with the exception raised in
+           event.error: a LinkError, or e.g. a ValueError for a response
+           which isn't JSON
+
+Changes applied on the server are reported too, once they succeed:
+
+after_change - called with a ChangeEvent after every successful create,
+               update, move, trash or delete
+
+MetricsAggregator collects counts and latency percentiles of requests,
+per datatype and API method:
+
+    >>> metrics = MetricsAggregator()
+    >>> metrics.install(client)
+    >>> ...
+    >>> metrics.summary()[("bookmark", "children")]["p90"]
+"""
+
+import random
+import threading
+
+HOOK_EVENTS = ("before_request", "after_response", "on_error",
+               "after_change")
+
+
+class RequestEvent(object):
+    """
+    A request sent to the server.
+
+    api_method is the name of the API call ("get", "children",
+    "descendants", "create", "update", ...). attempt counts from 0; it is
+    above 0 for the retries of a failed request. Times are in seconds,
+    sizes in bytes as sent on the wire, possibly compressed; they are None
+    until known. Streamed responses are reported once their headers are
+    received, so their response_bytes and decode_time are None.
+    """
+
+    def __init__(self, datatype, api_method, method, url, attempt=0):
+        self.datatype = datatype
+        self.api_method = api_method
+        self.method = method
+        self.url = url
+        self.attempt = attempt
+        self.status = None
+        self.error = None
+        self.signing_time = None
+        self.network_time = None
+        self.decode_time = None
+        self.request_bytes = None
+        self.response_bytes = None
+
+    @property
+    def latency(self):
+        return sum(filter(None, (self.signing_time,
+                                 self.network_time,
+                                 self.decode_time)))
+
+    def __repr__(self):
+        return "<%s: %s %s/%s %s %.1fms>" % (self.__class__.__name__,
+                                             self.method,
+                                             self.datatype,
+                                             self.api_method,
+                                             self.status,
+                                             self.latency * 1000)
+
+
+class ChangeEvent(object):
+    """
+    A change applied on the server.
+
+    api_method is "create", "update", "move", "trash" or "delete", and
+    item_id the item it was sent for: the folder (or speed dial position)
+    of created items. params are the parameters of the change, and data
+    the decoded JSON response, a list holding the changed item as saved
+    on the server, or None.
+    """
+
+    def __init__(self, datatype, api_method, item_id, params, data):
+        self.datatype = datatype
+        self.api_method = api_method
+        self.item_id = item_id
+        self.params = params
+        self.data = data
+
+    def __repr__(self):
+        return "<%s: %s/%s %s>" % (self.__class__.__name__, self.datatype,
+                                   self.api_method, self.item_id)
+
+
+class MetricsAggregator(object):
+    """
+    Thread-safe in-process aggregation of RequestEvents, keyed by
+    (datatype, api_method).
+
+    Latency percentiles are computed over a uniform sample of at most
+    sample_size requests per key, so memory use stays bounded.
+    """
+
+    def __init__(self, sample_size=1000):
+        self.sample_size = sample_size
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def install(self, client):
+        """
+        Registers the aggregator's hooks on client
+        """
+        client.add_hook("after_response", self.record)
+        client.add_hook("on_error", self.record)
+
+    def uninstall(self, client):
+        client.remove_hook("after_response", self.record)
+        client.remove_hook("on_error", self.record)
+
+    def record(self, event):
+        key = (event.datatype, event.api_method)
+        self._lock.acquire()
+        try:
+            metrics = self._metrics.get(key)
+            if metrics is None:
+                metrics = self._metrics[key] = _Metrics()
+            metrics.add(event, self.sample_size)
+        finally:
+            self._lock.release()
+
+    def reset(self):
+        self._lock.acquire()
+        try:
+            self._metrics.clear()
+        finally:
+            self._lock.release()
+
+    def summary(self):
+        """
+        Returns a dict mapping (datatype, api_method) to a dict with:
+
+        count - requests sent
+        errors - requests which failed
+        retries - requests which were retries of failed ones
+        request_bytes, response_bytes - total bytes sent and received
+        signing_time, network_time, decode_time - total time spent in
+                                                   each step
+        mean, p50, p90, p99, max - latency of the requests
+        """
+        self._lock.acquire()
+        try:
+            return dict((key, metrics.summary())
+                        for key, metrics in self._metrics.iteritems())
+        finally:
+            self._lock.release()
+
+    def report(self):
+        """
+        Returns the summary as a table, slowest keys first
+        """
+        rows = sorted(self.summary().iteritems(),
+                      key=lambda (key, summary): summary["p90"],
+                      reverse=True)
+        lines = ["%-28s %7s %6s %9s %9s %9s %9s" % ("datatype/api_method",
+                                                    "count", "errors",
+                                                    "p50 ms", "p90 ms",
+                                                    "p99 ms", "max ms")]
+        for (datatype, api_method), summary in rows:
+            lines.append("%-28s %7d %6d %9.1f %9.1f %9.1f %9.1f" % (
+                            "%s/%s" % (datatype, api_method),
+                            summary["count"], summary["errors"],
+                            summary["p50"] * 1000, summary["p90"] * 1000,
+                            summary["p99"] * 1000, summary["max"] * 1000))
+        return "\n".join(lines)
+
+
+def percentile(sorted_values, fraction):
+    """
+    Returns the value below which fraction of sorted_values fall, by
+    nearest rank
+    """
+    if not sorted_values:
+        return 0.0
+    index = int(round(fraction * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+
+class _Metrics(object):
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.retries = 0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.signing_time = 0.0
+        self.network_time = 0.0
+        self.decode_time = 0.0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.sample = []
+
+    def add(self, event, sample_size):
+        latency = event.latency
+        self.count += 1
+        if event.error is not None:
+            self.errors += 1
+        if event.attempt:
+            self.retries += 1
+        self.request_bytes += event.request_bytes or 0
+        self.response_bytes += event.response_bytes or 0
+        self.signing_time += event.signing_time or 0
+        self.network_time += event.network_time or 0
+        self.decode_time += event.decode_time or 0
+        self.total_latency += latency
+        self.max_latency = max(self.max_latency, latency)
+
+        # Reservoir sampling keeps every request equally likely to be in
+        # the sample
+        if len(self.sample) < sample_size:
+            self.sample.append(latency)
+        else:
+            index = random.randrange(self.count)
+            if index < sample_size:
+                self.sample[index] = latency
+
+    def summary(self):
+        sample = sorted(self.sample)
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "retries": self.retries,
+            "request_bytes": self.request_bytes,
+            "response_bytes": self.response_bytes,
+            "signing_time": self.signing_time,
+            "network_time": self.network_time,
+            "decode_time": self.decode_time,
+            "mean": self.count and self.total_latency / self.count,
+            "p50": percentile(sample, 0.5),
+            "p90": percentile(sample, 0.9),
+            "p99": percentile(sample, 0.99),
+            "max": self.max_latency,
+        }
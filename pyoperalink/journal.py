@@ -0,0 +1,406 @@
+"""
+Offline journal of the changes made while the server is unreachable.
+
+    >>> journal = Journal("/var/cache/link-journal.db")
+    >>> client = LinkClient(auth, journal=journal)
+    >>> bookmark.update()   # the server is down: the change is journaled
+    >>> ...
+    >>> results = journal.replay(client)   # once the server is back
+
+When a change fails because the server can't be reached (a network error,
+or a retry.CircuitOpenError), the client goes offline for the user: the
+change, and every later one, is appended to the journal, an SQLite
+database, instead of being sent. The datatype methods carry on as if the
+server had accepted the change. Items created offline get a temporary ID
+(starting with TEMP_PREFIX) until the journal is replayed.
+
+replay() sends the journaled changes in order, after coalescing them
+(see coalesce), and replaces temporary IDs with the ones given by the
+server; remap_ids() does the same for loaded entries. Each change is
+removed from the journal once the server has answered it, so replay can
+be interrupted, e.g. by another network error, and resumed later. The
+client stays offline for the user until the journal is empty.
+
+A change failing on the network may have reached the server already;
+sent again, a created item may be created twice. The after_change hooks
+are only called for changes the server accepted, when they are sent or
+replayed.
+"""
+
+from __future__ import absolute_import
+
+import sqlite3
+import threading
+import uuid
+
+from pyoperalink.client import LinkError
+from pyoperalink.retry import CircuitOpenError
+
+try:
+    import json as simplejson
+except ImportError:
+    import simplejson
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    user TEXT NOT NULL,
+    datatype TEXT NOT NULL,
+    api_method TEXT NOT NULL,
+    item_id TEXT,
+    temp_id TEXT,
+    params TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS ids (
+    user TEXT NOT NULL,
+    temp_id TEXT NOT NULL,
+    id TEXT NOT NULL,
+    PRIMARY KEY (user, temp_id)
+);
+"""
+
+# Prefix of the IDs given to items created offline
+TEMP_PREFIX = "local:"
+
+# Changes which only relocate their item
+MOVES = ("move", "trash")
+
+
+def is_temp_id(item_id):
+    return bool(item_id) and item_id.startswith(TEMP_PREFIX)
+
+
+def is_offline_error(error):
+    """
+    Returns whether error means the server couldn't be reached, rather
+    than it refusing the change
+    """
+    if isinstance(error, CircuitOpenError):
+        return True
+    # LinkClient wraps the exceptions of the transport
+    return error.status_code == 503 and isinstance(error.content, Exception)
+
+
+class Change(object):
+    """
+    A change of an item, as journaled: api_method is "create",
+    "update", "move", "trash" or "delete". item_id is the folder (or
+    speed dial position) of created items, whose own ID is target.
+    seqs are the journal entries it stands for, once coalesced.
+    """
+
+    def __init__(self, seqs, datatype, api_method, item_id, target, params):
+        self.seqs = seqs
+        self.datatype = datatype
+        self.api_method = api_method
+        self.item_id = item_id
+        self.target = target
+        self.params = params
+
+    def __repr__(self):
+        return "<%s: %s %s %s>" % (self.__class__.__name__, self.api_method,
+                                   self.datatype, self.target)
+
+
+class ReplayResult(object):
+    """
+    Outcome of a replayed change: the server's response in result, or
+    the LinkError it was refused with in error
+    """
+
+    def __init__(self, change):
+        self.change = change
+        self.result = None
+        self.error = None
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        return "<%s: %s %s %s>" % (self.__class__.__name__,
+                                   self.change.api_method,
+                                   self.change.datatype,
+                                   self.ok and "ok" or repr(self.error))
+
+
+def coalesce(changes):
+    """
+    Returns the changes, in order, with the redundant ones left out, and
+    the seqs of the journal entries left out altogether:
+
+    - updates are merged into the previous create or update of their item,
+    - moves and trashing replace the previous move of their item, unless
+      other items were moved before or after it in between,
+    - deleting an item drops its previous updates, and its moves as above,
+    - deleting an item created offline drops all of its changes, unless
+      other changes refer to it.
+    """
+    out = []
+    dropped = []
+    # (datatype, item ID): positions in out of the changes of the item
+    positions = {}
+    # (datatype, item ID): positions in out of the changes referring to
+    # the item, with whether they depend on its place in the tree
+    references = {}
+
+    for change in changes:
+        key = (change.datatype, change.target)
+        own = positions.setdefault(key, [])
+        method = change.api_method
+
+        if method == "update":
+            previous = _last(out, own, ("create", "update"))
+            if previous is not None:
+                out[previous].params.update(change.params)
+                out[previous].seqs.extend(change.seqs)
+                continue
+        elif method in MOVES:
+            previous = _last(out, own, MOVES)
+            if previous is not None and \
+                    not _placed_since(references.get(key), previous):
+                change.seqs[:0] = out[previous].seqs
+                out[previous] = None
+        elif method == "delete":
+            if is_temp_id(change.target) and \
+                    _last(out, own, ("create",)) is not None and \
+                    not references.get(key):
+                for position in own:
+                    if out[position] is not None:
+                        dropped.extend(out[position].seqs)
+                        out[position] = None
+                dropped.extend(change.seqs)
+                continue
+            for position in own:
+                previous = out[position]
+                if previous is None:
+                    continue
+                if previous.api_method == "update" or \
+                        (previous.api_method in MOVES and not
+                         _placed_since(references.get(key), position)):
+                    change.seqs[:0] = previous.seqs
+                    out[position] = None
+
+        own.append(len(out))
+        for referenced, placed in _references(change):
+            references.setdefault((change.datatype, referenced),
+                                  []).append((len(out), placed))
+        out.append(change)
+    return [change for change in out if change is not None], dropped
+
+
+def _last(out, positions, methods):
+    for position in reversed(positions):
+        change = out[position]
+        if change is not None and change.api_method in methods:
+            return position
+
+
+def _placed_since(references, position):
+    """
+    Returns whether items were placed before or after an item since
+    position
+    """
+    return any(placed and index > position
+               for index, placed in references or ())
+
+
+def _references(change):
+    """
+    Returns the other items change refers to, with whether it depends on
+    their place in the tree
+    """
+    if change.api_method == "create":
+        if change.item_id and change.item_id != change.target:
+            yield change.item_id, False
+    elif change.api_method == "move":
+        reference = change.params.get("reference_item")
+        if reference:
+            yield reference, change.params.get("relative_position") != "into"
+
+
+class Journal(object):
+    """
+    SQLite journal of the changes of many users, made while the server
+    was unreachable. It can be shared by many clients and threads.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        # Users with journaled changes, or whose last change failed on
+        # the network
+        self._offline = set(user for (user,) in self._db.execute(
+                                        "SELECT DISTINCT user FROM changes"))
+
+    def close(self):
+        self._db.close()
+
+    def is_offline(self, user):
+        return user in self._offline
+
+    def set_offline(self, user):
+        """
+        Journals the user's changes from now on, until replay() succeeds
+        """
+        self._lock.acquire()
+        try:
+            self._offline.add(user)
+        finally:
+            self._lock.release()
+
+    def record(self, user, datatype, api_method, params, item_id):
+        """
+        Appends a change to the journal, returning the response the
+        server would have sent
+        """
+        target = item_id
+        if api_method == "create":
+            if datatype == "speeddial":
+                # Speed dials are identified by their position
+                target = item_id
+            else:
+                target = TEMP_PREFIX + uuid.uuid4().hex.upper()
+        self._lock.acquire()
+        try:
+            self._offline.add(user)
+            self._db.execute("INSERT INTO changes (user, datatype, "
+                             "api_method, item_id, temp_id, params) "
+                             "VALUES (?, ?, ?, ?, ?, ?)",
+                             (user, datatype, api_method, item_id,
+                              target if api_method == "create" else None,
+                              simplejson.dumps(params)))
+            self._db.commit()
+        finally:
+            self._lock.release()
+
+        if api_method == "delete":
+            return None
+        properties = {}
+        if api_method in ("create", "update"):
+            properties = dict(params)
+        return [{"id": target,
+                 "item_type": params.get("item_type", datatype),
+                 "properties": properties}]
+
+    def pending(self, user):
+        """
+        Returns the user's journaled changes, coalesced
+        """
+        return coalesce(self._load(user))[0]
+
+    def replay(self, client):
+        """
+        Sends the journaled changes of client's user to the server, and
+        returns their ReplayResults. Changes refused by the server are
+        dropped; replay stops at the first network error.
+        """
+        user = client.auth_handler.access_token.key
+        changes, dropped = coalesce(self._load(user))
+        self._forget(dropped)
+        ids = self._ids(user)
+        results = []
+        for change in changes:
+            result = ReplayResult(change)
+            try:
+                result.result = self._send(client, change, ids)
+            except LinkError, ex:
+                if is_offline_error(ex):
+                    return results
+                result.error = ex
+            else:
+                if change.api_method == "create" and \
+                        is_temp_id(change.target):
+                    ids[change.target] = result.result[0]["id"]
+                    self._save_id(user, change.target, ids[change.target])
+            self._forget(change.seqs)
+            results.append(result)
+
+        self._lock.acquire()
+        try:
+            if not self._db.execute("SELECT 1 FROM changes WHERE user = ?",
+                                    (user,)).fetchone():
+                self._db.execute("DELETE FROM ids WHERE user = ?", (user,))
+                self._db.commit()
+                self._offline.discard(user)
+        finally:
+            self._lock.release()
+        return results
+
+    def _send(self, client, change, ids):
+        params = dict(change.params)
+        item_id = self._resolve(change.item_id, ids)
+        if change.api_method == "move":
+            params["reference_item"] = self._resolve(
+                                    params.get("reference_item"), ids) or ""
+        return client._change_resource(change.datatype, change.api_method,
+                                       params, item_id, use_journal=False)
+
+    def _resolve(self, item_id, ids):
+        if not is_temp_id(item_id):
+            return item_id
+        if item_id not in ids:
+            raise LinkError(reason="Depends on a failed create")
+        return ids[item_id]
+
+    def _load(self, user):
+        self._lock.acquire()
+        try:
+            rows = self._db.execute("SELECT seq, datatype, api_method, "
+                                    "item_id, temp_id, params FROM changes "
+                                    "WHERE user = ? ORDER BY seq",
+                                    (user,)).fetchall()
+        finally:
+            self._lock.release()
+        return [Change([seq], datatype, api_method, item_id,
+                       temp_id if api_method == "create" else item_id,
+                       simplejson.loads(params))
+                for seq, datatype, api_method, item_id, temp_id, params
+                    in rows]
+
+    def _ids(self, user):
+        self._lock.acquire()
+        try:
+            return dict(self._db.execute("SELECT temp_id, id FROM ids "
+                                         "WHERE user = ?", (user,)))
+        finally:
+            self._lock.release()
+
+    def _save_id(self, user, temp_id, item_id):
+        self._lock.acquire()
+        try:
+            self._db.execute("INSERT OR REPLACE INTO ids VALUES (?, ?, ?)",
+                             (user, temp_id, item_id))
+            self._db.commit()
+        finally:
+            self._lock.release()
+
+    def _forget(self, seqs):
+        if not seqs:
+            return
+        self._lock.acquire()
+        try:
+            self._db.executemany("DELETE FROM changes WHERE seq = ?",
+                                 [(seq,) for seq in seqs])
+            self._db.commit()
+        finally:
+            self._lock.release()
+
+
+def remap_ids(items, results):
+    """
+    Gives the entries in items (with the children of folders populated)
+    which were created offline the IDs the server gave them on replay
+    """
+    ids = dict((result.change.target, result.result[0]["id"])
+               for result in results
+               if result.ok and result.change.api_method == "create")
+    stack = list(items)
+    while stack:
+        entry = stack.pop()
+        if entry.id in ids:
+            entry.id = ids[entry.id]
+        if entry.is_folder:
+            stack.extend(getattr(entry, "_children", None) or ())
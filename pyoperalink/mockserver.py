@@ -0,0 +1,635 @@
+"""
+In-process stand-in for the Opera Link REST API, to exercise the client
+without the real server.
+
+    >>> server = MockLinkServer(latency=0.05)
+    >>> server.start()
+    >>> auth = server.add_user("alice")
+    >>> server.populate("alice", "bookmark", items=1000, folder_size=20)
+    >>> client = LinkClient(auth, url_prefix=server.url_prefix)
+    >>> tree = client.get_bookmark_tree()
+    >>> server.stop()
+
+It serves the item, children and descendants resources of every
+datatype, and the create, update, delete, trash and move methods. The
+OAuth signature of every request is checked against the users' access
+tokens, unless verify_signatures is False. Each request is delayed by
+latency seconds, plus a random delay of up to jitter seconds. Responses
+are gzip compressed for clients accepting it, and so can request bodies
+be, unless compression is False.
+
+The data is kept in memory only, and only the basic validations of the
+real server are made: unknown items, folders and positions are rejected.
+"""
+
+from __future__ import absolute_import
+
+import random
+import socket
+import sys
+import threading
+import time
+import uuid
+
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+from urlparse import parse_qsl, urlsplit
+
+import oauth2 as oauth
+
+from pyoperalink import datatypes
+from pyoperalink.auth import OAuth
+from pyoperalink.compression import (MIN_COMPRESSED_SIZE, compress,
+                                     decompress)
+
+try:
+    import json as simplejson
+except ImportError:
+    import simplejson
+
+# Changes accepted by the server, and the datatypes they apply to
+TREE_METHODS = ("create", "update", "delete", "trash", "move")
+LIST_METHODS = ("create", "update", "delete")
+
+TREE_STRUCTURED_DATATYPES = ("bookmark", "note")
+
+
+class HTTPError(Exception):
+    """
+    Error response of the mock server
+    """
+
+    def __init__(self, status, reason):
+        self.status = status
+        self.reason = reason
+        Exception.__init__(self, status, reason)
+
+
+class BadRequest(HTTPError):
+    def __init__(self, reason="Bad request"):
+        HTTPError.__init__(self, 400, reason)
+
+
+class NotFound(HTTPError):
+    def __init__(self, reason="Not found"):
+        HTTPError.__init__(self, 404, reason)
+
+
+class Item(object):
+    """
+    An item stored on the mock server
+    """
+
+    __slots__ = ("id", "item_type", "properties", "parent", "children")
+
+    def __init__(self, item_id, item_type, properties, parent=None):
+        self.id = item_id
+        self.item_type = item_type
+        self.properties = properties
+        self.parent = parent
+        self.children = None
+        if item_type.endswith("_folder"):
+            self.children = []
+
+    @property
+    def is_folder(self):
+        return self.children is not None
+
+    def to_json(self, recursive=False):
+        data = {"id": self.id, "item_type": self.item_type,
+                "properties": dict(self.properties)}
+        if recursive and self.is_folder:
+            data["children"] = [child.to_json(True)
+                                for child in self.children]
+        return data
+
+
+class DatatypeStore(object):
+    """
+    One user's items of a datatype
+    """
+
+    def __init__(self, datatype):
+        self.datatype = datatype
+        self.tree_structure = datatype in TREE_STRUCTURED_DATATYPES
+        self.item_types = dict((item_type, cls)
+                               for item_type, cls in
+                                   datatypes.registry.iteritems()
+                               if cls.datatype == datatype)
+        self.items = {}
+        self.root = []
+        if self.tree_structure:
+            self._insert(Item(self._new_id(), "%s_folder" % datatype,
+                              {"title": "Trash", "type": "trash"}),
+                         None)
+
+    def get(self, item_id):
+        try:
+            return self.items[item_id]
+        except KeyError:
+            raise NotFound()
+
+    def children(self, item_id):
+        if not item_id:
+            return self.root
+        folder = self.get(item_id)
+        if not folder.is_folder:
+            raise BadRequest("Not a folder")
+        return folder.children
+
+    def create(self, item_id, params):
+        item_type = params.get("item_type", self.datatype)
+        if item_type not in self.item_types:
+            raise BadRequest("Unknown item type: %s" % item_type)
+
+        if self.datatype == "speeddial":
+            # Speed dials are identified by their position
+            if not item_id or not item_id.isdigit():
+                raise BadRequest("Invalid speed dial position")
+            if item_id in self.items:
+                raise BadRequest("Position already used")
+            new_id, parent = item_id, None
+        else:
+            new_id, parent = self._new_id(), None
+            if item_id:
+                if not self.tree_structure:
+                    raise BadRequest("Not a folder")
+                parent = self.get(item_id)
+                if not parent.is_folder:
+                    raise BadRequest("Not a folder")
+
+        item = Item(new_id, item_type, self._properties(item_type, params))
+        self._insert(item, parent)
+        if self.datatype == "speeddial":
+            self.root.sort(key=lambda dial: int(dial.id))
+        return item
+
+    def update(self, item_id, params):
+        item = self.get(item_id)
+        item.properties.update(self._properties(item.item_type, params))
+        return item
+
+    def delete(self, item_id):
+        item = self.get(item_id)
+        self._detach(item)
+        self._forget(item)
+
+    def trash(self, item_id):
+        item = self.get(item_id)
+        trash = self._trash_folder()
+        if item is trash or self._is_inside(item, trash):
+            raise BadRequest("Item already in trash")
+        self._detach(item)
+        self._insert(item, trash)
+        return item
+
+    def move(self, item_id, params):
+        item = self.get(item_id)
+        position = params.get("relative_position")
+        reference_id = params.get("reference_item")
+        reference = None
+
+        if position == "into":
+            parent = None
+            if reference_id:
+                parent = self.get(reference_id)
+                if not parent.is_folder:
+                    raise BadRequest("Not a folder")
+        elif position in ("before", "after"):
+            if not reference_id:
+                raise BadRequest("Missing reference item")
+            reference = self.get(reference_id)
+            if reference is item:
+                return item
+            parent = reference.parent
+        else:
+            raise BadRequest("Invalid relative position")
+
+        if parent is item or self._is_inside(parent, item):
+            raise BadRequest("Can't move a folder into itself")
+
+        self._detach(item)
+        index = None
+        if reference is not None:
+            index = self._siblings(parent).index(reference)
+            if position == "after":
+                index += 1
+        self._insert(item, parent, index)
+        return item
+
+    def _properties(self, item_type, params):
+        fields = self.item_types[item_type].fields
+        return dict((field, params[field]) for field in fields
+                    if field in params)
+
+    def _new_id(self):
+        return uuid.uuid4().hex.upper()
+
+    def _siblings(self, parent):
+        if parent is None:
+            return self.root
+        return parent.children
+
+    def _insert(self, item, parent, index=None):
+        siblings = self._siblings(parent)
+        if index is None:
+            siblings.append(item)
+        else:
+            siblings.insert(index, item)
+        item.parent = parent
+        self.items[item.id] = item
+
+    def _detach(self, item):
+        self._siblings(item.parent).remove(item)
+
+    def _forget(self, item):
+        del self.items[item.id]
+        for child in item.children or ():
+            self._forget(child)
+
+    def _is_inside(self, item, folder):
+        while item is not None:
+            if item.parent is folder:
+                return True
+            item = item.parent
+        return False
+
+    def _trash_folder(self):
+        for item in self.root:
+            if item.is_folder and item.properties.get("type") == "trash":
+                return item
+        raise BadRequest("No trash folder")
+
+
+class User(object):
+
+    def __init__(self, token):
+        self.token = token
+        self.stores = dict((datatype, DatatypeStore(datatype))
+                           for datatype in _datatypes())
+
+
+class MockLinkServer(object):
+    """
+    Opera Link API server running on a local port, in background threads.
+    It can be used as a context manager, started on entry and stopped on
+    exit.
+    """
+
+    consumer_key = "mock-consumer-key"
+    consumer_secret = "mock-consumer-secret"
+
+    def __init__(self, latency=0, jitter=0, verify_signatures=True,
+                 compression=True, host="127.0.0.1", port=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.verify_signatures = verify_signatures
+        self.compression = compression
+        self.host = host
+        self.port = port
+        self.request_count = 0
+        self._consumer = oauth.Consumer(self.consumer_key,
+                                        self.consumer_secret)
+        self._oauth_server = oauth.Server()
+        self._oauth_server.add_signature_method(OAuth.signature_method)
+        self._users = {}
+        self._lock = threading.Lock()
+        self._httpd = None
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    @property
+    def url_prefix(self):
+        """
+        The url_prefix to give LinkClient
+        """
+        return "http://%s:%d/rest" % (self.host, self.port)
+
+    def start(self):
+        self._httpd = _HTTPServer((self.host, self.port), _RequestHandler)
+        self._httpd.link_server = self
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(target=self._httpd.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd.close_connections()
+            self._thread.join()
+            self._httpd = None
+
+    def add_user(self, name, secret=None):
+        """
+        Registers a user whose access token key is name, and returns an
+        auth.OAuth handler signing requests with it
+        """
+        if secret is None:
+            secret = "%s-secret" % name
+        token = oauth.Token(name, secret)
+        self._lock.acquire()
+        try:
+            self._users[name] = User(token)
+        finally:
+            self._lock.release()
+
+        auth = OAuth(self.consumer_key, self.consumer_secret)
+        auth.set_access_token(name, secret)
+        return auth
+
+    def populate(self, name, datatype, items=100, folder_size=20,
+                 folder_ratio=0.1):
+        """
+        Adds generated items of datatype to the user's data.
+
+        For tree-structured datatypes, folders are filled breadth-first
+        with folder_size items each, of which a folder_ratio fraction are
+        folders themselves.
+        """
+        self._lock.acquire()
+        try:
+            store = self._users[name].stores[datatype]
+            if not store.tree_structure:
+                for i in xrange(items):
+                    position = None
+                    if datatype == "speeddial":
+                        position = str(len(store.items) + 1)
+                    store.create(position, _sample(datatype, datatype, i))
+                return
+
+            folder_type = "%s_folder" % datatype
+            folder_every = max(int(round(1 / folder_ratio)), 1) \
+                           if folder_ratio else None
+            folders = [None]
+            created = 0
+            while created < items:
+                if folders:
+                    parent = folders.pop(0)
+                else:
+                    parent = None
+                for i in xrange(min(folder_size, items - created)):
+                    created += 1
+                    if folder_every and created % folder_every == 0:
+                        item_type = folder_type
+                    else:
+                        item_type = datatype
+                    item = store.create(parent and parent.id,
+                                        _sample(datatype, item_type, created))
+                    if item.is_folder:
+                        folders.append(item)
+        finally:
+            self._lock.release()
+
+    def items(self, name, datatype):
+        """
+        Returns the user's items of datatype, nested like the descendants
+        resource
+        """
+        self._lock.acquire()
+        try:
+            store = self._users[name].stores[datatype]
+            return [item.to_json(True) for item in store.root]
+        finally:
+            self._lock.release()
+
+    def handle(self, method, url, body=""):
+        """
+        Answers a request, returning (status, reason, data). data is None
+        for responses without content.
+        """
+        self._lock.acquire()
+        try:
+            self.request_count += 1
+        finally:
+            self._lock.release()
+
+        delay = self.latency
+        if self.jitter:
+            delay += random.uniform(0, self.jitter)
+        if delay:
+            time.sleep(delay)
+
+        try:
+            params = dict(parse_qsl(urlsplit(url).query,
+                                    keep_blank_values=True))
+            if method == "POST":
+                params.update(parse_qsl(body, keep_blank_values=True))
+            user = self._authenticate(method, url, params)
+            datatype, item_id, resource = self._parse_path(url)
+
+            self._lock.acquire()
+            try:
+                store = user.stores[datatype]
+                if method == "GET":
+                    return 200, "OK", self._get(store, item_id, resource)
+                if method == "POST" and resource is None:
+                    return self._change(store, item_id, params)
+            finally:
+                self._lock.release()
+            raise HTTPError(405, "Method not allowed")
+        except HTTPError, ex:
+            return ex.status, ex.reason, None
+
+    def _authenticate(self, method, url, params):
+        user = self._users.get(params.get("oauth_token"))
+        if user is None:
+            raise HTTPError(401, "Unauthorized")
+        if self.verify_signatures:
+            # Signed parameters come from the query string and the body
+            scheme, netloc, path, query, fragment = urlsplit(url)
+            request = oauth.Request(method, "%s://%s%s" % (scheme, netloc,
+                                                          path), params)
+            try:
+                self._oauth_server.verify_request(request, self._consumer,
+                                                  user.token)
+            except oauth.Error:
+                raise HTTPError(401, "Unauthorized")
+        return user
+
+    def _parse_path(self, url):
+        path = urlsplit(url).path
+        if not path.startswith("/rest/"):
+            raise NotFound()
+        parts = path[len("/rest/"):].strip("/").split("/")
+
+        datatype = parts.pop(0)
+        if datatype not in _datatypes():
+            raise NotFound()
+        resource = None
+        if parts and parts[-1] in ("children", "descendants"):
+            resource = parts.pop()
+        item_id = None
+        if parts:
+            item_id = parts.pop()
+        if parts:
+            raise NotFound()
+        return datatype, item_id, resource
+
+    def _get(self, store, item_id, resource):
+        if resource is None:
+            if item_id is None:
+                raise NotFound()
+            return [store.get(item_id).to_json()]
+        if resource == "descendants" and not store.tree_structure:
+            raise NotFound()
+        recursive = resource == "descendants"
+        return [item.to_json(recursive)
+                for item in store.children(item_id)]
+
+    def _change(self, store, item_id, params):
+        api_method = params.get("api_method")
+        if store.tree_structure:
+            allowed = TREE_METHODS
+        else:
+            allowed = LIST_METHODS
+        if api_method not in allowed:
+            raise BadRequest("Unknown API method: %s" % api_method)
+        if api_method != "create" and not item_id:
+            raise BadRequest("Missing item")
+
+        if api_method == "delete":
+            store.delete(item_id)
+            return 204, "No content", None
+        if api_method == "trash":
+            item = store.trash(item_id)
+        else:
+            item = getattr(store, api_method)(item_id, params)
+        return 200, "OK", [item.to_json()]
+
+
+class _HTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, server_address, handler_class):
+        HTTPServer.__init__(self, server_address, handler_class)
+        self.connections = set()
+        self.connections_changed = threading.Condition()
+
+    def process_request_thread(self, request, client_address):
+        self.connections_changed.acquire()
+        try:
+            self.connections.add(request)
+        finally:
+            self.connections_changed.release()
+        try:
+            ThreadingMixIn.process_request_thread(self, request,
+                                                  client_address)
+        finally:
+            self.connections_changed.acquire()
+            try:
+                self.connections.discard(request)
+                self.connections_changed.notifyAll()
+            finally:
+                self.connections_changed.release()
+
+    def handle_error(self, request, client_address):
+        # Clients may close their connections at any time, e.g. when they
+        # stop reading a streamed response
+        if isinstance(sys.exc_info()[1], socket.error):
+            return
+        HTTPServer.handle_error(self, request, client_address)
+
+    def close_connections(self, timeout=5):
+        """
+        Ends the keep-alive connections, whose threads wait for the next
+        request, and waits for their threads to finish
+        """
+        deadline = time.time() + timeout
+        self.connections_changed.acquire()
+        try:
+            for connection in self.connections:
+                try:
+                    connection.shutdown(socket.SHUT_RDWR)
+                except socket.error:
+                    pass
+            while self.connections and time.time() < deadline:
+                self.connections_changed.wait(deadline - time.time())
+        finally:
+            self.connections_changed.release()
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so that the client's connection pool can be measured too
+    protocol_version = "HTTP/1.1"
+    # Responses are sent in one piece, without waiting for delayed ACKs
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self._handle()
+
+    def do_POST(self):
+        self._handle()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _handle(self):
+        length = int(self.headers.getheader("Content-Length") or 0)
+        body = length and self.rfile.read(length) or ""
+        url = "http://%s%s" % (self.headers.getheader("Host"), self.path)
+        server = self.server.link_server
+
+        encoding = self.headers.getheader("Content-Encoding")
+        if encoding and not (server.compression and encoding == "gzip"):
+            self._respond(415, "Unsupported media type")
+            return
+        if encoding:
+            body = decompress(body, encoding)
+        status, reason, data = server.handle(self.command, url, body)
+
+        content = ""
+        if data is not None:
+            content = simplejson.dumps(data)
+        self._respond(status, reason, content)
+
+    def _respond(self, status, reason, content=""):
+        headers = [("Content-Type", "application/json")]
+        accepted = self.headers.getheader("Accept-Encoding") or ""
+        if self.server.link_server.compression and "gzip" in accepted and \
+                len(content) >= MIN_COMPRESSED_SIZE:
+            content = compress(content)
+            headers.append(("Content-Encoding", "gzip"))
+        headers.append(("Content-Length", str(len(content))))
+
+        self.send_response(status, reason)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(content)
+
+
+def _datatypes():
+    return set(cls.datatype for cls in datatypes.registry.itervalues())
+
+
+def _sample(datatype, item_type, number):
+    """
+    Returns the fields of a generated item
+    """
+    if item_type.endswith("_folder"):
+        return {"item_type": item_type, "title": "Folder %d" % number}
+    uri = "http://example.com/%d" % number
+    created = "2010-01-02T03:04:05Z"
+    if datatype == "bookmark":
+        return {"item_type": item_type, "title": "Bookmark %d" % number,
+                "uri": uri, "created": created, "visited": created}
+    if datatype == "note":
+        return {"item_type": item_type, "content": "Note %d" % number,
+                "uri": uri, "created": created}
+    if datatype == "speeddial":
+        return {"title": "Dial %d" % number, "uri": uri}
+    if datatype == "search_engine":
+        return {"title": "Search %d" % number, "key": "s%d" % number,
+                "uri": "http://search%d.example.com/?q=%%s" % number}
+    return {"content": "http://ads%d.example.com/*" % number,
+            "type": "exclude"}
@@ -0,0 +1,210 @@
+"""
+Thread pool used to run Opera Link requests concurrently, and
+coalescing of identical concurrent calls
+"""
+
+import sys
+import threading
+
+from Queue import Queue
+
+
+class Future(object):
+    """
+    Result of a call scheduled on a ThreadPool.
+    """
+
+    def __init__(self):
+        self._done = threading.Event()
+        self._result = None
+        self._exc_info = None
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def done(self):
+        return self._done.isSet()
+
+    def result(self, timeout=None):
+        """
+        Waits for the call to finish and returns its result, re-raising
+        the exception if the call failed.
+        """
+        self._wait(timeout)
+        if self._exc_info is not None:
+            raise self._exc_info[0], self._exc_info[1], self._exc_info[2]
+        return self._result
+
+    def exception(self, timeout=None):
+        """
+        Waits for the call to finish and returns the exception it raised,
+        or None if it succeeded.
+        """
+        self._wait(timeout)
+        if self._exc_info is not None:
+            return self._exc_info[1]
+
+    def add_done_callback(self, callback):
+        """
+        Calls callback(future) once the call has finished. If it already
+        has, the callback is called immediately.
+        """
+        self._lock.acquire()
+        try:
+            if not self.done():
+                self._callbacks.append(callback)
+                return
+        finally:
+            self._lock.release()
+        callback(self)
+
+    def set_result(self, result):
+        self._result = result
+        self._finish()
+
+    def set_exc_info(self, exc_info):
+        self._exc_info = exc_info
+        self._finish()
+
+    def _wait(self, timeout):
+        self._done.wait(timeout)
+        if not self.done():
+            raise RuntimeError("Timed out waiting for the result")
+
+    def _finish(self):
+        self._lock.acquire()
+        try:
+            self._done.set()
+            callbacks, self._callbacks = self._callbacks, []
+        finally:
+            self._lock.release()
+        for callback in callbacks:
+            callback(self)
+
+
+class ThreadPool(object):
+    """
+    Fixed size pool of daemon worker threads.
+
+    max_workers bounds the number of calls running at the same time.
+    Workers are started lazily, on the first submitted call.
+    """
+
+    def __init__(self, max_workers=4):
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        self.max_workers = max_workers
+        self._queue = Queue()
+        self._workers = []
+        self._lock = threading.Lock()
+        self._shutdown = False
+
+    def submit(self, function, *args, **kwargs):
+        """
+        Schedules function(*args, **kwargs) and returns its Future.
+        """
+        if self._shutdown:
+            raise RuntimeError("Cannot submit calls after shutdown")
+        future = Future()
+        self._queue.put((future, function, args, kwargs))
+        self._start_workers()
+        return future
+
+    def map(self, function, iterable):
+        """
+        Calls function on every element of iterable concurrently and
+        returns the list of results, in order.
+        """
+        futures = [self.submit(function, item) for item in iterable]
+        return [future.result() for future in futures]
+
+    def shutdown(self, wait=True):
+        """
+        Stops the workers once the already submitted calls are done.
+        """
+        self._lock.acquire()
+        try:
+            self._shutdown = True
+            workers = list(self._workers)
+            for worker in workers:
+                self._queue.put(None)
+        finally:
+            self._lock.release()
+        if wait:
+            for worker in workers:
+                worker.join()
+
+    def _start_workers(self):
+        self._lock.acquire()
+        try:
+            if len(self._workers) < self.max_workers:
+                worker = threading.Thread(target=self._work)
+                worker.setDaemon(True)
+                worker.start()
+                self._workers.append(worker)
+        finally:
+            self._lock.release()
+
+    def _work(self):
+        while True:
+            task = self._queue.get()
+            if task is None:
+                return
+            future, function, args, kwargs = task
+            try:
+                result = function(*args, **kwargs)
+            except:
+                future.set_exc_info(sys.exc_info())
+            else:
+                future.set_result(result)
+            del task, future, function, args, kwargs
+
+
+class SingleFlight(object):
+    """
+    Coalesces concurrent calls with the same key: while a call is running,
+    the calls with the same key wait for it and get its result, or its
+    exception, instead of running again.
+
+    shared counts the calls which got the result of another one.
+    """
+
+    def __init__(self):
+        self.shared = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def call(self, key, function, *args, **kwargs):
+        """
+        Returns function(*args, **kwargs), or the result of the running
+        call with the same key
+        """
+        self._lock.acquire()
+        try:
+            future = self._calls.get(key)
+            if future is not None:
+                self.shared += 1
+            else:
+                self._calls[key] = own_future = Future()
+        finally:
+            self._lock.release()
+        if future is not None:
+            return future.result()
+
+        try:
+            result = function(*args, **kwargs)
+        except:
+            exc_info = sys.exc_info()
+            self._forget(key)
+            own_future.set_exc_info(exc_info)
+            raise exc_info[0], exc_info[1], exc_info[2]
+        self._forget(key)
+        own_future.set_result(result)
+        return result
+
+    def _forget(self, key):
+        # Calls made from now on run again
+        self._lock.acquire()
+        try:
+            del self._calls[key]
+        finally:
+            self._lock.release()
@@ -0,0 +1,175 @@
+"""
+Retries of failed requests, and circuit breaking.
+
+    >>> client = LinkClient(auth, retry_policy=RetryPolicy(max_attempts=4),
+    ...                     circuit_breaker=CircuitBreaker())
+
+RetryPolicy retries requests which failed on the network, or with a
+429 or 5xx status, waiting longer after every attempt: a random delay of
+up to backoff * 2 ** attempt seconds ("full jitter", so that many clients
+failing at once don't retry at once). A Retry-After header sent by the
+server is honoured instead.
+
+Only GET requests are retried by default. Changes are retried when
+retry_writes is True; note that a change whose response was lost may
+have been applied already, e.g. creating the item twice.
+
+CircuitBreaker fails requests to a host immediately, with a
+CircuitOpenError, after failure_threshold consecutive failures, instead
+of letting them wait for a server that is down. After reset_timeout
+seconds a single request is let through; the circuit closes again if it
+succeeds. One breaker can be shared by many clients.
+"""
+
+from __future__ import absolute_import
+
+import random
+import threading
+import time
+
+from email.utils import mktime_tz, parsedate_tz
+
+from pyoperalink.client import LinkError
+
+# Statuses worth retrying: rate limiting and server-side failures
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class CircuitOpenError(LinkError):
+    """
+    Request not sent, as the server has been failing
+    """
+    status_code = 503
+    reason = "Circuit open"
+
+
+class RetryPolicy(object):
+    """
+    Decides whether and when failed requests are sent again.
+
+    max_attempts includes the first attempt. Delays are capped at
+    max_backoff seconds; if the server asks to wait for longer than
+    max_retry_after seconds, the request is not retried.
+    """
+
+    def __init__(self, max_attempts=3, backoff=0.5, max_backoff=30,
+                 max_retry_after=60, retry_writes=False,
+                 statuses=RETRY_STATUSES):
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_retry_after = max_retry_after
+        self.retry_writes = retry_writes
+        self.statuses = statuses
+
+    def delay(self, method, attempt, error):
+        """
+        Returns the seconds to wait before sending again a request which
+        failed with error on its attempt-th attempt (from 0), or None if it
+        must not be retried.
+        """
+        if attempt + 1 >= self.max_attempts:
+            return None
+        if method != "GET" and not self.retry_writes:
+            return None
+        if isinstance(error, CircuitOpenError) or \
+                error.status_code not in self.statuses:
+            return None
+
+        retry_after = parse_retry_after(error.retry_after)
+        if retry_after is not None:
+            if retry_after > self.max_retry_after:
+                return None
+            return retry_after
+        return random.uniform(0, min(self.max_backoff,
+                                     self.backoff * 2 ** attempt))
+
+
+class CircuitBreaker(object):
+    """
+    Thread-safe per-host circuit breaker
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        # host: [consecutive failures, time the circuit opened, probing]
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def state(self, host):
+        """
+        Returns "closed", "open" or "half-open"
+        """
+        self._lock.acquire()
+        try:
+            failures, opened_at, probing = self._hosts.get(host,
+                                                           (0, None, False))
+            if opened_at is None:
+                return "closed"
+            if probing or opened_at + self.reset_timeout <= time.time():
+                return "half-open"
+            return "open"
+        finally:
+            self._lock.release()
+
+    def before_request(self, host):
+        """
+        Raises CircuitOpenError if requests to host must not be sent
+        """
+        self._lock.acquire()
+        try:
+            state = self._hosts.get(host)
+            if state is None or state[1] is None:
+                return
+            if state[2] or state[1] + self.reset_timeout > time.time():
+                raise CircuitOpenError()
+            # Let a single request through, to probe the server
+            state[2] = True
+        finally:
+            self._lock.release()
+
+    def record(self, host, error=None):
+        """
+        Records the outcome of a request to host: error is the exception
+        it failed with, or None if it succeeded
+        """
+        if isinstance(error, CircuitOpenError):
+            # Not sent, so nothing is learnt about the server
+            return
+        self._lock.acquire()
+        try:
+            state = self._hosts.setdefault(host, [0, None, False])
+            if error is None or not self.is_failure(error):
+                state[:] = [0, None, False]
+                return
+            state[0] += 1
+            if state[2] or state[0] >= self.failure_threshold:
+                state[1:] = [time.time(), False]
+        finally:
+            self._lock.release()
+
+    def is_failure(self, error):
+        """
+        Only the errors of the server, not of the requests, count.
+        Other exceptions, e.g. an undecodable response, count too.
+        """
+        if not isinstance(error, LinkError):
+            return True
+        return (error.status_code or 0) >= 500
+
+
+def parse_retry_after(value):
+    """
+    Returns the seconds to wait from a Retry-After header, given as
+    seconds or as an HTTP date, or None
+    """
+    if value is None:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return int(value)
+    date = parsedate_tz(value)
+    if date is None:
+        return None
+    return max(mktime_tz(date) - time.time(), 0)
@@ -0,0 +1,247 @@
+"""
+Scheduling of the work of many Opera Link accounts in one process.
+
+    >>> limiter = TokenBucket(rate=200, burst=50)
+    >>> scheduler = Scheduler(max_workers=32, per_account=2, limiter=limiter)
+    >>> for client in clients:
+    ...     scheduler.submit(client, sync_account, client)
+    >>> scheduler.shutdown()
+
+Calls are queued per account, and the workers take them from the
+accounts in turn, so an account with thousands of pending calls doesn't
+hold back the others. At most per_account calls of the same account run
+at the same time.
+
+The token bucket limits the requests sent to the server by all the
+clients together: every client given to submit() waits for a token
+before each request, retries included, until its submitted calls are
+done. The rate is the sustained number
+of requests per second; burst requests can be sent at once after a
+quiet period.
+"""
+
+from __future__ import absolute_import
+
+import sys
+import threading
+import time
+
+from collections import deque
+
+from pyoperalink.pool import Future
+
+
+class TokenBucket(object):
+    """
+    Thread-safe token bucket, refilled with rate tokens per second up to
+    burst tokens
+    """
+
+    def __init__(self, rate, burst=None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.burst = float(burst or max(rate, 1))
+        self._tokens = self.burst
+        self._updated = time.time()
+        self._lock = threading.Lock()
+
+    def try_acquire(self, tokens=1):
+        """
+        Takes tokens if they are available, returning whether it did
+        """
+        return self._take(tokens) == 0
+
+    def acquire(self, tokens=1):
+        """
+        Waits for tokens to be available and takes them
+        """
+        if tokens > self.burst:
+            raise ValueError("Cannot take more than %d tokens at once"
+                             % self.burst)
+        while True:
+            wait = self._take(tokens)
+            if not wait:
+                return
+            time.sleep(wait)
+
+    def install(self, client):
+        """
+        Makes client wait for a token before each request
+        """
+        client.add_hook("before_request", self._before_request)
+
+    def uninstall(self, client):
+        client.remove_hook("before_request", self._before_request)
+
+    def _before_request(self, event):
+        self.acquire()
+
+    def _take(self, tokens):
+        """
+        Takes tokens, or returns the seconds to wait for them
+        """
+        self._lock.acquire()
+        try:
+            now = time.time()
+            self._tokens = min(self.burst, self._tokens +
+                                           (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0
+            return (tokens - self._tokens) / self.rate
+        finally:
+            self._lock.release()
+
+
+class Scheduler(object):
+    """
+    Pool of worker threads running the calls of many accounts fairly.
+
+    Accounts are any hashable keys, usually the LinkClient of each user.
+    If a limiter, e.g. a TokenBucket, is given, the LinkClient accounts
+    are made to wait for it before each request.
+    """
+
+    def __init__(self, max_workers=16, per_account=1, limiter=None):
+        if max_workers < 1 or per_account < 1:
+            raise ValueError("max_workers and per_account must be at least 1")
+        self.max_workers = max_workers
+        self.per_account = per_account
+        self.limiter = limiter
+        # account: deque of pending calls
+        self._queues = {}
+        # account: number of running calls
+        self._running = {}
+        # Accounts whose next call can run, in turn
+        self._ready = deque()
+        self._ready_set = set()
+        # Accounts with pending calls made to wait for the limiter
+        self._limited = set()
+        self._workers = []
+        self._shutdown = False
+        self._condition = threading.Condition()
+
+    @property
+    def pending(self):
+        """
+        Number of calls waiting to run
+        """
+        self._condition.acquire()
+        try:
+            return sum(map(len, self._queues.values()))
+        finally:
+            self._condition.release()
+
+    def submit(self, account, function, *args, **kwargs):
+        """
+        Schedules function(*args, **kwargs) as work of account and returns
+        its pool.Future
+        """
+        future = Future()
+        self._condition.acquire()
+        try:
+            if self._shutdown:
+                raise RuntimeError("Cannot submit calls after shutdown")
+            self._limit(account)
+            self._queues.setdefault(account, deque()).append(
+                                        (future, function, args, kwargs))
+            self._make_ready(account)
+            if len(self._workers) < self.max_workers:
+                worker = threading.Thread(target=self._work)
+                worker.setDaemon(True)
+                worker.start()
+                self._workers.append(worker)
+        finally:
+            self._condition.release()
+        return future
+
+    def shutdown(self, wait=True):
+        """
+        Stops the workers once the already submitted calls are done
+        """
+        self._condition.acquire()
+        try:
+            self._shutdown = True
+            self._condition.notifyAll()
+            workers = list(self._workers)
+        finally:
+            self._condition.release()
+        if wait:
+            for worker in workers:
+                worker.join()
+
+    def _limit(self, account):
+        if self.limiter is None or account in self._limited:
+            return
+        if hasattr(account, "add_hook"):
+            self.limiter.install(account)
+            self._limited.add(account)
+
+    def _make_ready(self, account):
+        """
+        Queues account for a worker, if it has a call that can run
+        """
+        if account in self._ready_set or not self._queues.get(account) or \
+                self._running.get(account, 0) >= self.per_account:
+            return
+        self._ready.append(account)
+        self._ready_set.add(account)
+        self._condition.notify()
+
+    def _next_call(self):
+        self._condition.acquire()
+        try:
+            while not self._ready:
+                if self._shutdown and not self._queues:
+                    return None
+                self._condition.wait()
+
+            account = self._ready.popleft()
+            self._ready_set.discard(account)
+            queue = self._queues[account]
+            call = queue.popleft()
+            if not queue:
+                del self._queues[account]
+            self._running[account] = self._running.get(account, 0) + 1
+            # Back in line after the other accounts
+            self._make_ready(account)
+            return account, call
+        finally:
+            self._condition.release()
+
+    def _done(self, account):
+        self._condition.acquire()
+        try:
+            self._running[account] -= 1
+            if not self._running[account]:
+                del self._running[account]
+                if account in self._limited and account not in self._queues:
+                    # Not kept alive, nor limited, once its work is done
+                    self.limiter.uninstall(account)
+                    self._limited.discard(account)
+            self._make_ready(account)
+            if self._shutdown and not self._queues:
+                # Wake up the idle workers so that they can stop
+                self._condition.notifyAll()
+        finally:
+            self._condition.release()
+
+    def _work(self):
+        while True:
+            task = self._next_call()
+            if task is None:
+                return
+            account, (future, function, args, kwargs) = task
+            try:
+                result = function(*args, **kwargs)
+            except:
+                future.set_exc_info(sys.exc_info())
+            else:
+                future.set_result(result)
+                del result
+            # Idle workers mustn't keep the last call, or account, alive
+            del task, future, function, args, kwargs
+            self._done(account)
+            del account
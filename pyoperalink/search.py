@@ -0,0 +1,429 @@
+"""
+Local full-text search over notes and bookmarks.
+
+    >>> index = SearchIndex(client.get_note_tree())
+    >>> index.add_items(client.get_bookmark_tree())
+    >>> index.install(client)
+    >>> index.search(u"opera link")
+    [<pyoperalink.datatypes.Bookmark object at 0x...>, ...]
+
+The content of notes and the title, description and URI of bookmarks are
+split into words, case-folded, and kept in an inverted index mapping each
+word to the entries containing it. A query matches the entries
+containing all of its words, the last one as a prefix, so that results
+can be shown as the user types. The prefix stands for its
+MAX_PREFIX_WORDS most frequent completions at most. Matches are ranked
+by the number of occurrences of the words, weighted by field (titles
+first) and by how rare each word is.
+
+Only the best matches are scored in full: the entries of the rarest
+word of the query are visited from the best to the worst, and the
+search stops once none of the entries left could rank among the limit
+best ones, whatever their other words.
+
+Once installed on a client, the index follows the creations, updates,
+moves and deletions made through it, like index.ItemIndex; deleting a
+folder removes the entries indexed inside it. Entries in the trash
+folder are not indexed, and are removed when trashed; entries restored
+from the trash must be indexed again with add(), as must entries changed
+locally, without the client, with update(). Heavy fields not loaded by a
+client in light mode are not indexed.
+"""
+
+from __future__ import absolute_import
+
+import heapq
+import math
+import re
+import sys
+import threading
+
+from bisect import bisect_left, insort
+from itertools import izip
+
+from pyoperalink.datatypes import NOT_LOADED
+
+# Searched fields of each item type
+SEARCH_FIELDS = {
+    "note": ("content",),
+    "bookmark": ("title", "description", "uri"),
+}
+
+# Weight of a word found in each field
+FIELD_WEIGHTS = {
+    "title": 3.0,
+    "uri": 2.0,
+    "description": 1.0,
+    "content": 1.0,
+}
+
+# Completions of the prefix ending a query, at most
+MAX_PREFIX_WORDS = 64
+
+word_re = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text):
+    """
+    Returns the case-folded words of text
+    """
+    if not text:
+        return []
+    return word_re.findall(text.lower())
+
+
+class SearchIndex(object):
+    """
+    Thread-safe inverted index over Note and Bookmark entries.
+
+    items are entries of any datatype, e.g. a tree as returned by
+    get_note_tree(); the populated children of folders are indexed too,
+    and entries of other item types are skipped.
+    """
+
+    def __init__(self, items=()):
+        self._entries = {}
+        # word: {item ID: weight of the word in the item}
+        self._postings = {}
+        # item ID: words of the item
+        self._words = {}
+        # item ID: parent folder ID, of the entries and folders seen in
+        # trees
+        self._parents = {}
+        # datatype: ID of the trash folder
+        self._trash = {}
+        # Sorted words, for prefix queries, built on first use
+        self._vocabulary = None
+        # word: its weights negated in order, and {weight: item IDs},
+        # built on first use
+        self._ranked = {}
+        self._hooks = {}
+        self._lock = threading.RLock()
+        self.add_items(items)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, item_id):
+        return getattr(item_id, "id", item_id) in self._entries
+
+    def add_items(self, items, parent_id=None):
+        """
+        Indexes items and the populated children of folders among them,
+        except the content of the trash folder. parent_id is the ID of the
+        folder holding items, if any.
+        """
+        self._lock.acquire()
+        try:
+            for entry in items:
+                self._parents[entry.id] = parent_id
+                # Entries of list datatypes have no folders
+                if getattr(entry, "is_folder", False):
+                    if parent_id is None and \
+                            getattr(entry, "type", None) == "trash":
+                        self._trash[entry.datatype] = entry.id
+                        continue
+                    self.add_items(getattr(entry, "_children", None) or (),
+                                   entry.id)
+                else:
+                    self.add(entry)
+        finally:
+            self._lock.release()
+
+    def add(self, entry):
+        """
+        Indexes entry, replacing the entry with the same ID if any.
+        Entries other than notes and bookmarks are ignored.
+        """
+        fields = SEARCH_FIELDS.get(entry.item_type)
+        if fields is None:
+            return
+        weights = {}
+        for field in fields:
+            value = entry._raw_value(field)
+            if value is NOT_LOADED:
+                continue
+            counts = {}
+            for word in tokenize(value):
+                counts[word] = counts.get(word, 0) + 1
+            for word, count in counts.iteritems():
+                weights[word] = weights.get(word, 0) + \
+                                FIELD_WEIGHTS[field] * (1 + math.log(count))
+
+        self._lock.acquire()
+        try:
+            self._remove(entry.id)
+            self._entries[entry.id] = entry
+            self._words[entry.id] = weights.keys()
+            for word, weight in weights.iteritems():
+                postings = self._postings.get(word)
+                if postings is None:
+                    postings = self._postings[word] = {}
+                    if self._vocabulary is not None:
+                        insort(self._vocabulary, word)
+                postings[entry.id] = weight
+                if word in self._ranked:
+                    _rank(self._ranked[word], entry.id, weight)
+        finally:
+            self._lock.release()
+
+    # Indexing the current fields of an entry replaces its old words
+    update = add
+
+    def remove(self, entry):
+        """
+        Removes entry, given as an entry or an ID, and the entries seen
+        inside it if it is a folder
+        """
+        item_id = getattr(entry, "id", entry)
+        self._lock.acquire()
+        try:
+            if item_id in self._entries:
+                self._remove(item_id)
+            elif item_id in self._parents:
+                # Found before any is forgotten, as they are found through
+                # the parents of their folders
+                inside = [other_id for other_id in self._parents
+                          if self._is_inside(other_id, item_id)]
+                for other_id in inside:
+                    self._remove(other_id)
+                    del self._parents[other_id]
+            self._parents.pop(item_id, None)
+        finally:
+            self._lock.release()
+
+    def search(self, query, limit=20):
+        """
+        Returns the entries matching all the words of query, the last
+        one as a prefix, best matches first. At most limit entries are
+        returned, all of them if limit is None.
+        """
+        if limit is not None and limit < 0:
+            raise ValueError("limit must not be negative")
+        words = tokenize(query)
+        if not words or limit == 0:
+            return []
+        self._lock.acquire()
+        try:
+            total = float(len(self._entries))
+            # For each word of the query, {matching word: idf}
+            terms = []
+            for term_words in [[word] for word in words[:-1]] + \
+                    [self._expand(words[-1])]:
+                idfs = dict((word, math.log(1 + total /
+                                               len(self._postings[word])))
+                            for word in term_words if word in self._postings)
+                if not idfs:
+                    return []
+                terms.append(idfs)
+
+            # The entries of the rarest word are visited best first, the
+            # other words are looked up in each of them
+            lead = min(terms, key=lambda idfs: sum(len(self._postings[word])
+                                                   for word in idfs))
+            others = [idfs for idfs in terms if idfs is not lead]
+            # Most the other words can add to the score of an entry
+            others_best = sum(max(-self._ranked_postings(word)[0][0] * idf
+                                  for word, idf in idfs.iteritems())
+                              for idfs in others)
+            lead_postings = heapq.merge(*[self._scored(word, idf)
+                                          for word, idf in lead.iteritems()])
+            # Min-heap of the (score, item ID) of the best matches so far
+            best = []
+            seen = set()
+            for negative_score, item_id in lead_postings:
+                if limit is not None and len(best) >= limit and \
+                        best[0][0] >= others_best - negative_score:
+                    # None of the entries left can do better
+                    break
+                # Entries are met first with their best word of lead
+                if item_id in seen:
+                    continue
+                seen.add(item_id)
+                score = -negative_score
+                for idfs in others:
+                    word_score = self._word_score(item_id, idfs)
+                    if not word_score:
+                        break
+                    score += word_score
+                else:
+                    if limit is None or len(best) < limit:
+                        heapq.heappush(best, (score, item_id))
+                    elif score > best[0][0]:
+                        heapq.heapreplace(best, (score, item_id))
+            best.sort(reverse=True)
+            return [self._entries[item_id] for score, item_id in best]
+        finally:
+            self._lock.release()
+
+    def install(self, client):
+        """
+        Makes the index follow the changes made through client
+        """
+        hook = lambda event: self._after_change(client, event)
+        self._hooks[client] = hook
+        client.add_hook("after_change", hook)
+
+    def uninstall(self, client):
+        client.remove_hook("after_change", self._hooks.pop(client))
+
+    def _after_change(self, client, event):
+        if event.api_method == "delete":
+            self.remove(event.item_id)
+            return
+        data = event.data and event.data[0]
+        if not data:
+            return
+        self._lock.acquire()
+        try:
+            if event.api_method == "create":
+                if event.item_id and \
+                        event.item_id in self._trash.itervalues():
+                    return
+                if event.datatype in self._trash or \
+                        event.item_id in self._parents:
+                    self._parents[data["id"]] = event.item_id or None
+                if data["item_type"] in SEARCH_FIELDS:
+                    self.add(client._decoders[data["item_type"]](client,
+                                                                 data))
+            elif event.api_method == "update":
+                entry = self._entries.get(data["id"])
+                if entry is not None:
+                    entry._set_fields(data["properties"])
+                    entry._mark_clean()
+                    self.add(entry)
+            elif event.api_method == "move":
+                self._move(event.item_id, event.params)
+            elif event.api_method == "trash":
+                self.remove(event.item_id)
+        finally:
+            self._lock.release()
+
+    def _move(self, item_id, params):
+        reference = params.get("reference_item") or None
+        if params.get("relative_position") == "into":
+            parent_id = reference
+        else:
+            parent_id = self._parents.get(reference)
+        if parent_id is not None and parent_id in self._trash.itervalues():
+            self.remove(item_id)
+        else:
+            self._parents[item_id] = parent_id
+
+    def _is_inside(self, item_id, folder_id):
+        """
+        Returns whether item_id is below folder_id, as far as it is known
+        """
+        parent_id = self._parents.get(item_id)
+        while parent_id is not None:
+            if parent_id == folder_id:
+                return True
+            parent_id = self._parents.get(parent_id)
+        return False
+
+    def _expand(self, prefix):
+        """
+        Returns the words starting with prefix, only the MAX_PREFIX_WORDS
+        most frequent ones, and prefix itself, if there are more
+        """
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self._postings)
+        vocabulary = self._vocabulary
+        start = bisect_left(vocabulary, prefix)
+        if prefix[-1] == unichr(sys.maxunicode):
+            end = len(vocabulary)
+            while end > start and not vocabulary[end - 1].startswith(prefix):
+                end -= 1
+        else:
+            # The first string after all those starting with prefix
+            end = bisect_left(vocabulary,
+                              prefix[:-1] + unichr(ord(prefix[-1]) + 1))
+        words = vocabulary[start:end]
+        if len(words) > MAX_PREFIX_WORDS:
+            counts = map(len, map(self._postings.__getitem__, words))
+            words = [word for count, word in
+                     heapq.nlargest(MAX_PREFIX_WORDS, izip(counts, words))]
+            if prefix in self._postings and prefix not in words:
+                words.append(prefix)
+        return words
+
+    def _ranked_postings(self, word):
+        """
+        Returns the weights of word, negated and in order, and the IDs of
+        the entries with each weight
+        """
+        ranked = self._ranked.get(word)
+        if ranked is None:
+            # Entries share few weights, grouping them is faster than
+            # sorting them
+            buckets = {}
+            for item_id, weight in self._postings[word].iteritems():
+                bucket = buckets.get(weight)
+                if bucket is None:
+                    bucket = buckets[weight] = set()
+                bucket.add(item_id)
+            ranked = self._ranked[word] = (sorted(-weight for weight
+                                                  in buckets), buckets)
+        return ranked
+
+    def _scored(self, word, idf):
+        """
+        Yields the (negated score, item ID) pairs of word, best first
+        """
+        order, buckets = self._ranked_postings(word)
+        for negative_weight in order:
+            score = negative_weight * idf
+            for item_id in buckets[-negative_weight]:
+                yield score, item_id
+
+    def _word_score(self, item_id, idfs):
+        """
+        Returns the score of the best of the words of idfs found in the
+        entry, 0 if there is none
+        """
+        postings = self._postings
+        words = self._words[item_id]
+        if len(idfs) < len(words):
+            words = idfs
+        best = 0
+        for word in words:
+            idf = idfs.get(word)
+            if idf is None:
+                continue
+            weight = postings[word].get(item_id)
+            if weight is not None and weight * idf > best:
+                best = weight * idf
+        return best
+
+    def _remove(self, item_id):
+        if item_id not in self._entries:
+            return
+        del self._entries[item_id]
+        for word in self._words.pop(item_id):
+            postings = self._postings[word]
+            if word in self._ranked:
+                _unrank(self._ranked[word], item_id, postings[item_id])
+            del postings[item_id]
+            if not postings:
+                del self._postings[word]
+                self._ranked.pop(word, None)
+                if self._vocabulary is not None:
+                    del self._vocabulary[bisect_left(self._vocabulary, word)]
+
+
+def _rank(ranked, item_id, weight):
+    order, buckets = ranked
+    bucket = buckets.get(weight)
+    if bucket is None:
+        bucket = buckets[weight] = set()
+        insort(order, -weight)
+    bucket.add(item_id)
+
+
+def _unrank(ranked, item_id, weight):
+    order, buckets = ranked
+    bucket = buckets[weight]
+    bucket.discard(item_id)
+    if not bucket:
+        del buckets[weight]
+        del order[bisect_left(order, -weight)]
@@ -0,0 +1,141 @@
+"""
+On-disk snapshots of users' Opera Link data.
+
+    >>> store = SnapshotStore("/var/cache/link.db")
+    >>> client.save_snapshot(store, "bookmark")
+
+And later, without any request to the server:
+
+    >>> bookmarks = client.load_snapshot(store, "bookmark")
+
+Tree-structured datatypes are saved with their whole folder structure,
+and loaded with the children of every folder populated. The time each
+snapshot was taken is kept, see SnapshotStore.saved_at.
+"""
+
+import sqlite3
+import threading
+import time
+
+try:
+    import json as simplejson
+except ImportError:
+    import simplejson
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    user TEXT NOT NULL,
+    datatype TEXT NOT NULL,
+    saved_at REAL NOT NULL,
+    PRIMARY KEY (user, datatype)
+);
+CREATE TABLE IF NOT EXISTS items (
+    user TEXT NOT NULL,
+    datatype TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    id TEXT NOT NULL,
+    parent_id TEXT,
+    item_type TEXT NOT NULL,
+    properties TEXT NOT NULL,
+    PRIMARY KEY (user, datatype, position)
+);
+"""
+
+
+class SnapshotStore(object):
+    """
+    SQLite database holding the latest snapshot of every user's datatypes.
+    It can be shared by many clients and threads.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self):
+        self._db.close()
+
+    def save(self, user, datatype, items):
+        """
+        Replaces the snapshot of the user's datatype with items, a list of
+        entries. The children of folders are saved too, fetching those not
+        yet loaded.
+        """
+        rows = []
+        self._flatten(items, None, rows)
+        self._lock.acquire()
+        try:
+            db = self._db
+            try:
+                db.execute("DELETE FROM items WHERE user = ? AND datatype = ?",
+                           (user, datatype))
+                db.executemany("INSERT INTO items VALUES (?, ?, ?, ?, ?, ?, ?)",
+                               [(user, datatype, position) + row
+                                for position, row in enumerate(rows)])
+                db.execute("INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?)",
+                           (user, datatype, time.time()))
+                db.commit()
+            except:
+                db.rollback()
+                raise
+        finally:
+            self._lock.release()
+
+    def load(self, user, datatype):
+        """
+        Returns the snapshot of the user's datatype as a list of items' data,
+        nested like the server's descendants resource, or None if there is
+        no snapshot.
+        """
+        self._lock.acquire()
+        try:
+            if self._saved_at(user, datatype) is None:
+                return None
+            rows = self._db.execute("SELECT id, parent_id, item_type, "
+                                    "properties FROM items "
+                                    "WHERE user = ? AND datatype = ? "
+                                    "ORDER BY position",
+                                    (user, datatype)).fetchall()
+        finally:
+            self._lock.release()
+
+        items = []
+        folders = {}
+        for item_id, parent_id, item_type, properties in rows:
+            data = {"id": item_id, "item_type": item_type,
+                    "properties": simplejson.loads(properties),
+                    "children": []}
+            folders[item_id] = data["children"]
+            if parent_id is None:
+                items.append(data)
+            else:
+                folders[parent_id].append(data)
+        return items
+
+    def saved_at(self, user, datatype):
+        """
+        Returns the time the snapshot of the user's datatype was saved, in
+        seconds since the epoch, or None if there is no snapshot.
+        """
+        self._lock.acquire()
+        try:
+            return self._saved_at(user, datatype)
+        finally:
+            self._lock.release()
+
+    def _saved_at(self, user, datatype):
+        row = self._db.execute("SELECT saved_at FROM snapshots "
+                               "WHERE user = ? AND datatype = ?",
+                               (user, datatype)).fetchone()
+        if row is not None:
+            return row[0]
+
+    def _flatten(self, items, parent_id, rows):
+        # Parents are always saved before their children
+        for item in items:
+            rows.append((item.id, parent_id, item.item_type,
+                         simplejson.dumps(item._to_python())))
+            if getattr(item, "is_folder", False):
+                self._flatten(item.children, item.id, rows)
@@ -0,0 +1,70 @@
+"""
+Incremental decoding of JSON arrays read from a stream
+"""
+
+try:
+    import json as simplejson
+except ImportError:
+    import simplejson
+
+WHITESPACE = " \t\n\r"
+
+# Characters which may continue a number
+NUMBER_CHARS = "0123456789+-.eE"
+
+
+def iter_json_array(stream, chunk_size=65536):
+    """
+    Yields the elements of the JSON array read from stream (an object
+    with a read(size) method) one at a time, keeping only about one
+    element and one chunk in memory.
+
+    An empty stream counts as an empty array, like an empty response
+    from the Opera Link server.
+    """
+    decoder = simplejson.JSONDecoder()
+    buf = ""
+    pos = 0
+    eof = False
+    started = False
+
+    while True:
+        while pos < len(buf) and buf[pos] in WHITESPACE:
+            pos += 1
+
+        if pos < len(buf):
+            char = buf[pos]
+            if not started:
+                if char != "[":
+                    raise ValueError("Expected a JSON array")
+                started = True
+                pos += 1
+                continue
+            if char == "]":
+                return
+            if char == ",":
+                pos += 1
+                continue
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except ValueError:
+                if eof:
+                    raise
+            else:
+                # A number may be truncated, e.g. 3 of 3.5, it is complete
+                # once something which can't continue it follows
+                if eof or end < len(buf) and buf[end] not in NUMBER_CHARS:
+                    pos = end
+                    yield item
+                    continue
+        elif eof:
+            if not started and not buf:
+                return
+            raise ValueError("Unexpected end of JSON array")
+
+        chunk = stream.read(chunk_size)
+        if chunk:
+            buf = buf[pos:] + chunk
+            pos = 0
+        else:
+            eof = True
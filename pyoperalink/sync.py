@@ -0,0 +1,278 @@
+"""
+Reconciliation of a local tree of items with the server.
+
+    >>> remote = client.get_bookmark_tree()
+    >>> operations = diff_trees(local, remote)
+    >>> apply_operations(client, operations)
+
+local and remote are lists of the top-level TreeEntry objects of a
+bookmark or note tree, with the children of every folder populated, as
+returned by get_bookmark_tree() or load_snapshot(). Items are matched by
+id; local items without an id are new. Folders created locally can be
+given their children with folder.children = [...].
+
+diff_trees returns the operations making the server's tree look like
+the local one, trying to send as few requests as possible:
+
+- create: items without an id, appended to their folder,
+- update: items whose fields differ, sending only those fields,
+- move: items in another folder, or out of order; the longest run of
+  items already in the right order is left in place,
+- trash: items missing from the local tree. Only the topmost of them
+  are trashed, their descendants go along. The trash folder and its
+  content are left alone.
+"""
+
+from __future__ import absolute_import
+
+from bisect import bisect_left
+
+from pyoperalink.datatypes import NOT_LOADED, _as_datetime
+
+
+class Operation(object):
+    """
+    A change to make on the server.
+
+    entry is the local item, or the server's item when trashing. For
+    creates, folder is the destination (None for the root folder); for
+    moves, reference is the reference item (or folder when position is
+    "into"); for updates, fields lists the fields to send.
+    """
+
+    def __init__(self, kind, entry, folder=None, reference=None,
+                 position=None, fields=None):
+        self.kind = kind
+        self.entry = entry
+        self.folder = folder
+        self.reference = reference
+        self.position = position
+        self.fields = fields
+
+    def apply(self, client):
+        """
+        Sends the operation to the server through client
+        """
+        entry = self.entry
+        datatype = entry.datatype
+        if self.kind == "create":
+            entry._conn = client
+            entry._add(self.folder and self.folder.id)
+        elif self.kind == "update":
+            method = getattr(client, "update_%s" % datatype)
+            resp = method(entry.id, entry._to_python(self.fields))
+            entry._set_fields(resp[0]["properties"])
+            entry._mark_clean()
+        elif self.kind == "move":
+            method = getattr(client, "move_%s" % datatype)
+            method(entry.id, self.position,
+                   self.reference and self.reference.id)
+        elif self.kind == "trash":
+            method = getattr(client, "trash_%s" % datatype)
+            method(entry.id)
+        else:
+            raise ValueError("Unknown operation: %s" % self.kind)
+
+    def __repr__(self):
+        details = ""
+        if self.kind == "update":
+            details = " %s" % ",".join(self.fields)
+        elif self.kind == "move":
+            details = " %s %s" % (self.position, _label(self.reference))
+        elif self.kind == "create" and self.folder is not None:
+            details = " into %s" % _label(self.folder)
+        return "<%s: %s %s%s>" % (self.__class__.__name__, self.kind,
+                                  _label(self.entry), details)
+
+
+def diff_trees(local, remote):
+    """
+    Returns the list of Operations making the remote tree match the
+    local one, in the order they must be applied.
+    """
+    remote_items = {}
+    remote_children = {}
+    _index_remote(remote, None, remote_items, remote_children)
+
+    operations = []
+    local_ids = set()
+    _diff_folder(None, local, remote_items, remote_children, local_ids,
+                 operations)
+
+    # Items to keep have been moved out of trashed folders by now
+    for item_id, (item, parent_id) in remote_items.iteritems():
+        if item_id in local_ids or _is_trash(item):
+            continue
+        if parent_id is not None and parent_id not in local_ids:
+            # Goes along with its parent, or is in the trash folder
+            continue
+        operations.append(Operation("trash", item))
+    return operations
+
+
+def apply_operations(client, operations):
+    """
+    Applies operations, as returned by diff_trees, through client
+    """
+    for operation in operations:
+        operation.apply(client)
+
+
+def synchronize(client, local, remote=None):
+    """
+    Makes the server's tree match local and returns the operations
+    applied. If remote is None, the server's tree is fetched first.
+    """
+    if remote is None:
+        datatype = _datatype(local)
+        if datatype is None:
+            return []
+        remote = getattr(client, "get_%s_tree" % datatype)()
+    operations = diff_trees(local, remote)
+    apply_operations(client, operations)
+    return operations
+
+
+def _label(entry):
+    if entry is None:
+        return "root"
+    # Items not created yet have no id
+    return entry.id or "new %s" % entry.item_type
+
+
+def _datatype(items):
+    for item in items:
+        return item.datatype
+
+
+def _is_trash(item):
+    return item.is_folder and getattr(item, "type", None) == "trash"
+
+
+def _children(folder):
+    if folder._children is not None:
+        return folder._children
+    # Folders created locally without children
+    if folder.id is None:
+        return []
+    return folder.children
+
+
+def _index_remote(items, parent_id, remote_items, remote_children):
+    remote_children[parent_id] = [item.id for item in items]
+    for item in items:
+        remote_items[item.id] = (item, parent_id)
+        if item.is_folder and not _is_trash(item):
+            _index_remote(_children(item), item.id, remote_items,
+                          remote_children)
+
+
+def _diff_folder(folder, items, remote_items, remote_children, local_ids,
+                 operations):
+    if folder is not None and folder.id is None:
+        current = []
+    else:
+        current = remote_children.get(folder and folder.id, [])
+    kept = _kept_in_place(items, current)
+
+    for index, item in enumerate(items):
+        if item.id is not None:
+            local_ids.add(item.id)
+        remote = item.id is not None and remote_items.get(item.id)
+
+        if not remote:
+            operations.append(Operation("create", item, folder=folder))
+            # New items are appended, move them back unless nothing
+            # already in place should follow them
+            if _next_kept(items, index, kept) is not None:
+                operations.append(_placement(items, index, kept, folder))
+        else:
+            fields = _changed_fields(item, remote[0])
+            if fields:
+                operations.append(Operation("update", item, fields=fields))
+            if item.id not in kept:
+                operations.append(_placement(items, index, kept, folder))
+
+        if item.is_folder and not _is_trash(item):
+            _diff_folder(item, _children(item), remote_items,
+                         remote_children, local_ids, operations)
+
+
+def _placement(items, index, kept, folder):
+    """
+    Returns the move placing items[index] right after the items before it,
+    which are all in place by then
+    """
+    item = items[index]
+    if index > 0:
+        return Operation("move", item, reference=items[index - 1],
+                         position="after")
+    following = _next_kept(items, index, kept)
+    if following is not None:
+        return Operation("move", item, reference=following,
+                         position="before")
+    return Operation("move", item, reference=folder, position="into")
+
+
+def _next_kept(items, index, kept):
+    for item in items[index + 1:]:
+        if item.id in kept:
+            return item
+
+
+def _kept_in_place(items, current):
+    """
+    Returns the ids of the largest set of items already in the folder
+    whose order needs no change: the longest increasing subsequence of
+    their current positions.
+    """
+    positions = dict((item_id, position)
+                     for position, item_id in enumerate(current))
+    sequence = [(positions[item.id], item.id) for item in items
+                if item.id is not None and item.id in positions]
+
+    # Patience sorting, keeping back links to rebuild the subsequence
+    tails = []
+    tail_indexes = []
+    previous = [None] * len(sequence)
+    for index, (position, item_id) in enumerate(sequence):
+        slot = bisect_left(tails, position)
+        if slot > 0:
+            previous[index] = tail_indexes[slot - 1]
+        if slot == len(tails):
+            tails.append(position)
+            tail_indexes.append(index)
+        else:
+            tails[slot] = position
+            tail_indexes[slot] = index
+
+    kept = set()
+    index = None
+    if tail_indexes:
+        index = tail_indexes[-1]
+    while index is not None:
+        kept.add(sequence[index][1])
+        index = previous[index]
+    return kept
+
+
+def _changed_fields(local, remote):
+    local_values = local._to_python()
+    remote_values = remote._to_python()
+    changed = []
+    for field in local.fields:
+        # Heavy fields of a remote tree fetched in light mode are not
+        # compared
+        if field not in local_values or \
+                remote._raw_value(field) is NOT_LOADED:
+            continue
+        local_value = local_values[field]
+        remote_value = remote_values.get(field)
+        if field in local.date_fields:
+            # Dates read locally lost the fractions and offset of their
+            # original string
+            local_value = _as_datetime(local._raw_value(field))
+            remote_value = _as_datetime(remote._raw_value(field))
+        if local_value != remote_value:
+            changed.append(field)
+    return changed
@@ -0,0 +1,242 @@
+"""
+HTTP transport for the Opera Link API.
+
+A transport is any object with a request(url, method, body, headers)
+method returning a (response, content) tuple, where response has the
+status, reason and headers of the HTTP response. Requests given to the
+transport are already signed, so one transport can be shared by the
+clients of any number of users.
+
+Transports may also have a stream(url, method, body, headers) method,
+returning the content as a file-like object read on demand.
+"""
+
+import httplib
+import socket
+import threading
+import time
+
+from urlparse import urlsplit
+
+
+class Response(object):
+    """
+    Status line and headers of an HTTP response
+    """
+
+    def __init__(self, status, reason, headers=()):
+        self.status = status
+        self.reason = reason
+        self.headers = dict((name.lower(), value) for name, value in headers)
+
+    def getheader(self, name, default=None):
+        return self.headers.get(name.lower(), default)
+
+    def __repr__(self):
+        return "<%s: %s %s>" % (self.__class__.__name__,
+                                self.status,
+                                self.reason)
+
+
+class HTTPConnectionPool(object):
+    """
+    Thread-safe pool of persistent HTTP(S) connections.
+
+    Connections are kept alive between requests and reused, saving the
+    TCP and TLS handshakes. At most max_size idle connections are kept
+    per host; connections idle for longer than idle_timeout seconds are
+    closed instead of being reused.
+
+    The pool keeps these counters, available in stats:
+
+    hits - requests sent over a reused connection
+    opens - new connections opened
+    evictions - idle connections closed for exceeding idle_timeout
+    discards - connections closed because the pool was full, the
+               server asked for it, or the connection failed
+    """
+
+    connection_classes = {
+        "http": httplib.HTTPConnection,
+        "https": httplib.HTTPSConnection,
+    }
+
+    def __init__(self, max_size=10, idle_timeout=60, timeout=30):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.hits = 0
+        self.opens = 0
+        self.evictions = 0
+        self.discards = 0
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    @property
+    def stats(self):
+        self._lock.acquire()
+        try:
+            return {
+                "hits": self.hits,
+                "opens": self.opens,
+                "evictions": self.evictions,
+                "discards": self.discards,
+                "idle": sum(map(len, self._idle.values())),
+            }
+        finally:
+            self._lock.release()
+
+    def request(self, url, method="GET", body=None, headers=None):
+        key, conn, response = self._send(url, method, body, headers)
+        try:
+            content = response.read()
+        except (httplib.HTTPException, socket.error):
+            self._discard(conn)
+            raise
+        self._finish(key, conn, response)
+        return Response(response.status, response.reason,
+                        response.getheaders()), content
+
+    def stream(self, url, method="GET", body=None, headers=None):
+        """
+        Sends a request like request(), but returns the content as a
+        ResponseBody, read from the connection on demand.
+        """
+        key, conn, response = self._send(url, method, body, headers)
+        return Response(response.status, response.reason,
+                        response.getheaders()), \
+               ResponseBody(self, key, conn, response)
+
+    def close(self):
+        """
+        Closes all idle connections
+        """
+        self._lock.acquire()
+        try:
+            idle, self._idle = self._idle, {}
+        finally:
+            self._lock.release()
+        for connections in idle.values():
+            for conn, last_used in connections:
+                conn.close()
+
+    def _send(self, url, method, body, headers):
+        scheme, netloc, path, query, fragment = urlsplit(url)
+        key = (scheme, netloc)
+        selector = path or "/"
+        if query:
+            selector += "?" + query
+
+        while True:
+            conn, reused = self._acquire(key)
+            try:
+                conn.request(method, selector, body, headers or {})
+                return key, conn, conn.getresponse()
+            except (httplib.HTTPException, socket.error):
+                self._discard(conn)
+                # The server may have closed a connection while it was
+                # idle, retry on another one
+                if not reused:
+                    raise
+
+    def _finish(self, key, conn, response):
+        """
+        Returns the connection to the pool once the response is read
+        """
+        if response.will_close:
+            self._discard(conn)
+        else:
+            self._release(key, conn)
+
+    def _acquire(self, key):
+        expired = []
+        self._lock.acquire()
+        try:
+            connections = self._idle.get(key, [])
+            deadline = time.time() - self.idle_timeout
+            # Connections are released at the end of the list, so the
+            # oldest ones are at the front
+            while connections and connections[0][1] < deadline:
+                expired.append(connections.pop(0)[0])
+            self.evictions += len(expired)
+            if connections:
+                self.hits += 1
+                conn = connections.pop()[0]
+            else:
+                self.opens += 1
+                conn = None
+        finally:
+            self._lock.release()
+
+        for expired_conn in expired:
+            expired_conn.close()
+        if conn is not None:
+            return conn, True
+
+        scheme, netloc = key
+        try:
+            connection_class = self.connection_classes[scheme]
+        except KeyError:
+            raise ValueError("Unsupported URL scheme: %s" % scheme)
+        return connection_class(netloc, timeout=self.timeout), False
+
+    def _release(self, key, conn):
+        self._lock.acquire()
+        try:
+            connections = self._idle.setdefault(key, [])
+            if len(connections) < self.max_size:
+                connections.append((conn, time.time()))
+                return
+            self.discards += 1
+        finally:
+            self._lock.release()
+        conn.close()
+
+    def _discard(self, conn):
+        self._lock.acquire()
+        try:
+            self.discards += 1
+        finally:
+            self._lock.release()
+        conn.close()
+
+
+class ResponseBody(object):
+    """
+    Content of a streamed response.
+
+    The connection goes back to the pool once the content has been read to
+    the end. Closing the body before that closes the connection.
+    """
+
+    def __init__(self, pool, key, conn, response):
+        self._pool = pool
+        self._key = key
+        self._conn = conn
+        self._response = response
+
+    def read(self, size=-1):
+        response = self._response
+        if response is None:
+            return ""
+        try:
+            if size < 0:
+                data = response.read()
+            else:
+                data = response.read(size)
+        except (httplib.HTTPException, socket.error):
+            self.close()
+            raise
+        if not data or response.isclosed():
+            self._response = None
+            self._pool._finish(self._key, self._conn, response)
+        return data
+
+    def close(self):
+        if self._response is not None:
+            self._response = None
+            self._pool._discard(self._conn)
+
+
+# Pool shared by all clients which are not given a transport
+shared_pool = HTTPConnectionPool()
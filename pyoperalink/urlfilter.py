@@ -0,0 +1,231 @@
+"""
+Matching of URLs against the user's URL filters.
+
+    >>> matcher = UrlFilterMatcher(client.get_urlfilters())
+    >>> matcher.is_blocked("http://ads.example.com/banner.gif")
+    True
+
+UrlFilter entries hold a pattern in content and their list in type,
+"include" or "exclude". Patterns use Opera's wildcard syntax: "*"
+matches any characters, and a pattern must match the whole URL.
+Patterns and URLs are compared regardless of case.
+
+Instead of testing every pattern in turn, the patterns of each list are
+compiled once into a PatternSet:
+
+- patterns without wildcards are kept in a set,
+- patterns with a literal host, e.g. http://ads.example.com/*, are
+  grouped by host; a URL is only tested against the patterns of its
+  own host, which are checked by prefix or with one regular expression,
+- other patterns are indexed by one of their words, e.g. "tracker" for
+  *://*.tracker.net/*, chosen so that any URL they match contains that
+  word; a URL is only tested against the patterns of its own words,
+  combined into one regular expression per word,
+- the few patterns left, without such a word, are combined into a single
+  regular expression.
+
+See benchmarks/urlfilter.py for its speed against testing the patterns
+one by one.
+"""
+
+import re
+
+FILTER_TYPES = ("include", "exclude")
+
+# Words of URLs are runs of letters and digits
+word_re = re.compile(r"[a-z0-9]+")
+
+# Words found in too many URLs to narrow down the patterns to test
+COMMON_WORDS = frozenset(["http", "https", "ftp", "www", "com", "net", "org",
+                          "html", "htm", "php", "index"])
+
+# Splits URLs into the scheme followed by "://", the host, and the rest
+url_re = re.compile(r"(.*?://)([^/?#]*)", re.DOTALL)
+
+
+def compile_pattern(pattern):
+    """
+    Returns the regular expression of an Opera wildcard pattern
+    """
+    return ".*".join(re.escape(part) for part in pattern.split("*"))
+
+
+def _combine(patterns):
+    """
+    Returns the match method of one regular expression matching any of
+    patterns as a whole
+    """
+    return re.compile("(?:%s)\Z" % "|".join(compile_pattern(pattern)
+                                            for pattern in patterns),
+                      re.DOTALL).match
+
+
+def _split_host(url):
+    """
+    Splits url into its host and the rest, the scheme followed by "://"
+    and what follows the host. Returns None if url has no host.
+    """
+    match = url_re.match(url)
+    if match is None:
+        return None
+    return match.group(2), match.group(1) + url[match.end():]
+
+
+def _pattern_words(pattern):
+    """
+    Returns the words that any URL matched by pattern contains as whole
+    words: runs of letters and digits of the pattern not next to a
+    wildcard
+    """
+    words = []
+    for match in word_re.finditer(pattern):
+        start, end = match.span()
+        if (start and pattern[start - 1] == "*") or \
+                (end < len(pattern) and pattern[end] == "*"):
+            continue
+        words.append(match.group())
+    return words
+
+
+class _HostPatterns(object):
+    """
+    Patterns sharing a literal host, matched against the rest of URLs
+    """
+
+    def __init__(self):
+        self.prefixes = []
+        self.patterns = []
+        self.match = None
+
+    def add(self, rest):
+        if rest.endswith("*") and "*" not in rest[:-1]:
+            self.prefixes.append(rest[:-1])
+        else:
+            self.patterns.append(rest)
+
+    def compile(self):
+        self.prefixes = tuple(self.prefixes)
+        if self.patterns:
+            self.match = _combine(self.patterns)
+
+    def matches(self, rest):
+        if self.prefixes and rest.startswith(self.prefixes):
+            return True
+        return self.match is not None and self.match(rest) is not None
+
+
+class PatternSet(object):
+    """
+    Opera wildcard patterns compiled to test many URLs
+    """
+
+    def __init__(self, patterns):
+        self.patterns = sorted(set(pattern.strip().lower()
+                                   for pattern in patterns if pattern))
+        self._exact = set()
+        # host: _HostPatterns
+        self._hosts = {}
+        # word: match method of the patterns indexed by the word
+        self._words = {}
+        self._match = None
+        # Whether a pattern matches any URL, e.g. "*"
+        self._any = False
+
+        indexed = []
+        others = []
+        for pattern in self.patterns:
+            if "*" not in pattern:
+                self._exact.add(pattern)
+                continue
+            if not pattern.strip("*"):
+                self._any = True
+                continue
+            parts = _split_host(pattern)
+            if parts is not None and "*" not in parts[0] and \
+                    "*" not in pattern[:pattern.find("://")]:
+                host, rest = parts
+                self._hosts.setdefault(host, _HostPatterns()).add(rest)
+                continue
+            words = _pattern_words(pattern)
+            if words:
+                indexed.append((pattern, words))
+            else:
+                others.append(pattern)
+        for host_patterns in self._hosts.itervalues():
+            host_patterns.compile()
+
+        # Index each pattern by its least used uncommon word
+        counts = {}
+        for pattern, words in indexed:
+            for word in set(words):
+                counts[word] = counts.get(word, 0) + 1
+        by_word = {}
+        for pattern, words in indexed:
+            word = min(words, key=lambda word: (word in COMMON_WORDS,
+                                                counts[word], -len(word)))
+            by_word.setdefault(word, []).append(pattern)
+        self._words = dict((word, _combine(patterns))
+                           for word, patterns in by_word.iteritems())
+        if others:
+            self._match = _combine(others)
+
+    def __len__(self):
+        return len(self.patterns)
+
+    def matches(self, url):
+        """
+        Returns whether any of the patterns matches url
+        """
+        if self._any:
+            return True
+        url = url.strip().lower()
+        if url in self._exact:
+            return True
+        if self._hosts:
+            parts = _split_host(url)
+            if parts is not None:
+                host_patterns = self._hosts.get(parts[0])
+                if host_patterns is not None and \
+                        host_patterns.matches(parts[1]):
+                    return True
+        if self._words:
+            words = self._words
+            for word in set(word_re.findall(url)):
+                match = words.get(word)
+                if match is not None and match(url) is not None:
+                    return True
+        return self._match is not None and self._match(url) is not None
+
+
+class UrlFilterMatcher(object):
+    """
+    Include and exclude lists of URL filters, compiled for matching.
+
+    filters are UrlFilter entries, e.g. as returned by get_urlfilters().
+    The matcher doesn't follow later changes of the filters; build a new
+    one instead.
+    """
+
+    def __init__(self, filters=()):
+        patterns = dict((filter_type, []) for filter_type in FILTER_TYPES)
+        for url_filter in filters:
+            if url_filter.type in patterns:
+                patterns[url_filter.type].append(url_filter.content)
+        self.include = PatternSet(patterns["include"])
+        self.exclude = PatternSet(patterns["exclude"])
+
+    def matches(self, url, filter_type="exclude"):
+        """
+        Returns whether any filter of filter_type matches url
+        """
+        return getattr(self, filter_type).matches(url)
+
+    def is_blocked(self, url):
+        """
+        Returns whether url is blocked: it matches an exclude filter, or
+        there are include filters and it matches none of them. Exclude
+        filters take priority.
+        """
+        if self.exclude.matches(url):
+            return True
+        return bool(self.include) and not self.include.matches(url)
@@ -0,0 +1,52 @@
+"""
+Tests of pyoperalink, run with nose:
+
+    $ python setup.py test
+
+Most tests talk to a mockserver.MockLinkServer, started for each class.
+"""
+
+import itertools
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+from pyoperalink.client import LinkClient
+from pyoperalink.mockserver import MockLinkServer
+
+
+class ServerTestCase(unittest.TestCase):
+    """
+    Runs the tests of the class against a MockLinkServer, each with a new
+    user whose name is self.user and whose client is self.client
+    """
+
+    users = itertools.count()
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = MockLinkServer()
+        cls.server.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        self.user = "user%d" % next(self.users)
+        self.auth = self.server.add_user(self.user)
+        self.client = self.make_client()
+
+    def make_client(self, **kwargs):
+        return LinkClient(self.auth, url_prefix=self.server.url_prefix,
+                          **kwargs)
+
+    def count_requests(self, function, *args, **kwargs):
+        """
+        Returns the result of function and the requests it sent
+        """
+        start = self.server.request_count
+        result = function(*args, **kwargs)
+        return result, self.server.request_count - start
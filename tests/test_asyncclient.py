@@ -0,0 +1,96 @@
+import threading
+
+from Queue import Queue
+
+from pyoperalink import asyncclient, datatypes
+from pyoperalink.asyncclient import AsyncLinkClient, threadsafe_callback
+from pyoperalink.client import LinkClient, NotFoundError
+from pyoperalink.pool import Future, ThreadPool
+
+from tests import ServerTestCase
+
+
+class AsyncClientTest(ServerTestCase):
+
+    def setUp(self):
+        super(AsyncClientTest, self).setUp()
+        self.async_client = AsyncLinkClient(self.auth,
+                url_prefix=self.server.url_prefix, max_workers=4)
+        self.addCleanup(self.async_client.close)
+
+    def test_generated_methods(self):
+        for name in ("get_bookmarks", "get_bookmark_tree", "get_note",
+                     "create_speeddial", "update_search_engine",
+                     "delete_urlfilter", "trash_bookmark", "move_note"):
+            self.assertTrue(hasattr(AsyncLinkClient, name), name)
+            self.assertTrue(hasattr(LinkClient, name), name)
+
+    def test_no_iterators(self):
+        names = [name for name in dir(LinkClient)
+                 if name.startswith(("walk_", "iter_"))]
+        self.assertTrue(names)
+        for name in names:
+            self.assertFalse(hasattr(AsyncLinkClient, name), name)
+
+    def test_returns_futures(self):
+        self.server.populate(self.user, "bookmark", items=20)
+        future = self.async_client.get_bookmarks()
+        self.assertTrue(isinstance(future, Future))
+        self.assertEqual([item.id for item in future.result(5)],
+                         [item.id for item in self.client.get_bookmarks()])
+
+    def test_errors_go_to_the_future(self):
+        future = self.async_client.get_bookmark("missing")
+        self.assertRaises(NotFoundError, future.result, 5)
+
+    def test_add(self):
+        bookmark = datatypes.Bookmark(title=u"title", uri=u"http://a.com/")
+        self.async_client.add(bookmark).result(5)
+        self.assertTrue(bookmark.id)
+        self.assertEqual(self.client.get_bookmark(bookmark.id).title,
+                         u"title")
+
+    def test_shared_pool(self):
+        pool = ThreadPool(2)
+        self.addCleanup(pool.shutdown)
+        clients = [AsyncLinkClient(client=self.make_client(), pool=pool)
+                   for i in range(3)]
+        futures = [client.get_notes() for client in clients]
+        for future in futures:
+            # Only the trash folder
+            self.assertEqual([note.type for note in future.result(5)],
+                             ["trash"])
+
+    def test_default_pool_is_shared(self):
+        clients = [AsyncLinkClient(client=self.make_client())
+                   for i in range(3)]
+        for client in clients:
+            self.assertTrue(client.pool is asyncclient.shared_pool)
+            client.close()
+        # Closing a client leaves the shared pool running
+        self.assertEqual(len(clients[0].get_notes().result(5)), 1)
+
+    def test_private_pool(self):
+        client = AsyncLinkClient(client=self.make_client(), max_workers=2)
+        self.assertFalse(client.pool is asyncclient.shared_pool)
+        self.assertEqual(client.pool.max_workers, 2)
+        client.close()
+        self.assertRaises(RuntimeError, client.get_notes)
+
+    def test_threadsafe_callback(self):
+        # A minimal event loop, running its callbacks on this thread
+        calls = Queue()
+        call_soon_threadsafe = lambda callback, *args: calls.put(
+                (callback, args))
+        threads = []
+        def callback(future):
+            threads.append(threading.currentThread())
+            self.assertEqual(len(future.result()), 1)
+
+        future = self.async_client.get_notes()
+        future.add_done_callback(threadsafe_callback(callback,
+                                                     call_soon_threadsafe))
+        function, args = calls.get(timeout=5)
+        self.assertEqual(threads, [])
+        function(*args)
+        self.assertEqual(threads, [threading.currentThread()])
@@ -0,0 +1,132 @@
+from pyoperalink import datatypes
+from pyoperalink.client import LinkError, NotFoundError
+
+from tests import ServerTestCase
+
+
+class BrokenBookmark(datatypes.Bookmark):
+
+    def update(self):
+        raise ValueError("Not JSON")
+
+
+def bookmark(n):
+    return datatypes.Bookmark(title=u"bookmark %d" % n,
+                              uri=u"http://example.com/%d" % n)
+
+
+class BulkTest(ServerTestCase):
+
+    def test_add_keeps_order(self):
+        folder = datatypes.BookmarkFolder(title=u"folder")
+        self.client.add(folder)
+        bookmarks = [bookmark(n) for n in range(20)]
+        with self.client.bulk(max_workers=8) as bulk:
+            for entry in bookmarks:
+                bulk.add(entry, folder)
+        self.assertTrue(all(result.ok for result in bulk.results))
+        self.assertEqual([item.title for item in
+                          self.client.get_bookmarks(folder.id)],
+                         [entry.title for entry in bookmarks])
+
+    def test_results_in_order(self):
+        bookmarks = [bookmark(n) for n in range(5)]
+        bulk = self.client.bulk()
+        for entry in bookmarks:
+            bulk.add(entry)
+        results = bulk.run()
+        self.assertEqual([result.entry for result in results], bookmarks)
+        self.assertEqual([result.action for result in results], ["add"] * 5)
+
+    def test_failures_do_not_stop_the_others(self):
+        entries = [bookmark(n) for n in range(3)]
+        for entry in entries:
+            self.client.add(entry)
+        missing = datatypes.Bookmark(self.client, id="missing", title=u"x")
+        missing.title = u"y"
+        broken = BrokenBookmark(self.client, id=entries[0].id)
+        with self.client.bulk() as bulk:
+            bulk.update(missing)
+            bulk.update(broken)
+            for entry in entries:
+                entry.title += u" changed"
+                bulk.update(entry)
+        errors = [result.error for result in bulk.results]
+        self.assertTrue(isinstance(errors[0], NotFoundError))
+        self.assertTrue(isinstance(errors[1], ValueError))
+        self.assertEqual(errors[2:], [None] * 3)
+        self.assertEqual(self.client.get_bookmark(entries[2].id).title,
+                         u"bookmark 2 changed")
+
+    def test_depends_on_failed_add(self):
+        missing = datatypes.BookmarkFolder(self.client, id="missing")
+        entry = bookmark(0)
+        with self.client.bulk() as bulk:
+            bulk.add(entry, missing)
+            bulk.trash(entry)
+        add, trash = bulk.results
+        self.assertTrue(isinstance(add.error, NotFoundError))
+        self.assertEqual(type(trash.error), LinkError)
+
+
+class LaneTest(ServerTestCase):
+    """
+    Operations which must keep their order share a lane
+    """
+
+    def setUp(self):
+        super(LaneTest, self).setUp()
+        self.folders = [datatypes.BookmarkFolder(self.client, id="f%d" % n)
+                        for n in range(2)]
+        self.items = [datatypes.Bookmark(self.client, id="b%d" % n)
+                      for n in range(4)]
+        self.bulk = self.client.bulk()
+
+    def lanes(self):
+        lanes = self.bulk._split_lanes(self.bulk._operations)
+        return sorted([self.bulk.results.index(operation[0])
+                       for operation in lane] for lane in lanes)
+
+    def test_independent_operations(self):
+        for item in self.items:
+            self.bulk.update(item)
+        self.assertEqual(self.lanes(), [[0], [1], [2], [3]])
+
+    def test_same_entry(self):
+        self.bulk.update(self.items[0])
+        self.bulk.update(self.items[1])
+        self.bulk.trash(self.items[0])
+        self.assertEqual(self.lanes(), [[0, 2], [1]])
+
+    def test_same_folder(self):
+        new = [bookmark(n) for n in range(3)]
+        self.bulk.add(new[0], self.folders[0])
+        self.bulk.add(new[1], self.folders[1])
+        self.bulk.move(self.items[0], self.folders[0], "into")
+        self.bulk.add(new[2])
+        self.assertEqual(self.lanes(), [[0, 2], [1], [3]])
+
+    def test_move_next_to_added_item(self):
+        new = bookmark(0)
+        self.bulk.add(new, self.folders[0])
+        self.bulk.add(bookmark(1), self.folders[1])
+        # Reorders folders[0], where new was added
+        self.bulk.move(self.items[0], new, "after")
+        self.bulk.add(bookmark(2), self.folders[0])
+        self.assertEqual(self.lanes(), [[0, 2, 3], [1]])
+
+    def test_move_with_known_folder(self):
+        self.bulk.add(bookmark(0), self.folders[1])
+        self.bulk.move(self.items[0], self.items[1], "before",
+                       self.folders[1])
+        self.bulk.add(bookmark(1), self.folders[0])
+        self.assertEqual(self.lanes(), [[0, 1], [2]])
+
+    def test_move_with_unknown_folder(self):
+        self.bulk.add(bookmark(0), self.folders[0])
+        self.bulk.add(bookmark(1), self.folders[1])
+        self.bulk.move(self.items[0], self.items[1], "before")
+        self.bulk.update(self.items[2])
+        note = datatypes.Note(content=u"note")
+        self.bulk.add(note)
+        self.assertEqual(self.lanes(), [[0, 1, 2], [3], [4]])
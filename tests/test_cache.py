@@ -0,0 +1,171 @@
+from pyoperalink import datatypes
+from pyoperalink.auth import OAuth
+from pyoperalink.cache import LRUCache
+from pyoperalink.client import LinkClient, NotFoundError
+from pyoperalink.transport import Response
+
+from tests import ServerTestCase, unittest
+
+
+class LRUCacheTest(unittest.TestCase):
+
+    def test_get_and_set(self):
+        cache = LRUCache()
+        self.assertEqual(cache.get("a"), None)
+        self.assertEqual(cache.get("a", 0), 0)
+        cache.set("a", 1)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.stats, {"hits": 1, "misses": 2, "size": 1})
+
+    def test_lru_eviction(self):
+        cache = LRUCache(max_size=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertEqual(cache.get("b"), None)
+        self.assertEqual((cache.get("a"), cache.get("c")), (1, 3))
+        self.assertEqual(len(cache), 2)
+
+    def test_ttl(self):
+        cache = LRUCache(ttl=-1)
+        cache.set("a", 1, tags=("t",))
+        self.assertEqual(cache.get("a"), None)
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache._tags, {})
+
+    def test_tags(self):
+        cache = LRUCache()
+        cache.set("a", 1, tags=("t", "u"))
+        cache.set("b", 2, tags=("t",))
+        cache.set("c", 3)
+        cache.discard_tag("t")
+        self.assertEqual([cache.get(key) for key in "abc"], [None, None, 3])
+        self.assertEqual(cache._tags, {})
+
+    def test_discard_and_clear(self):
+        cache = LRUCache()
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.discard("a")
+        cache.discard("missing")
+        self.assertEqual(cache.get("a"), None)
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+
+class ClientCacheTest(ServerTestCase):
+
+    def setUp(self):
+        super(ClientCacheTest, self).setUp()
+        self.cache = LRUCache()
+        self.client = self.make_client(cache=self.cache)
+        self.server.populate(self.user, "bookmark", items=20, folder_ratio=0)
+        self.bookmark = [item for item in self.client.get_bookmarks()
+                         if not item.is_folder][0]
+
+    def test_item(self):
+        first, requests = self.count_requests(self.client.get_bookmark,
+                                              self.bookmark.id)
+        self.assertEqual(requests, 1)
+        second, requests = self.count_requests(self.client.get_bookmark,
+                                               self.bookmark.id)
+        self.assertEqual(requests, 0)
+        # New entries on every hit
+        self.assertFalse(first is second)
+        self.assertEqual(first._to_python(), second._to_python())
+
+    def test_listing(self):
+        items, requests = self.count_requests(self.client.get_bookmarks)
+        self.assertEqual(requests, 0)
+        self.assertEqual(len(items), 21)
+
+    def test_change_invalidates(self):
+        self.client.get_bookmark(self.bookmark.id)
+        self.bookmark.title = u"changed"
+        self.bookmark.update()
+        items, requests = self.count_requests(self.client.get_bookmarks)
+        self.assertEqual(requests, 1)
+        item, requests = self.count_requests(self.client.get_bookmark,
+                                             self.bookmark.id)
+        self.assertEqual(requests, 1)
+        self.assertEqual(item.title, u"changed")
+
+    def test_folder_changes_drop_descendants(self):
+        for api_method in ("delete", "trash", "move"):
+            folder = datatypes.BookmarkFolder(title=u"folder")
+            self.client.add(folder)
+            child = datatypes.Bookmark(title=u"child", uri=u"http://a.com/")
+            self.client.add_to_folder(child, folder)
+            self.client.get_bookmark(child.id)
+            self.client.get_bookmark(self.bookmark.id)
+            if api_method == "move":
+                other = datatypes.BookmarkFolder(title=u"other")
+                self.client.add(other)
+                self.client.move_into(folder, other)
+            else:
+                getattr(self.client, "%s_bookmark" % api_method)(folder.id)
+            if api_method == "delete":
+                self.assertRaises(NotFoundError, self.client.get_bookmark,
+                                  child.id)
+            else:
+                item, requests = self.count_requests(self.client.get_bookmark,
+                                                     child.id)
+                self.assertEqual(requests, 1, api_method)
+            item, requests = self.count_requests(self.client.get_bookmark,
+                                                 self.bookmark.id)
+            self.assertEqual(requests, 1, api_method)
+
+    def test_updates_keep_other_items(self):
+        self.client.get_bookmark(self.bookmark.id)
+        other = datatypes.Bookmark(title=u"other", uri=u"http://a.com/")
+        self.client.add(other)
+        other.title = u"changed"
+        other.update()
+        item, requests = self.count_requests(self.client.get_bookmark,
+                                             self.bookmark.id)
+        self.assertEqual(requests, 0)
+
+    def test_other_datatypes_are_kept(self):
+        self.client.get_notes()
+        self.bookmark.trash()
+        notes, requests = self.count_requests(self.client.get_notes)
+        self.assertEqual(requests, 0)
+
+    def test_users_are_separate(self):
+        other_user = self.user + "-other"
+        other_client = LinkClient(self.server.add_user(other_user),
+                                  url_prefix=self.server.url_prefix,
+                                  cache=self.cache)
+        self.assertEqual(len(other_client.get_bookmarks()), 1)
+        self.assertEqual(len(self.client.get_bookmarks()), 21)
+
+    def test_missing_item(self):
+        self.assertRaises(NotFoundError, self.client.get_bookmark, "missing")
+        self.assertEqual(self.cache.get((self.user, "bookmark", "missing")),
+                         None)
+
+
+class EmptyTransport(object):
+    """
+    Answers every request with an empty JSON list
+    """
+
+    def request(self, url, method="GET", body=None, headers=None):
+        return Response(200, "OK"), "[]"
+
+
+class EmptyItemTest(unittest.TestCase):
+
+    def test_not_found_and_not_cached(self):
+        auth = OAuth("key", "secret")
+        auth.set_access_token("user", "secret")
+        cache = LRUCache()
+        client = LinkClient(auth, url_prefix="http://example.com",
+                            transport=EmptyTransport(), cache=cache)
+        for i in range(2):
+            self.assertRaises(NotFoundError, client.get_bookmark, "empty")
+        self.assertEqual(len(cache), 0)
+        # An empty listing is cached
+        self.assertEqual(client.get_bookmarks("empty"), [])
+        self.assertEqual(len(cache), 1)
@@ -0,0 +1,215 @@
+from pyoperalink import datatypes
+from pyoperalink.client import NotFoundError
+
+from tests import ServerTestCase
+
+
+def flatten(items):
+    """
+    Returns the entries of a tree, depth-first, with their depth
+    """
+    result = []
+    stack = [(item, 0) for item in reversed(items)]
+    while stack:
+        item, depth = stack.pop()
+        result.append((item.id, depth))
+        if item.is_folder:
+            stack.extend((child, depth + 1)
+                         for child in reversed(item._children or ()))
+    return result
+
+
+def flatten_json(items, depth=0):
+    result = []
+    for item in items:
+        result.append((item["id"], depth))
+        result.extend(flatten_json(item.get("children") or (), depth + 1))
+    return result
+
+
+class TreeTest(ServerTestCase):
+
+    def test_bookmark_tree_in_one_request(self):
+        self.server.populate(self.user, "bookmark", items=200, folder_size=10)
+        tree, requests = self.count_requests(self.client.get_bookmark_tree)
+        self.assertEqual(requests, 1)
+        self.assertEqual(flatten(tree),
+                         flatten_json(self.server.items(self.user,
+                                                        "bookmark")))
+
+    def test_children_are_populated(self):
+        self.server.populate(self.user, "note", items=50, folder_size=5)
+        tree = self.client.get_note_tree()
+        folders = [item for item in tree if item.is_folder]
+        self.assertTrue(folders)
+        children, requests = self.count_requests(lambda: [folder.children
+                                                         for folder in folders])
+        self.assertEqual(requests, 0)
+        self.assertTrue(any(children))
+
+    def test_subtree(self):
+        self.server.populate(self.user, "bookmark", items=100, folder_size=10)
+        folder = [item for item in self.client.get_bookmarks()
+                  if item.is_folder and item.type != "trash"][0]
+        subtree = self.client.get_bookmark_tree(folder.id)
+        self.assertEqual([item.id for item in subtree],
+                         [item.id for item in folder.children])
+
+    def test_empty_tree(self):
+        self.assertEqual([item.type for item in self.client.get_note_tree()],
+                         ["trash"])
+
+    def test_entries_are_bound(self):
+        self.client.add(datatypes.Bookmark(title=u"Opera",
+                                           uri=u"http://www.opera.com/"))
+        bookmark = [item for item in self.client.get_bookmark_tree()
+                    if not item.is_folder][0]
+        bookmark.title = u"Opera Software"
+        bookmark.update()
+        self.assertEqual(self.client.get_bookmark(bookmark.id).title,
+                         u"Opera Software")
+
+
+class WalkTest(ServerTestCase):
+
+    def test_breadth_first(self):
+        self.server.populate(self.user, "bookmark", items=300, folder_size=8)
+        depths = dict(flatten(self.client.get_bookmark_tree()))
+        walked = [item.id for item in self.client.walk_bookmarks()]
+        self.assertEqual(sorted(walked), sorted(depths))
+        walked_depths = [depths[item_id] for item_id in walked]
+        self.assertEqual(walked_depths, sorted(walked_depths))
+
+    def test_one_request_per_folder(self):
+        self.server.populate(self.user, "note", items=100, folder_size=5)
+        items, requests = self.count_requests(list, self.client.walk_notes())
+        folders = [item for item in items if item.is_folder]
+        # The root level, then the children of every folder
+        self.assertEqual(requests, 1 + len(folders))
+
+    def test_children_are_populated(self):
+        self.server.populate(self.user, "bookmark", items=60, folder_size=6)
+        items = list(self.client.walk_bookmarks(max_workers=2))
+        expected = flatten_json(self.server.items(self.user, "bookmark"))
+        roots = set(item_id for item_id, depth in expected if depth == 0)
+        self.assertEqual(flatten([item for item in items if item.id in roots]),
+                         expected)
+
+    def test_from_folder(self):
+        self.server.populate(self.user, "bookmark", items=60, folder_size=6)
+        folder = [item for item in self.client.get_bookmarks()
+                  if item.is_folder and item.type != "trash"][0]
+        walked = set(item.id for item in self.client.walk_bookmarks(folder.id))
+        subtree = set(item_id for item_id, depth in
+                      flatten(self.client.get_bookmark_tree(folder.id)))
+        self.assertEqual(walked, subtree)
+
+
+class IterTest(ServerTestCase):
+
+    def test_same_as_list(self):
+        self.server.populate(self.user, "bookmark", items=100, folder_size=10)
+        items = list(self.client.iter_bookmarks())
+        self.assertEqual([(type(item), item.id) for item in items],
+                         [(type(item), item.id)
+                          for item in self.client.get_bookmarks()])
+        self.assertTrue(all(item._conn is self.client for item in items))
+
+    def test_folder(self):
+        self.server.populate(self.user, "note", items=50, folder_size=10)
+        folder = [item for item in self.client.get_notes()
+                  if item.is_folder and item.type != "trash"][0]
+        self.assertEqual([item.id for item in self.client.iter_notes(folder.id)],
+                         [item.id for item in folder.children])
+
+    def test_list_datatype(self):
+        self.server.populate(self.user, "speeddial", items=9)
+        self.assertEqual([item.id for item in self.client.iter_speeddials()],
+                         [item.id for item in self.client.get_speeddials()])
+
+    def test_empty(self):
+        self.assertEqual(list(self.client.iter_urlfilters()), [])
+
+    def test_stop_early(self):
+        self.server.populate(self.user, "bookmark", items=100, folder_ratio=0)
+        items = self.client.iter_bookmarks()
+        next(items)
+        items.close()
+        self.assertEqual(len(self.client.get_bookmarks()), 101)
+
+    def test_missing_folder(self):
+        self.assertRaises(NotFoundError, list,
+                          self.client.iter_bookmarks("missing"))
+
+
+class LightModeTest(ServerTestCase):
+
+    def setUp(self):
+        super(LightModeTest, self).setUp()
+        self.server.populate(self.user, "speeddial", items=3)
+        for item in self.server.items(self.user, "speeddial"):
+            self.client.update_speeddial(item["id"], {"icon": u"aWNvbg==",
+                                                      "thumbnail": u"dGh1bWI="})
+        self.light_client = self.make_client(light=True)
+
+    def test_heavy_fields_not_loaded(self):
+        for speeddial in self.light_client.get_speeddials():
+            self.assertTrue(speeddial._raw_value("icon") is
+                            datatypes.NOT_LOADED)
+            self.assertTrue(speeddial._raw_value("thumbnail") is
+                            datatypes.NOT_LOADED)
+            self.assertTrue(speeddial.title)
+
+    def test_loaded_on_access(self):
+        speeddial = self.light_client.get_speeddials()[0]
+        icon, requests = self.count_requests(getattr, speeddial, "icon")
+        self.assertEqual((icon, requests), (u"aWNvbg==", 1))
+        thumbnail, requests = self.count_requests(getattr, speeddial,
+                                                  "thumbnail")
+        self.assertEqual((thumbnail, requests), (u"dGh1bWI=", 0))
+        self.assertEqual(speeddial._changed_fields(), [])
+
+    def test_single_items_are_full(self):
+        speeddial = self.light_client.get_speeddial("1")
+        self.assertEqual(speeddial._raw_value("icon"), u"aWNvbg==")
+
+    def test_update_leaves_heavy_fields(self):
+        speeddial = self.light_client.get_speeddials()[0]
+        speeddial.title = u"changed"
+        self.assertEqual(speeddial._changed_fields(), ["title"])
+        result, requests = self.count_requests(speeddial.update)
+        self.assertEqual(requests, 1)
+        saved = self.client.get_speeddial(speeddial.id)
+        self.assertEqual((saved.title, saved.icon), (u"changed", u"aWNvbg=="))
+
+    def test_set_before_loading(self):
+        speeddial = self.light_client.get_speeddials()[0]
+        speeddial.icon = u"bmV3"
+        self.assertEqual(speeddial._changed_fields(), ["icon"])
+        speeddial.update()
+        saved = self.client.get_speeddial(speeddial.id)
+        self.assertEqual((saved.icon, saved.thumbnail),
+                         (u"bmV3", u"dGh1bWI="))
+
+    def test_tree(self):
+        self.server.populate(self.user, "note", items=20, folder_size=5)
+        notes = [note for note in flatten_entries(
+                    self.light_client.get_note_tree())
+                 if isinstance(note, datatypes.Note)]
+        self.assertTrue(notes)
+        self.assertTrue(all(note._raw_value("content") is
+                            datatypes.NOT_LOADED for note in notes))
+        self.assertTrue(notes[0].content.startswith(u"Note "))
+
+    def test_local_items(self):
+        note = datatypes.Note()
+        note._content = datatypes.NOT_LOADED
+        self.assertRaises(ValueError, getattr, note, "content")
+
+
+def flatten_entries(items):
+    for item in items:
+        yield item
+        if item.is_folder:
+            for child in flatten_entries(item._children or ()):
+                yield child
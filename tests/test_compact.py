@@ -0,0 +1,70 @@
+import sys
+
+from pyoperalink import compact, datatypes
+
+from tests import ServerTestCase, unittest
+
+
+class CompactClassTest(unittest.TestCase):
+
+    def test_no_dict(self):
+        for item_type, cls in compact.registry.items():
+            entry = cls()
+            self.assertFalse(hasattr(entry, "__dict__"), item_type)
+
+    def test_same_fields(self):
+        for item_type, cls in compact.registry.items():
+            regular = datatypes.registry[item_type]
+            self.assertEqual(cls.fields, regular.fields)
+            self.assertEqual(cls.item_type, item_type)
+            self.assertTrue(issubclass(cls, regular.__bases__[0]))
+
+    def test_fields(self):
+        bookmark = compact.Bookmark(title=u"title", created=
+                                    "2010-01-02T03:04:05Z")
+        self.assertEqual(bookmark.title, u"title")
+        self.assertEqual(bookmark.uri, None)
+        self.assertEqual(bookmark.created.year, 2010)
+        self.assertEqual(bookmark._to_python(),
+                         {"title": u"title",
+                          "created": "2010-01-02T03:04:05Z"})
+
+    def test_no_other_attributes(self):
+        self.assertRaises(AttributeError, setattr, compact.Note(),
+                          "unknown", 1)
+
+    def test_defaults(self):
+        self.assertEqual(compact.NoteFolder()._children, None)
+        self.assertEqual(compact.SpeedDial(id="3").position, 3)
+
+    def test_smaller(self):
+        regular = datatypes.Bookmark(title=u"title")
+        size = sys.getsizeof(regular) + sys.getsizeof(regular.__dict__)
+        self.assertTrue(sys.getsizeof(compact.Bookmark(title=u"title"))
+                        < size)
+
+
+class CompactClientTest(ServerTestCase):
+
+    def test_tree(self):
+        self.server.populate(self.user, "note", items=50, folder_size=5)
+        client = self.make_client(registry=compact.registry)
+        tree = client.get_note_tree()
+        regular = self.client.get_note_tree()
+
+        def describe(items):
+            return [(type(item).__name__, item.id, item._to_python(),
+                     item.is_folder and describe(item._children) or None)
+                    for item in items]
+        self.assertEqual(describe(tree), describe(regular))
+        self.assertTrue(all(type(item).__module__ == compact.__name__
+                            for item in tree))
+
+    def test_update(self):
+        self.server.populate(self.user, "speeddial", items=3)
+        client = self.make_client(registry=compact.registry)
+        speeddial = client.get_speeddials()[0]
+        speeddial.title = u"changed"
+        speeddial.update()
+        self.assertEqual(self.client.get_speeddial(speeddial.id).title,
+                         u"changed")
@@ -0,0 +1,108 @@
+import zlib
+
+from StringIO import StringIO
+
+from pyoperalink import datatypes
+from pyoperalink.client import LinkClient
+from pyoperalink.compression import (CompressionStats, DecompressingReader,
+                                     compress, decompress)
+from pyoperalink.mockserver import MockLinkServer
+
+from tests import ServerTestCase, unittest
+
+DATA = "".join("item %d, " % n for n in range(2000))
+
+
+def raw_deflate(data):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+class CodingTest(unittest.TestCase):
+
+    def test_gzip(self):
+        compressed = compress(DATA)
+        self.assertTrue(len(compressed) < len(DATA) / 4)
+        self.assertEqual(compressed[:2], "\x1f\x8b")
+        self.assertEqual(decompress(compressed, "gzip"), DATA)
+        self.assertEqual(decompress(compressed, "x-gzip"), DATA)
+
+    def test_deflate(self):
+        self.assertEqual(decompress(zlib.compress(DATA), "deflate"), DATA)
+        self.assertEqual(decompress(raw_deflate(DATA), "deflate"), DATA)
+
+    def test_reader(self):
+        for encoding, data in (("gzip", compress(DATA)),
+                               ("deflate", zlib.compress(DATA)),
+                               ("deflate", raw_deflate(DATA))):
+            for chunk_size in (2, 100, 65536):
+                stats = CompressionStats()
+                reader = DecompressingReader(StringIO(data), encoding, stats,
+                                             chunk_size)
+                parts = [reader.read(7)]
+                while parts[-1]:
+                    parts.append(reader.read(1000))
+                self.assertEqual("".join(parts), DATA)
+                self.assertEqual(stats.response_bytes, len(data))
+                self.assertEqual(stats.decoded_response_bytes, len(DATA))
+
+    def test_read_all(self):
+        reader = DecompressingReader(StringIO(compress(DATA)), "gzip")
+        self.assertEqual(reader.read(), DATA)
+        self.assertEqual(reader.read(), "")
+
+    def test_stats(self):
+        stats = CompressionStats()
+        stats.record_response(10, 100)
+        stats.record_request(20, 50)
+        self.assertEqual(stats.stats["saved_bytes"], 120)
+
+
+class ClientCompressionTest(ServerTestCase):
+
+    def test_compressed_responses(self):
+        self.server.populate(self.user, "note", items=200, folder_ratio=0)
+        self.assertEqual(len(self.client.get_notes()), 201)
+        stats = self.client.compression_stats
+        self.assertTrue(stats.saved_bytes > stats.response_bytes)
+
+    def test_streamed(self):
+        self.server.populate(self.user, "note", items=200, folder_ratio=0)
+        self.assertEqual(len(list(self.client.iter_notes())), 201)
+        self.assertTrue(self.client.compression_stats.saved_bytes > 0)
+
+    def test_not_accepted(self):
+        self.server.populate(self.user, "note", items=200, folder_ratio=0)
+        client = self.make_client(accept_compression=False)
+        client.get_notes()
+        self.assertEqual(client.compression_stats.saved_bytes, 0)
+
+    def test_compressed_requests(self):
+        client = self.make_client(compress_requests=True)
+        note = datatypes.Note(content=DATA.decode("ascii"))
+        client.add(note)
+        self.assertEqual(self.client.get_note(note.id).content, note.content)
+        stats = client.compression_stats
+        self.assertTrue(stats.request_bytes < stats.uncompressed_request_bytes)
+
+    def test_small_requests(self):
+        client = self.make_client(compress_requests=True)
+        client.add(datatypes.Note(content=u"small"))
+        stats = client.compression_stats
+        self.assertEqual(stats.request_bytes, stats.uncompressed_request_bytes)
+
+
+class RefusedCompressionTest(unittest.TestCase):
+
+    def test_fallback(self):
+        with MockLinkServer(compression=False) as server:
+            client = LinkClient(server.add_user("user"),
+                                url_prefix=server.url_prefix,
+                                compress_requests=True)
+            note = datatypes.Note(content=DATA.decode("ascii"))
+            client.add(note)
+            self.assertFalse(client.compress_requests)
+            stats = client.compression_stats
+            self.assertEqual(stats.request_bytes,
+                             stats.uncompressed_request_bytes)
+            self.assertEqual(client.get_note(note.id).content, note.content)
@@ -0,0 +1,154 @@
+import datetime
+
+from pyoperalink import datatypes
+
+from tests import ServerTestCase, unittest
+
+
+class RecordingConnection(object):
+    """
+    Stands in for a LinkClient, recording the properties sent by updates
+    """
+
+    def __init__(self):
+        self.sent = []
+
+    def update_speeddial(self, item_id, params):
+        self.sent.append(params)
+        return [{"id": item_id, "properties": params}]
+
+    update_bookmark = update_speeddial
+
+
+class DirtyFieldsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.conn = RecordingConnection()
+
+    def speeddial(self):
+        return datatypes.SpeedDial(self.conn, id="1", title=u"title",
+                                   uri=u"http://example.com/",
+                                   thumbnail=u"x" * 10000)
+
+    def test_fetched_entries_are_clean(self):
+        self.assertEqual(self.speeddial()._changed_fields(), [])
+
+    def test_new_entries_are_dirty(self):
+        entry = datatypes.SpeedDial(title=u"title")
+        self.assertEqual(entry._changed_fields(), list(entry.fields))
+
+    def test_only_changed_fields_are_sent(self):
+        entry = self.speeddial()
+        entry.title = u"changed"
+        entry.update()
+        self.assertEqual(self.conn.sent, [{"title": u"changed"}])
+
+    def test_nothing_changed(self):
+        entry = self.speeddial()
+        entry.title = u"title"
+        entry.update()
+        self.assertEqual(self.conn.sent, [])
+
+    def test_clean_after_update(self):
+        entry = self.speeddial()
+        entry.uri = u"http://example.org/"
+        entry.update()
+        entry.update()
+        self.assertEqual(len(self.conn.sent), 1)
+        self.assertEqual(entry._changed_fields(), [])
+
+    def test_cleared_field(self):
+        entry = self.speeddial()
+        entry.thumbnail = None
+        self.assertEqual(entry._changed_fields(), ["thumbnail"])
+
+    def test_dates_are_not_reformatted(self):
+        entry = datatypes.Bookmark(self.conn, id="1",
+                                   created="2010-01-02T03:04:05Z")
+        entry.created
+        entry.title = u"title"
+        entry.update()
+        self.assertEqual(self.conn.sent, [{"title": u"title"}])
+
+
+class UpdateRequestTest(ServerTestCase):
+
+    def test_no_request_when_unchanged(self):
+        self.server.populate(self.user, "bookmark", items=5, folder_ratio=0)
+        bookmark = [item for item in self.client.get_bookmarks()
+                    if not item.is_folder][0]
+        result, requests = self.count_requests(bookmark.update)
+        self.assertEqual(requests, 0)
+        bookmark.title = u"changed"
+        result, requests = self.count_requests(bookmark.update)
+        self.assertEqual(requests, 1)
+        self.assertEqual(self.client.get_bookmark(bookmark.id).title,
+                         u"changed")
+
+
+class RFC3339Test(unittest.TestCase):
+
+    def test_server_format(self):
+        self.assertEqual(datatypes.datetime_from_rfc3339("2010-01-02T03:04:05Z"),
+                         datetime.datetime(2010, 1, 2, 3, 4, 5))
+
+    def test_fraction_and_offset(self):
+        parse = datatypes.datetime_from_rfc3339
+        self.assertEqual(parse("2010-01-02T03:04:05.25Z"),
+                         datetime.datetime(2010, 1, 2, 3, 4, 5, 250000))
+        self.assertEqual(parse("2010-01-02t03:04:05.1234567z"),
+                         datetime.datetime(2010, 1, 2, 3, 4, 5, 123456))
+        self.assertEqual(parse("2010-01-02T03:04:05+01:30"),
+                         datetime.datetime(2010, 1, 2, 1, 34, 5))
+        self.assertEqual(parse("2010-01-01 23:00:00-02:00"),
+                         datetime.datetime(2010, 1, 2, 1, 0, 0))
+
+    def test_invalid(self):
+        for value in ("", "2010-01-02", "2010-13-02T03:04:05Z",
+                      "2010-01-02T03:04:05", "2010-01-02T03:04:05+0100",
+                      "not a date at all!!!", None, 12):
+            self.assertEqual(datatypes.datetime_from_rfc3339(value), None,
+                             value)
+
+    def test_cached(self):
+        first = datatypes.datetime_from_rfc3339("2011-01-02T03:04:05Z")
+        self.assertTrue(
+            datatypes.datetime_from_rfc3339("2011-01-02T03:04:05Z") is first)
+
+    def test_format(self):
+        self.assertEqual(datatypes.datetime_to_rfc3339(
+                                datetime.datetime(2010, 1, 2, 3, 4, 5)),
+                         "2010-01-02T03:04:05Z")
+        self.assertEqual(datatypes.datetime_to_rfc3339(None), None)
+
+
+class DateFieldTest(unittest.TestCase):
+
+    def test_parsed_when_read(self):
+        bookmark = datatypes.Bookmark(created="2010-01-02T03:04:05Z")
+        self.assertEqual(bookmark._raw_value("created"),
+                         "2010-01-02T03:04:05Z")
+        self.assertEqual(bookmark.created,
+                         datetime.datetime(2010, 1, 2, 3, 4, 5))
+        self.assertEqual(bookmark._to_python(["created"]),
+                         {"created": "2010-01-02T03:04:05Z"})
+
+    def test_reading_does_not_mark_dirty(self):
+        for value in ("2010-01-02T03:04:05Z", "2010-01-02T03:04:05.5Z",
+                      "2010-01-02T03:04:05+02:00", "not a date"):
+            bookmark = datatypes.Bookmark(RecordingConnection(), id="1",
+                                          created=value)
+            bookmark.created
+            self.assertEqual(bookmark._changed_fields(), [], value)
+
+    def test_changed_date(self):
+        bookmark = datatypes.Bookmark(RecordingConnection(), id="1",
+                                      created="2010-01-02T03:04:05.5Z")
+        bookmark.created = datetime.datetime(2010, 1, 2, 3, 4, 5)
+        self.assertEqual(bookmark._changed_fields(), ["created"])
+
+    def test_invalid_date(self):
+        bookmark = datatypes.Bookmark(created="not a date")
+        self.assertEqual(bookmark.created, None)
+        self.assertEqual(bookmark._to_python(["created"]),
+                         {"created": "not a date"})
@@ -0,0 +1,82 @@
+import copy
+
+from pyoperalink import compact, datatypes
+from pyoperalink.decoders import build_decoder, get_decoders
+
+from tests import unittest
+
+BOOKMARK = {
+    "id": "B1",
+    "item_type": "bookmark",
+    "properties": {
+        "title": u"title",
+        "uri": u"http://example.com/",
+        "created": "2010-01-02T03:04:05Z",
+        "icon": u"aWNvbg==",
+    },
+}
+
+
+class DecoderTest(unittest.TestCase):
+
+    conn = object()
+
+    def test_same_as_init(self):
+        for registry in (datatypes.registry, compact.registry):
+            bookmark = get_decoders(registry)["bookmark"](self.conn, BOOKMARK)
+            expected = registry["bookmark"](self.conn, id="B1",
+                                            **BOOKMARK["properties"])
+            self.assertEqual(type(bookmark), type(expected))
+            self.assertEqual(bookmark._to_python(), expected._to_python())
+            self.assertEqual(bookmark.id, "B1")
+            self.assertTrue(bookmark._conn is self.conn)
+            self.assertEqual(bookmark.nickname, None)
+            self.assertEqual(bookmark._changed_fields(), [])
+
+    def test_dates_are_parsed_lazily(self):
+        bookmark = get_decoders(datatypes.registry)["bookmark"](self.conn,
+                                                                BOOKMARK)
+        self.assertEqual(bookmark._raw_value("created"),
+                         "2010-01-02T03:04:05Z")
+        self.assertEqual(bookmark.created.year, 2010)
+
+    def test_data_is_unchanged(self):
+        data = copy.deepcopy(BOOKMARK)
+        get_decoders(datatypes.registry)["bookmark"](self.conn, data)
+        self.assertEqual(data, BOOKMARK)
+
+    def test_light(self):
+        bookmark = get_decoders(datatypes.registry, light=True)["bookmark"](
+                self.conn, BOOKMARK)
+        self.assertTrue(bookmark._raw_value("icon") is datatypes.NOT_LOADED)
+        self.assertEqual(bookmark.title, u"title")
+        self.assertEqual(bookmark._changed_fields(), [])
+
+    def test_after_decode(self):
+        for registry in (datatypes.registry, compact.registry):
+            speeddial = get_decoders(registry)["speeddial"](self.conn,
+                    {"id": "7", "properties": {"title": u"t"}})
+            self.assertEqual(speeddial.position, 7)
+
+    def test_compact_defaults(self):
+        folder = get_decoders(compact.registry)["bookmark_folder"](
+                self.conn, {"id": "F", "properties": {}})
+        self.assertEqual(folder._children, None)
+        self.assertEqual(folder.title, None)
+
+    def test_built_once(self):
+        self.assertTrue(get_decoders(datatypes.registry) is
+                        get_decoders(datatypes.registry))
+        self.assertFalse(get_decoders(datatypes.registry) is
+                         get_decoders(datatypes.registry, light=True))
+
+    def test_custom_class(self):
+        class MyBookmark(datatypes.Bookmark):
+            fields = datatypes.Bookmark.fields + ("extra",)
+        decode = build_decoder(MyBookmark)
+        data = copy.deepcopy(BOOKMARK)
+        data["properties"]["extra"] = 1
+        bookmark = decode(self.conn, data)
+        self.assertTrue(isinstance(bookmark, MyBookmark))
+        self.assertEqual(bookmark.extra, 1)
+        self.assertEqual(decode.__name__, "decode_bookmark")
@@ -0,0 +1,105 @@
+from pyoperalink import datatypes
+from pyoperalink.dedup import dedup_key, find_duplicates, trash_duplicates
+
+from tests import ServerTestCase, unittest
+
+
+def bookmark(item_id, uri, **fields):
+    return datatypes.Bookmark(id=item_id, uri=uri, **fields)
+
+
+def folder(item_id, children, **fields):
+    entry = datatypes.BookmarkFolder(id=item_id, **fields)
+    entry.children = children
+    return entry
+
+
+class DedupKeyTest(unittest.TestCase):
+
+    def test_same_page(self):
+        for uri in ("HTTP://Example.com:80/page/",
+                    "http://example.com/page#top",
+                    "http://example.com/page?utm_source=x&UTM_medium=y",
+                    "http://example.com/page?fbclid=1&"):
+            self.assertEqual(dedup_key(uri), "http://example.com/page", uri)
+
+    def test_kept_differences(self):
+        self.assertEqual(dedup_key("http://example.com/"),
+                         "http://example.com/")
+        self.assertEqual(dedup_key("http://example.com"),
+                         "http://example.com/")
+        self.assertEqual(dedup_key("http://example.com/Page?b=2&gclid=3&a=1"),
+                         "http://example.com/Page?b=2&a=1")
+        self.assertNotEqual(dedup_key("https://example.com/"),
+                            dedup_key("http://example.com/"))
+
+    def test_empty(self):
+        self.assertEqual(dedup_key(None), None)
+        self.assertEqual(dedup_key(""), "")
+
+
+class FindDuplicatesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tree = [
+            bookmark("a1", "http://a.com/", visited="2010-01-01T00:00:00Z",
+                     created="2009-01-01T00:00:00Z"),
+            folder("f1", [
+                bookmark("a2", "HTTP://A.com:80/#x",
+                         visited="2011-01-01T00:00:00Z",
+                         created="2010-06-01T00:00:00Z"),
+                folder("f2", [bookmark("a3", "http://a.com/?utm_id=1")]),
+                bookmark("b1", "http://b.com/page"),
+            ]),
+            bookmark("b2", "http://b.com/page/"),
+            bookmark("c1", "http://c.com/"),
+            bookmark("e1", None),
+            bookmark("e2", None),
+            datatypes.BookmarkSeparator(id="s1"),
+            folder("trash", [bookmark("a4", "http://a.com/")], type="trash"),
+        ]
+
+    def describe(self, groups):
+        return [(group.key, group.keeper.id,
+                 sorted(entry.id for entry in group.duplicates))
+                for group in groups]
+
+    def test_visited(self):
+        self.assertEqual(self.describe(find_duplicates(self.tree)), [
+            ("http://a.com/", "a2", ["a1", "a3"]),
+            ("http://b.com/page", "b1", ["b2"]),
+        ])
+
+    def test_created(self):
+        self.assertEqual(self.describe(find_duplicates(self.tree,
+                                                       keep="created")), [
+            ("http://a.com/", "a1", ["a2", "a3"]),
+            ("http://b.com/page", "b1", ["b2"]),
+        ])
+
+    def test_invalid_keep(self):
+        self.assertRaises(ValueError, find_duplicates, self.tree, "title")
+
+    def test_no_duplicates(self):
+        self.assertEqual(find_duplicates([bookmark("x", "http://x.com/")]),
+                         [])
+
+
+class TrashDuplicatesTest(ServerTestCase):
+
+    def test_trash(self):
+        for n in range(6):
+            self.client.add(datatypes.Bookmark(
+                    title=u"copy %d" % n,
+                    uri=u"http://example.com/%s" % ("?utm_source=%d" % n
+                                                    if n % 2 else "")))
+        groups = find_duplicates(self.client.get_bookmark_tree())
+        self.assertEqual(len(groups), 1)
+        results = trash_duplicates(self.client, groups)
+        self.assertTrue(all(result.ok for result in results))
+        self.assertEqual(len(results), 5)
+        remaining = [entry for entry in self.client.get_bookmarks()
+                     if not entry.is_folder]
+        self.assertEqual([entry.id for entry in remaining],
+                         [groups[0].keeper.id])
+        self.assertEqual(find_duplicates(self.client.get_bookmark_tree()), [])
@@ -0,0 +1,177 @@
+import datetime
+
+from pyoperalink import datatypes
+from pyoperalink.index import ItemIndex, SortedKeys, normalize_uri
+
+from tests import ServerTestCase, unittest
+
+
+class NormalizeURITest(unittest.TestCase):
+
+    def test_normalize(self):
+        for uri, expected in (
+                ("HTTP://WWW.Opera.com:80/Path?Q=1#top",
+                 "http://www.opera.com/Path?Q=1"),
+                (" https://example.com ", "https://example.com/"),
+                ("https://example.com:8443/", "https://example.com:8443/"),
+                ("http://User@Example.com/", "http://User@example.com/"),
+                ("OPERA:config", "opera:config"),
+                ("not a uri", "not a uri"),
+                ("", ""),
+                (None, None)):
+            self.assertEqual(normalize_uri(uri), expected)
+
+
+class SortedKeysTest(unittest.TestCase):
+
+    def setUp(self):
+        self.keys = SortedKeys()
+        self.keys.extend([("b", "2"), ("a", "1"), ("ab", "3")])
+        self.keys.add("c", "4")
+
+    def test_range(self):
+        self.assertEqual(self.keys.range(), ["1", "3", "2", "4"])
+        self.assertEqual(self.keys.range("ab", "c"), ["3", "2"])
+
+    def test_prefix(self):
+        self.assertEqual(self.keys.prefix("a"), ["1", "3"])
+        self.assertEqual(self.keys.prefix("d"), [])
+
+    def test_remove(self):
+        self.keys.remove("a", "1")
+        self.keys.remove("a", "missing")
+        self.assertEqual(self.keys.range(), ["3", "2", "4"])
+
+
+def bookmark(n, **fields):
+    fields.setdefault("title", u"Bookmark %d" % n)
+    fields.setdefault("uri", u"http://example.com/%d" % n)
+    return datatypes.Bookmark(id="b%d" % n, **fields)
+
+
+def folder(n, children):
+    entry = datatypes.BookmarkFolder(id="f%d" % n, title=u"Folder %d" % n)
+    entry.children = children
+    return entry
+
+
+class ItemIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.inner = folder(2, [bookmark(3, nickname=u"Three")])
+        self.outer = folder(1, [bookmark(2), self.inner])
+        self.trash = datatypes.BookmarkFolder(id="trash", type="trash")
+        self.trash.children = []
+        self.index = ItemIndex([
+            self.trash,
+            bookmark(1, uri=u"HTTP://Example.com:80/1#x",
+                     created="2010-01-01T00:00:00Z"),
+            self.outer,
+            bookmark(4, title=u"another", created="2011-06-01T00:00:00Z")])
+
+    def ids(self, entries):
+        return [entry.id for entry in entries]
+
+    def test_get(self):
+        self.assertEqual(len(self.index), 7)
+        self.assertTrue("b3" in self.index)
+        self.assertTrue(self.index.get("b3") is self.inner.children[0])
+        self.assertEqual(self.index.get("missing"), None)
+
+    def test_find(self):
+        self.assertEqual(self.ids(self.index.find_uri(
+                         "http://example.com/1")), ["b1"])
+        self.assertEqual(self.ids(self.index.find_nickname("THREE")), ["b3"])
+        self.assertEqual(self.index.find_uri("http://other.com/"), [])
+
+    def test_parents(self):
+        self.assertEqual(self.index.parent("b3").id, "f2")
+        self.assertEqual(self.index.parent("b1"), None)
+        self.assertEqual(self.ids(self.index.ancestors("b3")), ["f2", "f1"])
+        self.assertTrue(self.index.trash_folder is self.trash)
+
+    def test_prefix(self):
+        self.assertEqual(self.ids(self.index.prefix(
+                         "uri", "HTTP://EXAMPLE.com/")),
+                         ["b1", "b2", "b3", "b4"])
+        self.assertEqual(self.ids(self.index.prefix("title", "folder")),
+                         ["f1", "f2"])
+        self.assertEqual(self.index.prefix("title", ""), [])
+        self.assertRaises(ValueError, self.index.prefix, "created", "2010")
+
+    def test_range(self):
+        self.assertEqual(self.ids(self.index.range(
+                         "created", datetime.datetime(2010, 6, 1))), ["b4"])
+        self.assertEqual(self.ids(self.index.range(
+                         "title", "b", "c")), ["b1", "b2", "b3"])
+
+    def test_add_and_remove(self):
+        new = bookmark(5, uri=u"http://new.com/")
+        self.index.add(new, "f2")
+        self.assertEqual(self.index.parent(new).id, "f2")
+        self.assertTrue(self.inner.children[-1] is new)
+        self.index.remove(self.outer)
+        self.assertEqual(len(self.index), 3)
+        self.assertEqual(self.index.find_uri("http://new.com/"), [])
+        self.assertEqual(self.index.prefix("title", "folder"), [])
+
+    def test_replace(self):
+        replacement = bookmark(2, title=u"Replaced")
+        self.index.add(replacement)
+        self.assertTrue(self.outer.children[0] is replacement)
+        self.assertEqual(self.ids(self.index.prefix("title", "replaced")),
+                         ["b2"])
+
+    def test_reindex(self):
+        entry = self.index.get("b4")
+        entry.nickname = u"four"
+        self.index.reindex(entry)
+        self.assertEqual(self.ids(self.index.find_nickname("Four")), ["b4"])
+
+
+class InstalledIndexTest(ServerTestCase):
+
+    def setUp(self):
+        super(InstalledIndexTest, self).setUp()
+        self.server.populate(self.user, "bookmark", items=30, folder_size=5)
+        self.index = ItemIndex(self.client.get_bookmark_tree())
+        self.index.install(self.client)
+        self.folder = [entry for entry in self.index.roots
+                       if entry.is_folder and entry.type != "trash"][0]
+        self.leaf = [entry for entry in self.index.roots
+                     if not entry.is_folder][0]
+
+    def test_create(self):
+        new = datatypes.Bookmark(title=u"new", uri=u"http://new.com/")
+        self.client.add_to_folder(new, self.folder)
+        found, = self.index.find_uri("http://new.com/")
+        self.assertEqual(found.id, new.id)
+        self.assertEqual(self.index.parent(found), self.folder)
+
+    def test_update(self):
+        self.leaf.uri = u"http://changed.com/"
+        self.leaf.update()
+        self.assertEqual(self.index.find_uri("http://changed.com/"),
+                         [self.leaf])
+
+    def test_move(self):
+        self.client.move_into(self.leaf, self.folder)
+        self.assertEqual(self.index.parent(self.leaf), self.folder)
+        self.assertTrue(self.folder.children[-1] is self.leaf)
+        self.assertFalse(self.leaf in self.index.roots)
+
+    def test_trash_and_delete(self):
+        self.leaf.trash()
+        self.assertEqual(self.index.parent(self.leaf),
+                         self.index.trash_folder)
+        self.leaf.delete()
+        self.assertFalse(self.leaf.id in self.index)
+
+    def test_uninstall(self):
+        self.index.uninstall(self.client)
+        self.leaf.delete()
+        self.assertTrue(self.leaf.id in self.index)
+
+    def test_trash_folder(self):
+        self.assertEqual(self.leaf.get_trash_folder().id,
+                         self.index.trash_folder.id)
@@ -0,0 +1,178 @@
+import socket
+
+from pyoperalink import datatypes
+from pyoperalink.auth import OAuth
+from pyoperalink.client import LinkClient, LinkError, NotFoundError
+from pyoperalink.instrument import (MetricsAggregator, RequestEvent,
+                                    percentile)
+from pyoperalink.transport import Response
+
+from tests import ServerTestCase, unittest
+
+
+class HookTest(ServerTestCase):
+
+    def setUp(self):
+        super(HookTest, self).setUp()
+        self.events = []
+        for event in ("before_request", "after_response", "on_error",
+                      "after_change"):
+            self.client.add_hook(event, self.recorder(event))
+
+    def recorder(self, name):
+        return lambda event: self.events.append((name, event))
+
+    def test_request(self):
+        self.server.populate(self.user, "bookmark", items=20)
+        self.client.get_bookmarks()
+        (before, event), (after, same_event) = self.events
+        self.assertEqual((before, after), ("before_request",
+                                           "after_response"))
+        self.assertTrue(event is same_event)
+        self.assertEqual((event.datatype, event.api_method, event.method,
+                          event.status, event.attempt, event.error),
+                         ("bookmark", "children", "GET", 200, 0, None))
+        self.assertTrue(event.url.startswith(self.server.url_prefix))
+        for name in ("signing_time", "network_time", "decode_time",
+                     "request_bytes", "response_bytes"):
+            self.assertTrue(getattr(event, name) is not None, name)
+        self.assertTrue(event.response_bytes > 0)
+        self.assertTrue(event.latency >= event.network_time)
+
+    def test_error(self):
+        self.assertRaises(NotFoundError, self.client.get_note, "missing")
+        names = [name for name, event in self.events]
+        self.assertEqual(names, ["before_request", "on_error"])
+        event = self.events[-1][1]
+        self.assertEqual(event.status, 404)
+        self.assertTrue(isinstance(event.error, NotFoundError))
+
+    def test_change(self):
+        note = datatypes.Note(content=u"content")
+        self.client.add(note)
+        name, event = self.events[-1]
+        self.assertEqual(name, "after_change")
+        self.assertEqual((event.datatype, event.api_method, event.item_id),
+                         ("note", "create", None))
+        self.assertEqual(event.params["content"], u"content")
+        self.assertEqual(event.data[0]["id"], note.id)
+
+    def test_failed_change(self):
+        self.assertRaises(NotFoundError, self.client.trash_note, "missing")
+        self.assertFalse([name for name, event in self.events
+                          if name == "after_change"])
+
+    def test_remove_hook(self):
+        hook = self.recorder("extra")
+        self.client.add_hook("after_response", hook)
+        self.client.remove_hook("after_response", hook)
+        self.client.get_notes()
+        self.assertFalse([name for name, event in self.events
+                          if name == "extra"])
+
+    def test_unknown_event(self):
+        self.assertRaises(ValueError, self.client.add_hook, "unknown",
+                          self.recorder("unknown"))
+
+
+class FailingTransport(object):
+    """
+    Raises error, or answers with content if error is None
+    """
+
+    def __init__(self, error=None, content="[]"):
+        self.error = error
+        self.content = content
+
+    def request(self, url, method="GET", body=None, headers=None):
+        if self.error is not None:
+            raise self.error
+        return Response(200, "OK"), self.content
+
+
+class TransportErrorTest(unittest.TestCase):
+
+    def make_client(self, transport):
+        auth = OAuth("key", "secret")
+        auth.set_access_token("user", "secret")
+        client = LinkClient(auth, url_prefix="http://example.com",
+                            transport=transport)
+        self.events = []
+        client.add_hook("on_error", self.events.append)
+        self.metrics = MetricsAggregator()
+        self.metrics.install(client)
+        return client
+
+    def test_network_error(self):
+        client = self.make_client(FailingTransport(socket.error("refused")))
+        self.assertRaises(LinkError, client.get_notes)
+        [event] = self.events
+        self.assertEqual(event.error.status_code, 503)
+        self.assertTrue(isinstance(event.error.content, socket.error))
+        self.assertEqual(self.metrics.summary()[("note", "children")]
+                         ["errors"], 1)
+
+    def test_invalid_response(self):
+        client = self.make_client(FailingTransport(content="<html>"))
+        self.assertRaises(ValueError, client.get_notes)
+        [event] = self.events
+        self.assertTrue(isinstance(event.error, ValueError))
+        self.assertEqual(event.status, 200)
+        self.assertEqual(self.metrics.summary()[("note", "children")]
+                         ["errors"], 1)
+
+
+class MetricsTest(ServerTestCase):
+
+    def test_install(self):
+        metrics = MetricsAggregator()
+        metrics.install(self.client)
+        self.client.get_bookmarks()
+        self.client.get_bookmarks()
+        self.assertRaises(NotFoundError, self.client.get_bookmark, "missing")
+        summary = metrics.summary()
+        self.assertEqual(summary[("bookmark", "children")]["count"], 2)
+        self.assertEqual(summary[("bookmark", "get")]["errors"], 1)
+        self.assertTrue("bookmark/children" in metrics.report())
+        metrics.uninstall(self.client)
+        self.client.get_bookmarks()
+        self.assertEqual(metrics.summary()[("bookmark", "children")]["count"],
+                         2)
+        metrics.reset()
+        self.assertEqual(metrics.summary(), {})
+
+
+class AggregationTest(unittest.TestCase):
+
+    def event(self, latency, **kwargs):
+        event = RequestEvent("note", "get", "GET", "url")
+        event.network_time = latency
+        for name, value in kwargs.items():
+            setattr(event, name, value)
+        return event
+
+    def test_summary(self):
+        metrics = MetricsAggregator()
+        for n in range(1, 101):
+            metrics.record(self.event(n / 1000.0, request_bytes=10,
+                                      attempt=n % 2))
+        summary = metrics.summary()[("note", "get")]
+        self.assertEqual(summary["count"], 100)
+        self.assertEqual(summary["retries"], 50)
+        self.assertEqual(summary["request_bytes"], 1000)
+        self.assertEqual(summary["max"], 0.1)
+        self.assertAlmostEqual(summary["mean"], 0.0505)
+        self.assertEqual(summary["p50"], 0.051)
+        self.assertEqual(summary["p90"], 0.09)
+
+    def test_bounded_sample(self):
+        metrics = MetricsAggregator(sample_size=10)
+        for n in range(1000):
+            metrics.record(self.event(n))
+        self.assertEqual(len(metrics._metrics[("note", "get")].sample), 10)
+        self.assertEqual(metrics.summary()[("note", "get")]["max"], 999)
+
+    def test_percentile(self):
+        self.assertEqual(percentile([], 0.5), 0.0)
+        self.assertEqual(percentile([1], 0.99), 1)
+        self.assertEqual(percentile([1, 2, 3], 0.5), 2)
@@ -0,0 +1,207 @@
+import os
+import shutil
+import tempfile
+
+from pyoperalink import datatypes
+from pyoperalink.client import LinkError, NotFoundError
+from pyoperalink.journal import (Change, Journal, TEMP_PREFIX, coalesce,
+                                 is_offline_error, is_temp_id, remap_ids)
+from pyoperalink.retry import CircuitOpenError
+
+from tests import ServerTestCase, unittest
+
+
+class Changes(object):
+    """
+    Builds journaled changes, numbered in turn
+    """
+
+    def __init__(self):
+        self.seq = 0
+
+    def __call__(self, api_method, target, item_id=None, **params):
+        self.seq += 1
+        if item_id is None and api_method != "create":
+            item_id = target
+        return Change([self.seq], "bookmark", api_method, item_id, target,
+                      params)
+
+
+def describe(changes):
+    return [(change.api_method, change.target, sorted(change.seqs))
+            for change in changes]
+
+
+class CoalesceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.change = Changes()
+
+    def test_updates_merge_into_create(self):
+        temp = TEMP_PREFIX + "1"
+        changes, dropped = coalesce([
+            self.change("create", temp, title="a"),
+            self.change("update", temp, title="b"),
+            self.change("update", temp, uri="u")])
+        self.assertEqual(describe(changes), [("create", temp, [1, 2, 3])])
+        self.assertEqual(changes[0].params, {"title": "b", "uri": "u"})
+        self.assertEqual(dropped, [])
+
+    def test_updates_merge(self):
+        changes, dropped = coalesce([
+            self.change("update", "A", title="a"),
+            self.change("update", "B", title="b"),
+            self.change("update", "A", uri="u")])
+        self.assertEqual(describe(changes), [("update", "A", [1, 3]),
+                                             ("update", "B", [2])])
+
+    def test_create_and_delete(self):
+        temp = TEMP_PREFIX + "1"
+        changes, dropped = coalesce([
+            self.change("create", temp),
+            self.change("update", temp, title="b"),
+            self.change("move", temp, relative_position="into",
+                        reference_item="F"),
+            self.change("delete", temp),
+            self.change("update", "A", title="a")])
+        self.assertEqual(describe(changes), [("update", "A", [5])])
+        self.assertEqual(sorted(dropped), [1, 2, 3, 4])
+
+    def test_created_item_referred_to(self):
+        temp = TEMP_PREFIX + "1"
+        changes, dropped = coalesce([
+            self.change("create", temp, item_type="bookmark_folder"),
+            self.change("create", TEMP_PREFIX + "2", temp),
+            self.change("delete", temp)])
+        self.assertEqual([change.api_method for change in changes],
+                         ["create", "create", "delete"])
+
+    def test_chained_moves(self):
+        changes, dropped = coalesce([
+            self.change("move", "A", relative_position="into",
+                        reference_item="F"),
+            self.change("move", "A", relative_position="into",
+                        reference_item="G"),
+            self.change("trash", "A")])
+        self.assertEqual(describe(changes), [("trash", "A", [1, 2, 3])])
+
+    def test_moves_relative_to_the_item(self):
+        changes, dropped = coalesce([
+            self.change("move", "A", relative_position="into",
+                        reference_item="F"),
+            self.change("move", "B", relative_position="after",
+                        reference_item="A"),
+            self.change("move", "A", relative_position="into",
+                        reference_item="G")])
+        # B was placed after A in F, the first move must be kept
+        self.assertEqual(len(changes), 3)
+
+    def test_delete_drops_updates_and_moves(self):
+        changes, dropped = coalesce([
+            self.change("update", "A", title="a"),
+            self.change("move", "A", relative_position="into",
+                        reference_item="F"),
+            self.change("delete", "A")])
+        self.assertEqual(describe(changes), [("delete", "A", [1, 2, 3])])
+
+
+class OfflineErrorTest(unittest.TestCase):
+
+    def test_offline_errors(self):
+        self.assertTrue(is_offline_error(CircuitOpenError()))
+        self.assertTrue(is_offline_error(LinkError(503, "reason",
+                                                   IOError("refused"))))
+        self.assertFalse(is_offline_error(LinkError(503, "reason", "body")))
+        self.assertFalse(is_offline_error(NotFoundError()))
+
+    def test_temp_ids(self):
+        self.assertTrue(is_temp_id(TEMP_PREFIX + "1"))
+        self.assertFalse(is_temp_id("ABC"))
+        self.assertFalse(is_temp_id(None))
+
+
+class JournalTest(ServerTestCase):
+
+    def setUp(self):
+        super(JournalTest, self).setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.journal = Journal(os.path.join(directory, "journal.db"))
+        self.addCleanup(self.journal.close)
+        self.client = self.make_client(journal=self.journal)
+        self.folder = datatypes.BookmarkFolder(title=u"folder")
+        self.client.add(self.folder)
+        self.bookmark = datatypes.Bookmark(title=u"online",
+                                           uri=u"http://a.com/")
+        self.client.add(self.bookmark)
+
+    def go_offline(self):
+        self.server.stop()
+        self.addCleanup(self.server.start)
+
+    def back_online(self):
+        self.server.start()
+        self._cleanups.remove((self.server.start, (), {}))
+
+    def test_online(self):
+        self.assertFalse(self.journal.is_offline(self.user))
+        self.assertEqual(self.journal.pending(self.user), [])
+
+    def test_offline_changes(self):
+        self.go_offline()
+        self.bookmark.title = u"changed offline"
+        self.bookmark.update()
+        self.assertTrue(self.journal.is_offline(self.user))
+        new = datatypes.Bookmark(title=u"new", uri=u"http://b.com/")
+        self.client.add_to_folder(new, self.folder)
+        self.assertTrue(is_temp_id(new.id))
+        new.title = u"new, renamed"
+        new.update()
+        self.client.move_into(self.bookmark, self.folder)
+
+        pending = self.journal.pending(self.user)
+        self.assertEqual([change.api_method for change in pending],
+                         ["update", "create", "move"])
+
+        self.back_online()
+        # Online again, but changes still go to the journal until replayed
+        self.assertTrue(self.journal.is_offline(self.user))
+        results = self.journal.replay(self.client)
+        self.assertTrue(all(result.ok for result in results))
+        self.assertFalse(self.journal.is_offline(self.user))
+
+        children = self.client.get_bookmarks(self.folder.id)
+        self.assertEqual([entry.title for entry in children],
+                         [u"new, renamed", u"changed offline"])
+        remap_ids([new], results)
+        self.assertEqual(new.id, children[0].id)
+
+    def test_refused_change(self):
+        self.go_offline()
+        self.client.trash_bookmark("missing")
+        self.bookmark.title = u"changed"
+        self.bookmark.update()
+        self.back_online()
+        results = self.journal.replay(self.client)
+        self.assertTrue(isinstance(results[0].error, NotFoundError))
+        self.assertTrue(results[1].ok)
+        self.assertEqual(self.journal.pending(self.user), [])
+
+    def test_interrupted_replay(self):
+        self.go_offline()
+        self.bookmark.title = u"changed"
+        self.bookmark.update()
+        self.assertEqual(self.journal.replay(self.client), [])
+        self.assertEqual(len(self.journal.pending(self.user)), 1)
+        self.back_online()
+        self.assertEqual(len(self.journal.replay(self.client)), 1)
+
+    def test_durable(self):
+        self.go_offline()
+        self.bookmark.trash()
+        journal = Journal(self.journal.path)
+        self.addCleanup(journal.close)
+        self.assertTrue(journal.is_offline(self.user))
+        self.assertEqual([change.api_method
+                          for change in journal.pending(self.user)],
+                         ["trash"])
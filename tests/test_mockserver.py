@@ -0,0 +1,149 @@
+import time
+
+from urllib import urlencode
+
+from pyoperalink.auth import OAuth
+from pyoperalink.mockserver import MockLinkServer
+
+from tests import ServerTestCase, unittest
+
+
+class HandleTest(unittest.TestCase):
+    """
+    Requests answered by MockLinkServer.handle, without signatures
+    """
+
+    def setUp(self):
+        self.server = MockLinkServer(verify_signatures=False)
+        self.server.add_user("user")
+
+    def get(self, path):
+        return self.server.handle("GET", "http://localhost/rest/%s?%s" % (
+                                  path, urlencode({"oauth_token": "user"})))
+
+    def post(self, path, **params):
+        params["oauth_token"] = "user"
+        return self.server.handle("POST", "http://localhost/rest/" + path,
+                                  urlencode(params))
+
+    def create(self, datatype, folder="", **params):
+        status, reason, data = self.post("%s/%s" % (datatype, folder),
+                                         api_method="create", **params)
+        self.assertEqual(status, 200, reason)
+        return data[0]["id"]
+
+    def children(self, path=""):
+        status, reason, data = self.get("bookmark/%schildren" % path)
+        self.assertEqual(status, 200, reason)
+        return [item["id"] for item in data]
+
+    def test_create_and_get(self):
+        item_id = self.create("bookmark", title="title", uri="http://a/")
+        status, reason, data = self.get("bookmark/" + item_id)
+        self.assertEqual(status, 200)
+        self.assertEqual(data[0]["item_type"], "bookmark")
+        self.assertEqual(data[0]["properties"],
+                         {"title": "title", "uri": "http://a/"})
+
+    def test_trash_folder(self):
+        status, reason, data = self.get("note/children")
+        self.assertEqual([item["properties"]["type"] for item in data],
+                         ["trash"])
+
+    def test_update(self):
+        item_id = self.create("note", content="a")
+        self.post("note/" + item_id, api_method="update", content="b",
+                  unknown="x")
+        status, reason, data = self.get("note/" + item_id)
+        self.assertEqual(data[0]["properties"], {"content": "b"})
+
+    def test_move(self):
+        trash, = self.children()
+        first = self.create("bookmark", title="1")
+        folder = self.create("bookmark", item_type="bookmark_folder")
+        self.post("bookmark/" + first, api_method="move",
+                  relative_position="after", reference_item=folder)
+        self.assertEqual(self.children(), [trash, folder, first])
+        self.post("bookmark/" + first, api_method="move",
+                  relative_position="into", reference_item=folder)
+        self.assertEqual(self.children(), [trash, folder])
+        self.assertEqual(self.children(folder + "/"), [first])
+        status, reason, data = self.post("bookmark/" + folder,
+                                         api_method="move",
+                                         relative_position="into",
+                                         reference_item=folder)
+        self.assertEqual(status, 400)
+
+    def test_trash_and_delete(self):
+        trash, = self.children()
+        item_id = self.create("bookmark")
+        self.post("bookmark/" + item_id, api_method="trash")
+        self.assertEqual(self.children(trash + "/"), [item_id])
+        status, reason, data = self.post("bookmark/" + item_id,
+                                         api_method="trash")
+        self.assertEqual(status, 400)
+        status, reason, data = self.post("bookmark/" + item_id,
+                                         api_method="delete")
+        self.assertEqual((status, data), (204, None))
+        self.assertEqual(self.get("bookmark/" + item_id)[0], 404)
+
+    def test_speeddial_positions(self):
+        status, reason, data = self.post("speeddial/", api_method="create")
+        self.assertEqual(status, 400)
+        self.create("speeddial", "3")
+        self.create("speeddial", "1")
+        status, reason, data = self.post("speeddial/3", api_method="create")
+        self.assertEqual(status, 400)
+        status, reason, data = self.get("speeddial/children")
+        self.assertEqual([item["id"] for item in data], ["1", "3"])
+
+    def test_list_datatypes(self):
+        status, reason, data = self.post("urlfilter/1", api_method="trash")
+        self.assertEqual(status, 400)
+        self.assertEqual(self.get("urlfilter/descendants")[0], 404)
+
+    def test_errors(self):
+        self.assertEqual(self.get("unknown/children")[0], 404)
+        self.assertEqual(self.get("bookmark/missing")[0], 404)
+        self.assertEqual(self.post("bookmark/children")[0], 405)
+        self.assertEqual(self.server.handle("GET",
+                         "http://localhost/rest/bookmark/children")[0], 401)
+
+    def test_populate(self):
+        self.server.populate("user", "bookmark", items=50, folder_size=10)
+        status, reason, data = self.get("bookmark/descendants")
+
+        def count(items):
+            self.assertTrue(len(items) <= 11)
+            return sum(1 + count(item.get("children") or [])
+                       for item in items)
+        self.assertEqual(count(data), 51)
+        self.assertEqual(self.server.items("user", "bookmark"), data)
+
+    def test_request_count(self):
+        start = self.server.request_count
+        self.get("note/children")
+        self.assertEqual(self.server.request_count, start + 1)
+
+
+class SignatureTest(ServerTestCase):
+
+    def test_wrong_secret(self):
+        auth = OAuth(self.server.consumer_key, self.server.consumer_secret)
+        auth.set_access_token(self.user, "wrong")
+        url, body, headers = auth.sign_request(self.server.url_prefix +
+                                               "/note/children")
+        self.assertEqual(self.server.handle("GET", url)[0], 401)
+        url, body, headers = self.auth.sign_request(self.server.url_prefix +
+                                                    "/note/children")
+        self.assertEqual(self.server.handle("GET", url)[0], 200)
+
+
+class LatencyTest(unittest.TestCase):
+
+    def test_latency(self):
+        with MockLinkServer(latency=0.05) as server:
+            server.add_user("user")
+            start = time.time()
+            server.handle("GET", server.url_prefix + "/note/children")
+            self.assertTrue(time.time() - start >= 0.05)
@@ -0,0 +1,183 @@
+import sys
+import threading
+import time
+
+from pyoperalink import datatypes
+from pyoperalink.pool import Future, SingleFlight, ThreadPool
+
+from tests import ServerTestCase, unittest
+
+
+class FutureTest(unittest.TestCase):
+
+    def test_result(self):
+        future = Future()
+        future.set_result(42)
+        self.assertTrue(future.done())
+        self.assertEqual(future.result(), 42)
+        self.assertEqual(future.exception(), None)
+
+    def test_exception(self):
+        future = Future()
+        try:
+            raise KeyError("x")
+        except KeyError:
+            future.set_exc_info(sys.exc_info())
+        self.assertRaises(KeyError, future.result)
+        self.assertTrue(isinstance(future.exception(), KeyError))
+
+    def test_timeout(self):
+        self.assertRaises(RuntimeError, Future().result, 0.01)
+
+    def test_callbacks(self):
+        future = Future()
+        called = []
+        future.add_done_callback(called.append)
+        self.assertEqual(called, [])
+        future.set_result(None)
+        future.add_done_callback(called.append)
+        self.assertEqual(called, [future, future])
+
+
+class ThreadPoolTest(unittest.TestCase):
+
+    def setUp(self):
+        self.pool = ThreadPool(4)
+        self.addCleanup(self.pool.shutdown)
+
+    def test_map_keeps_order(self):
+        def slow_square(n):
+            time.sleep(0.001 * (10 - n))
+            return n * n
+        self.assertEqual(self.pool.map(slow_square, range(10)),
+                         [n * n for n in range(10)])
+
+    def test_max_workers(self):
+        lock = threading.Lock()
+        running = [0]
+        peak = [0]
+
+        def call(n):
+            lock.acquire()
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+            lock.release()
+            time.sleep(0.01)
+            lock.acquire()
+            running[0] -= 1
+            lock.release()
+
+        self.pool.map(call, range(20))
+        self.assertTrue(1 < peak[0] <= 4, peak[0])
+
+    def test_exceptions_go_to_the_future(self):
+        future = self.pool.submit(int, "not a number")
+        self.assertRaises(ValueError, future.result)
+        self.assertEqual(self.pool.submit(int, "1").result(), 1)
+
+    def test_submit_after_shutdown(self):
+        self.pool.shutdown()
+        self.assertRaises(RuntimeError, self.pool.submit, int, "1")
+
+    def test_no_workers(self):
+        self.assertRaises(ValueError, ThreadPool, 0)
+
+
+class SingleFlightTest(unittest.TestCase):
+
+    def setUp(self):
+        self.flight = SingleFlight()
+        self.calls = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def slow(self, value):
+        self.calls.append(value)
+        self.started.set()
+        self.release.wait()
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+    def call_concurrently(self, key, value, count=5):
+        results = []
+
+        def call():
+            try:
+                results.append(self.flight.call(key, self.slow, value))
+            except Exception, ex:
+                results.append(ex)
+        threads = [threading.Thread(target=call) for i in range(count)]
+        threads[0].start()
+        self.started.wait()
+        for thread in threads[1:]:
+            thread.start()
+        # Until all the others wait for the first call
+        while self.flight.shared < count - 1:
+            time.sleep(0.001)
+        self.release.set()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_shared_result(self):
+        results = self.call_concurrently("key", "value")
+        self.assertEqual(results, ["value"] * 5)
+        self.assertEqual(self.calls, ["value"])
+        self.assertEqual(self.flight.shared, 4)
+
+    def test_shared_exception(self):
+        error = KeyError("x")
+        results = self.call_concurrently("key", error)
+        self.assertEqual(results, [error] * 5)
+        self.assertEqual(len(self.calls), 1)
+
+    def test_runs_again(self):
+        self.release.set()
+        self.flight.call("key", self.slow, 1)
+        self.flight.call("key", self.slow, 2)
+        self.assertEqual(self.calls, [1, 2])
+        self.assertEqual(self.flight._calls, {})
+
+    def test_other_keys(self):
+        self.release.set()
+        self.assertEqual(self.flight.call("a", self.slow, 1), 1)
+        self.assertEqual(self.flight.call("b", self.slow, 2), 2)
+        self.assertEqual(self.flight.shared, 0)
+
+
+class CoalescedRequestTest(ServerTestCase):
+
+    def test_concurrent_gets(self):
+        self.server.populate(self.user, "bookmark", items=20)
+        results = []
+
+        def get():
+            results.append(self.client.get_bookmarks())
+        threads = [threading.Thread(target=get) for i in range(5)]
+        self.server.latency = 0.1
+        try:
+            start = self.server.request_count
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            self.server.latency = 0
+        self.assertEqual(self.server.request_count - start, 1)
+        self.assertEqual(self.client.single_flight.shared, 4)
+        # Each caller gets entries of its own
+        first_items = set(id(items[0]) for items in results)
+        self.assertEqual(len(first_items), 5)
+        self.assertEqual(len(set(tuple(item.id for item in items)
+                                 for items in results)), 1)
+
+    def test_changes_are_not_coalesced(self):
+        notes = [datatypes.Note(content=u"same") for i in range(3)]
+        threads = [threading.Thread(target=self.client.add, args=(note,))
+                   for note in notes]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(set(note.id for note in notes)), 3)
@@ -0,0 +1,199 @@
+import time
+
+from email.utils import formatdate
+
+from pyoperalink.auth import OAuth
+from pyoperalink.client import (AccessDeniedError, LinkClient, LinkError,
+                                NotFoundError)
+from pyoperalink.retry import (CircuitBreaker, CircuitOpenError,
+                               RetryPolicy, parse_retry_after)
+from pyoperalink.transport import Response
+
+from tests import unittest
+
+
+def error(status, retry_after=None):
+    ex = LinkError(status, "reason")
+    ex.retry_after = retry_after
+    return ex
+
+
+class RetryPolicyTest(unittest.TestCase):
+
+    def test_backoff(self):
+        policy = RetryPolicy(max_attempts=10, backoff=1, max_backoff=4)
+        for attempt in range(9):
+            delay = policy.delay("GET", attempt, error(503))
+            self.assertTrue(0 <= delay <= min(4, 2 ** attempt), delay)
+
+    def test_max_attempts(self):
+        policy = RetryPolicy(max_attempts=3)
+        self.assertTrue(policy.delay("GET", 1, error(500)) is not None)
+        self.assertEqual(policy.delay("GET", 2, error(500)), None)
+
+    def test_statuses(self):
+        policy = RetryPolicy()
+        for status in (429, 500, 502, 503, 504):
+            self.assertTrue(policy.delay("GET", 0, error(status)) is not None)
+        for status in (400, 401, 404):
+            self.assertEqual(policy.delay("GET", 0, error(status)), None)
+        self.assertEqual(policy.delay("GET", 0, CircuitOpenError()), None)
+
+    def test_writes(self):
+        self.assertEqual(RetryPolicy().delay("POST", 0, error(503)), None)
+        self.assertTrue(RetryPolicy(retry_writes=True).delay(
+                                "POST", 0, error(503)) is not None)
+
+    def test_retry_after(self):
+        policy = RetryPolicy(max_retry_after=10)
+        self.assertEqual(policy.delay("GET", 0, error(429, "7")), 7)
+        self.assertEqual(policy.delay("GET", 0, error(429, "11")), None)
+
+    def test_parse_retry_after(self):
+        self.assertEqual(parse_retry_after(None), None)
+        self.assertEqual(parse_retry_after(" 120 "), 120)
+        self.assertEqual(parse_retry_after("soon"), None)
+        later = parse_retry_after(formatdate(time.time() + 60))
+        self.assertTrue(55 <= later <= 60, later)
+        self.assertEqual(parse_retry_after(formatdate(time.time() - 60)), 0)
+
+
+class CircuitBreakerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+
+    def open(self, host="a"):
+        self.breaker.record(host, error(503))
+        self.breaker.record(host, error(503))
+
+    def test_opens(self):
+        self.breaker.record("a", error(503))
+        self.assertEqual(self.breaker.state("a"), "closed")
+        self.breaker.before_request("a")
+        self.breaker.record("a", error(503))
+        self.assertEqual(self.breaker.state("a"), "open")
+        self.assertRaises(CircuitOpenError, self.breaker.before_request, "a")
+        # Per host
+        self.breaker.before_request("b")
+
+    def test_success_resets(self):
+        self.breaker.record("a", error(503))
+        self.breaker.record("a")
+        self.breaker.record("a", error(503))
+        self.assertEqual(self.breaker.state("a"), "closed")
+
+    def test_client_errors_do_not_count(self):
+        for i in range(3):
+            self.breaker.record("a", NotFoundError())
+        self.assertEqual(self.breaker.state("a"), "closed")
+
+    def test_other_exceptions_count(self):
+        self.breaker.record("a", ValueError())
+        self.breaker.record("a", ValueError())
+        self.assertEqual(self.breaker.state("a"), "open")
+
+    def test_single_probe(self):
+        self.open()
+        self.breaker.reset_timeout = 0
+        self.assertEqual(self.breaker.state("a"), "half-open")
+        self.breaker.before_request("a")
+        self.assertRaises(CircuitOpenError, self.breaker.before_request, "a")
+        self.breaker.record("a")
+        self.assertEqual(self.breaker.state("a"), "closed")
+
+    def test_failed_probe(self):
+        self.open()
+        self.breaker.reset_timeout = 0
+        self.breaker.before_request("a")
+        self.breaker.record("a", error(503))
+        self.breaker.reset_timeout = 60
+        self.assertEqual(self.breaker.state("a"), "open")
+
+    def test_circuit_open_errors_are_ignored(self):
+        self.breaker.record("a", error(503))
+        self.breaker.record("a", CircuitOpenError())
+        self.assertEqual(self.breaker.state("a"), "closed")
+
+
+class ScriptedTransport(object):
+    """
+    Answers requests with the given (status, content, headers), in turn
+    """
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def request(self, url, method="GET", body=None, headers=None):
+        self.requests.append((method, url))
+        status, content, headers = self.responses.pop(0)
+        if isinstance(status, Exception):
+            raise status
+        return Response(status, "reason", headers), content
+
+
+OK = (200, "[]", ())
+UNAVAILABLE = (503, "", ())
+
+
+class ClientRetryTest(unittest.TestCase):
+
+    def client(self, transport, **kwargs):
+        auth = OAuth("key", "secret")
+        auth.set_access_token("user", "secret")
+        return LinkClient(auth, url_prefix="http://link.example.com",
+                          transport=transport, **kwargs)
+
+    def test_retried(self):
+        transport = ScriptedTransport(UNAVAILABLE,
+                                      (IOError("reset"), None, None), OK)
+        client = self.client(transport,
+                             retry_policy=RetryPolicy(backoff=0))
+        self.assertEqual(client.get_bookmarks(), [])
+        self.assertEqual(len(transport.requests), 3)
+
+    def test_gives_up(self):
+        transport = ScriptedTransport(UNAVAILABLE, UNAVAILABLE, OK)
+        client = self.client(transport, retry_policy=RetryPolicy(
+                                                max_attempts=2, backoff=0))
+        try:
+            client.get_bookmarks()
+        except LinkError, ex:
+            self.assertEqual(ex.status_code, 503)
+        else:
+            self.fail("LinkError not raised")
+        self.assertEqual(len(transport.requests), 2)
+
+    def test_not_retried(self):
+        transport = ScriptedTransport((401, "", ()), UNAVAILABLE, OK)
+        client = self.client(transport, retry_policy=RetryPolicy(backoff=0))
+        self.assertRaises(AccessDeniedError, client.get_bookmarks)
+        self.assertRaises(LinkError, client.trash_bookmark, "id")
+        self.assertEqual(len(transport.requests), 2)
+
+    def test_retry_after(self):
+        transport = ScriptedTransport((429, "", [("Retry-After", "0")]), OK)
+        client = self.client(transport, retry_policy=RetryPolicy(
+                                                backoff=1000))
+        self.assertEqual(client.get_bookmarks(), [])
+
+    def test_circuit_breaker(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+        transport = ScriptedTransport(UNAVAILABLE, OK)
+        client = self.client(transport, circuit_breaker=breaker)
+        self.assertRaises(LinkError, client.get_bookmarks)
+        self.assertRaises(CircuitOpenError, client.get_bookmarks)
+        self.assertEqual(len(transport.requests), 1)
+
+    def test_probe_with_invalid_response(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        transport = ScriptedTransport(UNAVAILABLE, (200, "not JSON", ()), OK)
+        client = self.client(transport, circuit_breaker=breaker)
+        self.assertRaises(LinkError, client.get_bookmarks)
+        self.assertRaises(ValueError, client.get_bookmarks)
+        # The probe failed, the circuit opened again rather than staying
+        # half-open for good
+        self.assertFalse(breaker._hosts["link.example.com"][2])
+        self.assertEqual(client.get_bookmarks(), [])
+        self.assertEqual(breaker.state("link.example.com"), "closed")
@@ -0,0 +1,143 @@
+import gc
+import threading
+import time
+import weakref
+
+from pyoperalink.auth import OAuth
+from pyoperalink.client import LinkClient
+from pyoperalink.scheduler import Scheduler, TokenBucket
+
+from tests import unittest
+
+
+def make_client():
+    auth = OAuth("key", "secret")
+    auth.set_access_token("user", "secret")
+    return LinkClient(auth, url_prefix="http://link.example.com")
+
+
+class TokenBucketTest(unittest.TestCase):
+
+    def test_burst(self):
+        bucket = TokenBucket(rate=1, burst=3)
+        self.assertTrue(all(bucket.try_acquire() for i in range(3)))
+        self.assertFalse(bucket.try_acquire())
+
+    def test_rate(self):
+        bucket = TokenBucket(rate=100, burst=1)
+        start = time.time()
+        for i in range(6):
+            bucket.acquire()
+        elapsed = time.time() - start
+        self.assertTrue(0.04 <= elapsed < 0.5, elapsed)
+
+    def test_too_many_tokens(self):
+        bucket = TokenBucket(rate=10, burst=5)
+        self.assertRaises(ValueError, bucket.acquire, 6)
+        bucket.acquire(5)
+
+    def test_invalid_rate(self):
+        self.assertRaises(ValueError, TokenBucket, 0)
+
+    def test_install(self):
+        bucket = TokenBucket(rate=10)
+        client = make_client()
+        bucket.install(client)
+        self.assertEqual(len(client.hooks["before_request"]), 1)
+        bucket.uninstall(client)
+        self.assertEqual(client.hooks["before_request"], [])
+
+
+class SchedulerTest(unittest.TestCase):
+
+    def test_results(self):
+        scheduler = Scheduler(max_workers=4)
+        futures = [scheduler.submit(n % 3, pow, n, 2) for n in range(20)]
+        failed = scheduler.submit("x", int, "not a number")
+        scheduler.shutdown()
+        self.assertEqual([future.result() for future in futures],
+                         [n ** 2 for n in range(20)])
+        self.assertRaises(ValueError, failed.result)
+
+    def test_per_account(self):
+        lock = threading.Lock()
+        running = {}
+        peaks = {}
+
+        def call(account):
+            lock.acquire()
+            running[account] = running.get(account, 0) + 1
+            peaks[account] = max(peaks.get(account, 0), running[account])
+            lock.release()
+            time.sleep(0.005)
+            lock.acquire()
+            running[account] -= 1
+            lock.release()
+
+        scheduler = Scheduler(max_workers=8, per_account=2)
+        for n in range(40):
+            scheduler.submit(n % 2, call, n % 2)
+        scheduler.shutdown()
+        self.assertEqual(peaks, {0: 2, 1: 2})
+
+    def test_fair(self):
+        started = threading.Event()
+        release = threading.Event()
+        order = []
+
+        def call(name):
+            order.append(name)
+            if name == "a0":
+                started.set()
+                release.wait()
+
+        scheduler = Scheduler(max_workers=1)
+        scheduler.submit("a", call, "a0")
+        started.wait()
+        for n in range(1, 20):
+            scheduler.submit("a", call, "a%d" % n)
+        scheduler.submit("b", call, "b0")
+        release.set()
+        scheduler.shutdown()
+        # b waits only for the call of a already running
+        self.assertEqual(order[:3], ["a0", "b0", "a1"])
+
+    def test_submit_after_shutdown(self):
+        scheduler = Scheduler()
+        scheduler.shutdown()
+        self.assertRaises(RuntimeError, scheduler.submit, "a", int)
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, Scheduler, max_workers=0)
+        self.assertRaises(ValueError, Scheduler, per_account=0)
+
+
+class LimitedSchedulerTest(unittest.TestCase):
+
+    def test_limiter_installed_while_working(self):
+        scheduler = Scheduler(max_workers=2, limiter=TokenBucket(rate=100))
+        client = make_client()
+        hooks = scheduler.submit(client, lambda: list(
+                                 client.hooks["before_request"])).result(5)
+        self.assertEqual(len(hooks), 1)
+        # Done once nothing is running nor queued
+        time.sleep(0.05)
+        self.assertEqual(client.hooks["before_request"], [])
+        self.assertEqual(scheduler._limited, set())
+        scheduler.shutdown()
+
+    def test_clients_are_not_kept(self):
+        scheduler = Scheduler(max_workers=2, limiter=TokenBucket(rate=100))
+        client = make_client()
+        scheduler.submit(client, len, "abc").result(5)
+        time.sleep(0.05)
+        reference = weakref.ref(client)
+        del client
+        gc.collect()
+        self.assertEqual(reference(), None)
+        scheduler.shutdown()
+
+    def test_other_accounts(self):
+        scheduler = Scheduler(limiter=TokenBucket(rate=100))
+        self.assertEqual(scheduler.submit("key", len, "ab").result(5), 2)
+        scheduler.shutdown()
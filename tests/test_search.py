@@ -0,0 +1,235 @@
+import math
+import random
+
+from pyoperalink import datatypes
+from pyoperalink.search import MAX_PREFIX_WORDS, SearchIndex, tokenize
+
+from tests import ServerTestCase, unittest
+
+
+def note(item_id, content):
+    return datatypes.Note(id=item_id, content=content)
+
+
+def ids(entries):
+    return [entry.id for entry in entries]
+
+
+class TokenizeTest(unittest.TestCase):
+
+    def test_tokenize(self):
+        self.assertEqual(tokenize(u"Opera LINK, sync-2!"),
+                         [u"opera", u"link", u"sync", u"2"])
+        self.assertEqual(tokenize(u"\u017b\u00f3\u0142w"),
+                         [u"\u017c\u00f3\u0142w"])
+        self.assertEqual(tokenize(None), [])
+
+
+class SearchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = SearchIndex([
+            note("n1", u"Opera link synchronises bookmarks"),
+            note("n2", u"Opera browser"),
+            note("n3", u"link link link"),
+            datatypes.Bookmark(id="b1", title=u"Opera Link",
+                               uri=u"http://link.opera.com/"),
+            datatypes.SpeedDial(id="1", title=u"opera"),
+        ])
+
+    def test_all_words(self):
+        self.assertEqual(sorted(ids(self.index.search(u"opera link"))),
+                         ["b1", "n1"])
+        self.assertEqual(self.index.search(u"opera missing"), [])
+        self.assertEqual(self.index.search(u" ,"), [])
+
+    def test_prefix(self):
+        self.assertEqual(sorted(ids(self.index.search(u"OPERA bro"))),
+                         ["n2"])
+        self.assertEqual(sorted(ids(self.index.search(u"synchron"))),
+                         ["n1"])
+        # Only the last word is a prefix
+        self.assertEqual(self.index.search(u"synchron opera"), [])
+
+    def test_ranking(self):
+        # Titles weigh most, then repeated words
+        self.assertEqual(ids(self.index.search(u"link")),
+                         ["b1", "n3", "n1"])
+
+    def test_limit(self):
+        self.assertEqual(ids(self.index.search(u"link", limit=1)), ["b1"])
+        self.assertEqual(len(self.index.search(u"link", limit=None)), 3)
+        self.assertEqual(self.index.search(u"link", limit=0), [])
+        self.assertRaises(ValueError, self.index.search, u"link", limit=-1)
+
+    def test_other_item_types(self):
+        self.assertEqual(len(self.index), 4)
+        self.assertFalse("1" in self.index)
+
+    def test_update_and_remove(self):
+        entry = self.index._entries["n2"]
+        entry.content = u"Opera mail"
+        self.index.update(entry)
+        self.assertEqual(self.index.search(u"browser"), [])
+        self.assertEqual(ids(self.index.search(u"mail")), ["n2"])
+        self.index.remove("n2")
+        self.assertEqual(self.index.search(u"mail"), [])
+        self.assertFalse("n2" in self.index)
+
+    def test_folders(self):
+        folder = datatypes.NoteFolder(id="f1")
+        inner = datatypes.NoteFolder(id="f2")
+        inner.children = [note("n5", u"deep")]
+        folder.children = [note("n4", u"inside"), inner]
+        self.index.add_items([folder])
+        self.assertEqual(ids(self.index.search(u"deep")), ["n5"])
+        self.index.remove(folder)
+        self.assertEqual(self.index.search(u"deep"), [])
+        self.assertEqual(self.index.search(u"inside"), [])
+
+    def test_trash_content_not_indexed(self):
+        trash = datatypes.NoteFolder(id="t", type="trash")
+        trash.children = [note("n6", u"thrown away")]
+        self.index.add_items([trash])
+        self.assertEqual(self.index.search(u"thrown"), [])
+
+    def test_light_entries(self):
+        light = note("n7", datatypes.NOT_LOADED)
+        self.index.add(light)
+        self.assertTrue("n7" in self.index)
+
+
+class PrefixLimitTest(unittest.TestCase):
+
+    def test_most_frequent_completions(self):
+        entries = [note("w%d" % n, u"word%03d" % n)
+                   for n in range(MAX_PREFIX_WORDS * 2)]
+        # The most frequent words are the last ones
+        entries += [note("x%d" % n, u"word%03d" % (MAX_PREFIX_WORDS * 2 - 1 -
+                                                   n % MAX_PREFIX_WORDS))
+                    for n in range(MAX_PREFIX_WORDS * 3)]
+        entries.append(note("exact", u"word"))
+        index = SearchIndex(entries)
+        words = index._expand(u"word")
+        self.assertEqual(len(words), MAX_PREFIX_WORDS + 1)
+        self.assertTrue(u"word" in words)
+        self.assertEqual(sorted(words)[1], u"word%03d" % MAX_PREFIX_WORDS)
+        self.assertTrue("exact" in ids(index.search(u"word", limit=None)))
+
+    def test_end_of_range(self):
+        index = SearchIndex([note("a", u"ab"), note("b", u"ac"),
+                             note("c", u"b")])
+        self.assertEqual(index._expand(u"a"), [u"ab", u"ac"])
+        self.assertEqual(index._expand(u"ab"), [u"ab"])
+        self.assertEqual(index._expand(u"bz"), [])
+
+
+class RankingTest(unittest.TestCase):
+    """
+    The early cutoff must give the best scores of a full scan
+    """
+
+    def score(self, index, terms, item_id):
+        """
+        Returns the score of item_id, 0 if a term of the query is missing
+        """
+        total = float(len(index._entries))
+        score = 0
+        for term in terms:
+            best = 0
+            for word in term:
+                weight = index._postings.get(word, {}).get(item_id)
+                if weight is not None:
+                    idf = math.log(1 + total / len(index._postings[word]))
+                    best = max(best, weight * idf)
+            if not best:
+                return 0
+            score += best
+        return score
+
+    def check(self, index, query, limit):
+        words = tokenize(query)
+        terms = [[word] for word in words[:-1]] + [index._expand(words[-1])]
+        scores = [self.score(index, terms, item_id)
+                  for item_id in index._entries]
+        expected = sorted(filter(None, scores), reverse=True)[:limit]
+        found = [self.score(index, terms, entry.id)
+                 for entry in index.search(query, limit)]
+        self.assertEqual(len(found), len(expected), query)
+        for found_score, expected_score in zip(found, expected):
+            self.assertAlmostEqual(found_score, expected_score)
+
+    def test_random(self):
+        rng = random.Random(42)
+        vocabulary = [u"w%d" % n for n in range(60)]
+
+        def text():
+            return u" ".join(rng.choice(vocabulary[:rng.randint(5, 60)])
+                             for i in range(rng.randint(1, 12)))
+        index = SearchIndex([note("n%d" % n, text()) for n in range(500)])
+        for round in range(3):
+            for query in (u"w1", u"w1 w2", u"w3 w", u"w40 w5", u"w7 w8 w1"):
+                for limit in (1, 5, 20, None):
+                    self.check(index, query, limit)
+            # Updates and removals must keep the ranking right
+            for n in rng.sample(range(500), 50):
+                index.update(note("n%d" % n, text()))
+            for n in rng.sample(range(500), 20):
+                index.remove("n%d" % n)
+
+
+class InstalledSearchTest(ServerTestCase):
+
+    def setUp(self):
+        super(InstalledSearchTest, self).setUp()
+        self.server.populate(self.user, "note", items=20, folder_size=5)
+        self.index = SearchIndex(self.client.get_note_tree())
+        self.index.install(self.client)
+        self.trash = [entry for entry in self.client.get_notes()
+                      if entry.is_folder and entry.type == "trash"][0]
+        self.folder = [entry for entry in self.client.get_notes()
+                       if entry.is_folder and entry.type != "trash"][0]
+
+    def add(self, content, folder=None):
+        entry = datatypes.Note(content=content)
+        if folder is None:
+            self.client.add(entry)
+        else:
+            self.client.add_to_folder(entry, folder)
+        return entry
+
+    def test_create_and_update(self):
+        entry = self.add(u"fresh words")
+        self.assertEqual(ids(self.index.search(u"fresh")), [entry.id])
+        entry.content = u"other words"
+        entry.update()
+        self.assertEqual(self.index.search(u"fresh"), [])
+        self.assertEqual(ids(self.index.search(u"other")), [entry.id])
+
+    def test_trash(self):
+        entry = self.add(u"doomed")
+        entry.trash()
+        self.assertEqual(self.index.search(u"doomed"), [])
+
+    def test_trash_folder(self):
+        entry = self.add(u"nested", self.folder)
+        self.folder.trash()
+        self.assertEqual(self.index.search(u"nested"), [])
+        self.assertFalse(entry.id in self.index)
+
+    def test_move_into_trash(self):
+        entry = self.add(u"moved")
+        self.client.move_into(entry, self.trash)
+        self.assertEqual(self.index.search(u"moved"), [])
+        kept = self.add(u"kept")
+        self.client.move_into(kept, self.folder)
+        self.assertEqual(ids(self.index.search(u"kept")), [kept.id])
+
+    def test_create_in_trash(self):
+        self.add(u"rubbish", self.trash)
+        self.assertEqual(self.index.search(u"rubbish"), [])
+
+    def test_delete(self):
+        entry = self.add(u"deleted")
+        entry.delete()
+        self.assertEqual(self.index.search(u"deleted"), [])
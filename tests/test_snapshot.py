@@ -0,0 +1,88 @@
+import os
+import shutil
+import tempfile
+
+from pyoperalink.snapshot import SnapshotStore
+
+from tests import ServerTestCase
+from tests.test_client import flatten, flatten_json
+
+
+class SnapshotTest(ServerTestCase):
+
+    def setUp(self):
+        super(SnapshotTest, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.store = SnapshotStore(os.path.join(self.directory, "link.db"))
+        self.addCleanup(self.store.close)
+
+    def test_tree(self):
+        self.server.populate(self.user, "bookmark", items=100, folder_size=8)
+        self.client.save_snapshot(self.store, "bookmark")
+        tree, requests = self.count_requests(self.client.load_snapshot,
+                                             self.store, "bookmark")
+        self.assertEqual(requests, 0)
+        self.assertEqual(flatten(tree),
+                         flatten_json(self.server.items(self.user,
+                                                        "bookmark")))
+        self.assertEqual([item._to_python() for item in tree],
+                         [item._to_python()
+                          for item in self.client.get_bookmarks()])
+        self.assertTrue(all(item._conn is self.client for item in tree))
+        self.assertEqual(tree[0]._changed_fields(), [])
+
+    def test_list(self):
+        self.server.populate(self.user, "speeddial", items=5)
+        self.client.save_snapshot(self.store, "speeddial")
+        speeddials = self.client.load_snapshot(self.store, "speeddial")
+        self.assertEqual([(item.position, item._to_python())
+                          for item in speeddials],
+                         [(item.position, item._to_python())
+                          for item in self.client.get_speeddials()])
+
+    def test_heavy_fields_are_saved(self):
+        self.server.populate(self.user, "note", items=10, folder_ratio=0)
+        light = self.make_client(light=True)
+        light.save_snapshot(self.store, "note")
+        notes = self.client.load_snapshot(self.store, "note")
+        contents = [note.content for note in notes if not note.is_folder]
+        self.assertTrue(all(contents))
+        self.assertEqual(contents, [note.content for note in
+                                    self.client.get_notes()
+                                    if not note.is_folder])
+
+    def test_given_items(self):
+        self.server.populate(self.user, "note", items=10, folder_ratio=0)
+        notes = self.client.get_notes()[:3]
+        self.client.save_snapshot(self.store, "note", notes)
+        self.assertEqual([note.id for note in
+                          self.client.load_snapshot(self.store, "note")],
+                         [note.id for note in notes])
+
+    def test_missing(self):
+        self.assertEqual(self.client.load_snapshot(self.store, "note"), None)
+        self.assertEqual(self.store.saved_at(self.user, "note"), None)
+
+    def test_replaced(self):
+        self.server.populate(self.user, "urlfilter", items=5)
+        self.client.save_snapshot(self.store, "urlfilter")
+        first = self.store.saved_at(self.user, "urlfilter")
+        self.client.save_snapshot(self.store, "urlfilter", [])
+        self.assertEqual(self.client.load_snapshot(self.store, "urlfilter"),
+                         [])
+        self.assertTrue(self.store.saved_at(self.user, "urlfilter") >= first)
+
+    def test_persistent(self):
+        self.server.populate(self.user, "urlfilter", items=5)
+        self.client.save_snapshot(self.store, "urlfilter")
+        store = SnapshotStore(self.store.path)
+        self.addCleanup(store.close)
+        self.assertEqual(len(self.client.load_snapshot(store, "urlfilter")),
+                         5)
+
+    def test_users_are_separate(self):
+        self.server.populate(self.user, "urlfilter", items=5)
+        self.client.save_snapshot(self.store, "urlfilter")
+        self.assertEqual(self.store.load(self.user + "-other", "urlfilter"),
+                         None)
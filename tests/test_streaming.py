@@ -0,0 +1,56 @@
+from StringIO import StringIO
+
+from pyoperalink.streaming import iter_json_array
+
+from tests import unittest
+
+
+def decode(data, chunk_size=65536):
+    return list(iter_json_array(StringIO(data), chunk_size))
+
+
+class IterJSONArrayTest(unittest.TestCase):
+
+    def test_elements(self):
+        data = '[{"a": [1, 2]}, "x", 3.5, null, true, [], {}]'
+        expected = [{"a": [1, 2]}, "x", 3.5, None, True, [], {}]
+        for chunk_size in (1, 2, 3, 7, 65536):
+            self.assertEqual(decode(data, chunk_size), expected)
+
+    def test_numbers_across_chunks(self):
+        self.assertEqual(decode("[12345,678]", 2), [12345, 678])
+        self.assertEqual(decode("[12345]", 3), [12345])
+        for chunk_size in (1, 2, 3, 4, 5):
+            self.assertEqual(decode("[-1.5, 2e3, 12.25E-1]", chunk_size),
+                             [-1.5, 2e3, 12.25E-1])
+
+    def test_separators_in_strings(self):
+        data = '["a, b", "]", "\\"[", {"k": "},{"}]'
+        self.assertEqual(decode(data, 1), ["a, b", "]", '"[', {"k": "},{"}])
+
+    def test_whitespace(self):
+        self.assertEqual(decode(" \n[ 1 ,\t2 ] \n", 1), [1, 2])
+
+    def test_empty(self):
+        self.assertEqual(decode(""), [])
+        self.assertEqual(decode("[]"), [])
+        self.assertEqual(decode(" [ ] ", 1), [])
+
+    def test_unicode(self):
+        data = u'["\u017c\u00f3\u0142w", "\\u0105"]'.encode("utf-8")
+        self.assertEqual(decode(data, 1),
+                         [u"\u017c\u00f3\u0142w", u"\u0105"])
+
+    def test_not_an_array(self):
+        self.assertRaises(ValueError, decode, '{"a": 1}')
+
+    def test_truncated(self):
+        self.assertRaises(ValueError, decode, '[1, 2', 1)
+        self.assertRaises(ValueError, decode, '[1, "ab', 1)
+        self.assertRaises(ValueError, decode, '[', 1)
+
+    def test_lazy(self):
+        stream = StringIO("[1, 2, " + "3, " * 1000 + "4]")
+        items = iter_json_array(stream, 16)
+        self.assertEqual(next(items), 1)
+        self.assertTrue(stream.tell() < 100)
@@ -0,0 +1,103 @@
+import datetime
+
+from pyoperalink import datatypes
+from pyoperalink.sync import diff_trees, synchronize
+
+from tests import ServerTestCase
+
+
+def describe(items):
+    """
+    Returns the titles of a tree's items, nested like the tree, leaving
+    out the trash folder
+    """
+    return [(item.title, item.is_folder and describe(item.children) or None)
+            for item in items if getattr(item, "type", None) != "trash"]
+
+
+def kinds(operations):
+    return [operation.kind for operation in operations]
+
+
+class SyncTest(ServerTestCase):
+
+    def setUp(self):
+        super(SyncTest, self).setUp()
+        self.server.populate(self.user, "bookmark", items=60, folder_size=6)
+        self.local = self.client.get_bookmark_tree()
+
+    def folders(self, items):
+        return [item for item in items
+                if item.is_folder and item.type != "trash"]
+
+    def leaves(self, items):
+        return [item for item in items if not item.is_folder]
+
+    def check(self, expected_kinds):
+        operations = synchronize(self.client, self.local)
+        self.assertEqual(sorted(kinds(operations)), sorted(expected_kinds))
+        remote = self.client.get_bookmark_tree()
+        self.assertEqual(describe(remote), describe(self.local))
+        self.assertEqual(diff_trees(self.local, remote), [])
+        return operations
+
+    def test_unchanged(self):
+        self.check([])
+
+    def test_update(self):
+        leaf = self.leaves(self.local)[0]
+        leaf.title = u"changed"
+        operations = self.check(["update"])
+        self.assertEqual(operations[0].fields, ["title"])
+
+    def test_reorder(self):
+        self.local.append(self.local.pop(0))
+        self.check(["move"])
+
+    def test_move_to_folder(self):
+        leaf = self.leaves(self.local)[0]
+        self.local.remove(leaf)
+        folder = self.folders(self.local)[0]
+        folder.children = [leaf] + folder.children
+        self.check(["move"])
+
+    def test_create(self):
+        folder = datatypes.BookmarkFolder(title=u"new folder")
+        folder.children = [datatypes.Bookmark(title=u"new %d" % n)
+                           for n in range(3)]
+        self.local.append(folder)
+        self.local.insert(0, datatypes.Bookmark(title=u"first"))
+        # Both are appended, the first one is moved into place after
+        self.check(["create"] * 5 + ["move"])
+
+    def test_trash_topmost_only(self):
+        folder = self.folders(self.local)[0]
+        self.assertTrue(folder.children)
+        self.local.remove(folder)
+        operations = self.check(["trash"])
+        self.assertEqual(operations[0].entry.id, folder.id)
+
+    def test_keep_item_of_trashed_folder(self):
+        folder = self.folders(self.local)[0]
+        leaf = self.leaves(folder.children)[0]
+        self.local.remove(folder)
+        self.local.append(leaf)
+        operations = self.check(["move", "trash"])
+        # Moved out before its folder is trashed
+        self.assertEqual(kinds(operations), ["move", "trash"])
+
+    def test_trash_folder_is_left_alone(self):
+        self.local = [item for item in self.local
+                      if getattr(item, "type", None) != "trash"]
+        self.check([])
+
+    def test_dates_with_fraction(self):
+        remote = self.client.get_bookmark_tree()
+        leaf = self.leaves(remote)[0]
+        leaf._created = "2010-01-02T03:04:05.5+01:00"
+        local = self.leaves(self.local)[0]
+        local._created = "2010-01-02T03:04:05.5+01:00"
+        local.created
+        self.assertEqual(diff_trees(self.local, remote), [])
+        local.created = datetime.datetime(2010, 1, 2, 2, 4, 5)
+        self.assertEqual(kinds(diff_trees(self.local, remote)), ["update"])
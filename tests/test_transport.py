@@ -0,0 +1,111 @@
+import threading
+
+from urlparse import parse_qs
+
+from pyoperalink import datatypes
+from pyoperalink.transport import HTTPConnectionPool
+
+from tests import ServerTestCase
+
+
+class ConnectionPoolTest(ServerTestCase):
+
+    def setUp(self):
+        super(ConnectionPoolTest, self).setUp()
+        self.pool = HTTPConnectionPool(max_size=2)
+        self.addCleanup(self.pool.close)
+
+    def test_connections_are_reused(self):
+        client = self.make_client(transport=self.pool)
+        for i in range(5):
+            client.get_bookmarks()
+        stats = self.pool.stats
+        self.assertEqual(stats["opens"], 1)
+        self.assertEqual(stats["hits"], 4)
+        self.assertEqual(stats["idle"], 1)
+
+    def test_shared_between_users(self):
+        other_auth = self.server.add_user(self.user + "-other")
+        client = self.make_client(transport=self.pool)
+        other_client = self.make_client(transport=self.pool)
+        other_client.auth_handler = other_auth
+        self.server.populate(self.user, "note", items=5)
+        client.get_notes()
+        # Signed for the other user, over the same connection
+        self.assertEqual(len(other_client.get_notes()), 1)
+        self.assertEqual(len(client.get_notes()), 6)
+        self.assertEqual(self.pool.stats["opens"], 1)
+
+    def test_idle_eviction(self):
+        self.pool.idle_timeout = -1
+        client = self.make_client(transport=self.pool)
+        client.get_bookmarks()
+        client.get_bookmarks()
+        stats = self.pool.stats
+        self.assertEqual(stats["opens"], 2)
+        self.assertEqual(stats["evictions"], 1)
+        self.assertEqual(stats["hits"], 0)
+
+    def test_max_size(self):
+        # Unsigned requests, answered without content after the latency
+        url = self.server.url_prefix + "/"
+        threads = [threading.Thread(target=self.pool.request, args=(url,))
+                   for i in range(6)]
+        self.server.latency = 0.05
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            self.server.latency = 0
+        stats = self.pool.stats
+        self.assertEqual(stats["opens"], 6)
+        self.assertEqual(stats["idle"], 2)
+        self.assertEqual(stats["discards"], 4)
+
+    def stream_bookmarks(self):
+        self.server.populate(self.user, "bookmark", items=300)
+        url, body, headers = self.auth.sign_request(
+                self.server.url_prefix + "/bookmark/descendants")
+        return self.pool.stream(url, headers=headers)
+
+    def test_stream(self):
+        response, body = self.stream_bookmarks()
+        self.assertEqual(response.status, 200)
+        body.read(1)
+        self.assertEqual(self.pool.stats["idle"], 0)
+        content = body.read()
+        self.assertTrue(content)
+        self.assertEqual(self.pool.stats["idle"], 1)
+
+    def test_close_stream_early(self):
+        response, body = self.stream_bookmarks()
+        body.read(1)
+        body.close()
+        self.assertEqual(body.read(), "")
+        self.assertEqual(self.pool.stats["idle"], 0)
+        self.assertEqual(self.pool.stats["discards"], 1)
+
+    def test_unsupported_scheme(self):
+        self.assertRaises(ValueError, self.pool.request, "ftp://example.com/")
+
+
+class SignRequestTest(ServerTestCase):
+
+    def test_blank_values_are_signed(self):
+        url, body, headers = self.auth.sign_request(
+            self.server.url_prefix + "bookmark/ABC", "POST",
+            "api_method=update&description=&title=x")
+        params = parse_qs(body, keep_blank_values=True)
+        self.assertEqual(params["description"], [""])
+        self.assertEqual(params["title"], ["x"])
+
+    def test_clear_field(self):
+        bookmark = datatypes.Bookmark(title=u"title", uri=u"http://a.com/",
+                                      description=u"desc")
+        self.client.add(bookmark)
+        bookmark.description = u""
+        bookmark.update()
+        stored = self.client.get_bookmark(bookmark.id)
+        self.assertEqual(stored.description, u"")
@@ -0,0 +1,103 @@
+import random
+import re
+
+from pyoperalink import datatypes
+from pyoperalink.urlfilter import PatternSet, UrlFilterMatcher
+
+from tests import unittest
+
+
+def naive_matches(patterns, url):
+    """
+    Tests url against every pattern in turn
+    """
+    url = url.strip().lower()
+    for pattern in patterns:
+        regexp = ".*".join(re.escape(part)
+                           for part in pattern.strip().lower().split("*"))
+        if re.match(regexp + r"\Z", url, re.DOTALL):
+            return True
+    return False
+
+
+class PatternSetTest(unittest.TestCase):
+
+    def test_kinds_of_patterns(self):
+        patterns = PatternSet([
+            "http://exact.com/page",
+            "http://ads.example.com/*",
+            "http://cdn.example.com/*/banner*.gif",
+            "*://*.tracker.net/*",
+            "*.swf",
+            "*qq*zz",
+        ])
+        for url, expected in (
+                ("http://exact.com/page", True),
+                ("http://exact.com/page2", False),
+                ("HTTP://ADS.example.com/x.js", True),
+                ("http://ads.example.com.evil.org/", False),
+                ("http://cdn.example.com/img/banner1.gif", True),
+                ("http://cdn.example.com/img/banner1.png", False),
+                ("https://www.tracker.net/pixel", True),
+                ("https://www.tracker.network/pixel", False),
+                ("ftp://files.example.org/movie.SWF", True),
+                ("http://x.org/qq-zz", True),
+                ("http://x.org/zzqq", False)):
+            self.assertEqual(patterns.matches(url), expected, url)
+
+    def test_any(self):
+        self.assertTrue(PatternSet(["**"]).matches("http://anything/"))
+
+    def test_empty(self):
+        patterns = PatternSet(["", None])
+        self.assertEqual(len(patterns), 0)
+        self.assertFalse(patterns.matches("http://example.com/"))
+
+    def test_normalised(self):
+        patterns = PatternSet([" HTTP://Example.com/* ",
+                               "http://example.com/*"])
+        self.assertEqual(len(patterns), 1)
+        self.assertTrue(patterns.matches(" http://EXAMPLE.com/x "))
+
+    def test_same_as_naive(self):
+        rng = random.Random(1)
+        parts = ["http://", "https://", "*", "ads", "example", ".com", "/",
+                 "img", ".gif", "x", "*", "?q=1", "www.", "tracker", "-"]
+
+        def generate(count):
+            return "".join(rng.choice(parts) for i in range(count))
+        patterns = [generate(rng.randint(1, 6)) for i in range(300)]
+        pattern_set = PatternSet(patterns)
+        for i in range(3000):
+            url = generate(rng.randint(1, 8)).replace("*", "")
+            self.assertEqual(pattern_set.matches(url),
+                             naive_matches(patterns, url), url)
+
+
+def url_filter(content, filter_type):
+    return datatypes.UrlFilter(content=content, type=filter_type)
+
+
+class UrlFilterMatcherTest(unittest.TestCase):
+
+    def test_exclude(self):
+        matcher = UrlFilterMatcher([
+            url_filter("http://ads.example.com/*", "exclude")])
+        self.assertTrue(matcher.is_blocked("http://ads.example.com/a.gif"))
+        self.assertFalse(matcher.is_blocked("http://example.com/"))
+        self.assertTrue(matcher.matches("http://ads.example.com/"))
+        self.assertFalse(matcher.matches("http://ads.example.com/",
+                                         "include"))
+
+    def test_include(self):
+        matcher = UrlFilterMatcher([
+            url_filter("http://example.com/*", "include"),
+            url_filter("http://example.com/ads/*", "exclude"),
+            url_filter("http://other.com/*", "unknown")])
+        self.assertFalse(matcher.is_blocked("http://example.com/page"))
+        # Exclude filters take priority
+        self.assertTrue(matcher.is_blocked("http://example.com/ads/1"))
+        self.assertTrue(matcher.is_blocked("http://other.com/"))
+
+    def test_no_filters(self):
+        self.assertFalse(UrlFilterMatcher().is_blocked("http://a.com/"))